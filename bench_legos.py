@@ -0,0 +1,348 @@
+"""
+A benchmark suite for the LEGO analysis: times every public plot function
+of graph_legos against the LegoData artifacts (load, transform and
+to_dict serialization separately) and every page through Streamlit's
+headless AppTest, then compares the results with a stored baseline.
+
+Usage:
+    python bench_legos.py [--baseline bench_baseline.json] [--update-baseline]
+"""
+
+import argparse
+import inspect
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import altair as alt
+import pandas as pd
+
+import cache_legos as cl
+import graph_legos as gl
+import load_legos as ll
+
+C = './LegoData/Category/'
+K = './LegoData/Colors/'
+R = './LegoData/Recs/'
+S = './LegoData/Summary/'
+IMAGES = './LegoData/Images/set_images'
+
+# Benchmark cases: label, plot function name and its arguments, as the
+# pages call them.
+CASES = [
+    ('pink', 'plot_colors', {'data_path': K + 'pink_names'}),
+    ('all', 'plot_theme_colors', {'data_path': K + 'theme_colors'}),
+    ('colors', 'plot_theme_sets', {'data_path': K + 'theme_sets', 'h': 500,
+                                   'img_x': '-80', 'dom': 610}),
+    ('kitty', 'plot_theme_sets', {'data_path': C + 'cat_theme_sets', 'category': 'kitty'}),
+    ('colors', 'plot_set_colors', {'data_path': K + 'set_colors', 'setname': 'Diagon Alley',
+                                   'image_file': IMAGES, 'h': 300}),
+    ('princess', 'plot_set_colors', {'data_path': C + 'cat_set_colors',
+                                     'setname': 'The Enchanted Treehouse',
+                                     'image_file': IMAGES, 'category': 'princess'}),
+    ('bound', 'plot_set_colors', {'data_path': C + 'cat_set_colors',
+                                  'setname': 'The Enchanted Treehouse', 'image_file': IMAGES,
+                                  'bind_category': True, 'all_path': C + 'all_set_colors'}),
+    ('all', 'plot_theme_pieces', {'data_path': K + 'theme_pieces'}),
+    ('colors', 'plot_sets_most_pieces', {'data_path': K + 'set_pieces',
+                                         'setname': "Andy Warhol's Marilyn Monroe",
+                                         'image_file': IMAGES, 'h': 300}),
+    ('bound', 'plot_sets_most_pieces', {'data_path': C + 'cat_pink_pieces',
+                                        'setname': 'The Enchanted Treehouse', 'image_file': IMAGES,
+                                        'bind_category': True, 'all_path': C + 'all_pink_pieces'}),
+    ('all', 'plot_parts_most_colors', {'data_path': K + 'parts_most_colors'}),
+    ('shapes', 'plot_pieces_shapes', {'data_path': K + 'pink_and_purple', 'x_var': 'part_num',
+                                      'data_name': 'Shapes'}),
+    ('kitty', 'plot_pieces_shapes', {'data_path': C + 'category_pink_purple', 'category': 'kitty'}),
+    ('all', 'plot_pieces', {'data_path': K + 'color_pieces', 'category': 'all', 'offset': 200}),
+    ('princess', 'plot_pieces', {'data_path': C + 'cat_top_pieces', 'category': 'princess',
+                                 'offset': 10}),
+    ('pieces', 'plot_by_year', {'data_path': C + 'year_cube', 'y_var': 'quantity',
+                                'data_name': 'Pieces', 'family': ['pink', 'purple'],
+                                'tooltip_opt': [alt.Tooltip('color_name', title='Color')]}),
+    ('fairy', 'plot_by_year', {'data_path': C + 'year_cube', 'y_var': 'part_num',
+                               'data_name': 'Shapes', 'category': 'fairy',
+                               'tooltip_opt': [alt.Tooltip('part_num')]}),
+    ('colors', 'plot_set_theme_by_year', {'data_path': C + 'year_cube', 'y_var': 'set_num',
+                                          'data_name': 'Set', 'by': 'family',
+                                          'd_choice': ['pink', 'purple', 'all'],
+                                          'r_choice': ['hotpink', 'rebeccapurple', 'white']}),
+    ('categories', 'plot_set_theme_by_year', {'data_path': C + 'year_cube', 'y_var': 'set_num',
+                                              'data_name': 'Set'}),
+    ('all', 'plot_color_timeline', {'data_path': K + 'pink_exit'}),
+    ('princess', 'plot_category_info', {'data_path': S + 'metrics', 'data_name': 'princess',
+                                        'border': 'black'}),
+    ('all', 'waterfall', {'data_path': R + 'net_sets'}),
+    ('all', 'plot_prices', {'data_path': R + 'to_purchase'}),
+    ('diverse', 'plot_purchase_frontier', {'data_path': R + 'purchase_df', 'diversity': 0.5}),
+]
+
+# Streamlit scripts rendered with AppTest.
+PAGES = ['intro.py',
+         'pages/1_pink and purple.py',
+         'pages/2_princesses etc.py',
+         'pages/3_recommendations.py']
+
+# Differences below these floors are never regressions (timer noise).
+NOISE_FLOORS = {'_s': 0.01, '_bytes': 4096}
+
+
+########################################################################
+def _best_time(func, repeat):
+    """Best wall time of repeat calls of func, in seconds (the least noisy
+    estimate, as in timeit)."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+########################################################################
+def _peak_memory(func):
+    """Peak traced memory allocated while func runs, in bytes."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+########################################################################
+def _clear_caches():
+    """Empties the artifact and spec caches, as in a fresh server."""
+    ll.artifact_cache.clear()
+    cl.spec_cache.clear()
+    # time cold renders, and leave the store of running servers alone
+    cl.spec_cache.store = None
+
+
+########################################################################
+def bench_function(func_name, kwargs, repeat=5, memory=True):
+    """
+    Benchmarks one plot function call.
+
+    Args:
+        func_name (str): Name of the graph_legos function.
+        kwargs (dict): Its arguments.
+        repeat (int, optional): Runs per timing; the best is kept
+            (default is 5).
+        memory (bool, optional): Also measure peak memory (default is True).
+
+    Returns:
+        dict: load_s (reading the artifacts into a cold cache), transform_s
+            (building the chart from cached artifacts), to_dict_s
+            (serializing the spec), spec_bytes, data_bytes and peak_bytes
+            (cold call plus serialization), or a 'skipped' reason.
+    """
+    missing = [kwargs[arg] for arg in cl.ARTIFACT_ARGS
+               if kwargs.get(arg) and not os.path.exists(kwargs[arg])]
+    if missing:
+        return {'skipped': f"missing artifact {', '.join(missing)}"}
+    plot_func = getattr(gl, func_name)
+
+    # cold calls: time spent inside read_artifact is the load
+    loads = []
+    read_artifact = ll.read_artifact
+
+    def timed_read(*args, **read_kwargs):
+        start = time.perf_counter()
+        try:
+            return read_artifact(*args, **read_kwargs)
+        finally:
+            loads[-1] += time.perf_counter() - start
+
+    ll.read_artifact = timed_read
+    try:
+        for _ in range(repeat):
+            _clear_caches()
+            loads.append(0.0)
+            chart = plot_func(**kwargs)
+    finally:
+        ll.read_artifact = read_artifact
+
+    result = {'load_s': min(loads),
+              'transform_s': _best_time(lambda: plot_func(**kwargs), repeat),
+              'to_dict_s': _best_time(lambda: cl.render_spec(chart), repeat)}
+    size = cl.payload_size(cl.render_spec(chart))
+    result.update(spec_bytes=size['spec_bytes'], data_bytes=size['data_bytes'])
+    if memory:
+        _clear_caches()
+        result['peak_bytes'] = _peak_memory(lambda: cl.render_spec(plot_func(**kwargs)))
+    return result
+
+
+########################################################################
+def bench_page(script, memory=True, timeout=300):
+    """
+    Benchmarks a full script run of a page with Streamlit's AppTest.
+
+    Args:
+        script (str): Path of the Streamlit script.
+        memory (bool, optional): Also measure peak memory (default is True).
+        timeout (int, optional): Seconds allowed per run (default is 300).
+
+    Returns:
+        dict: first_s (cold caches), rerun_s (same session, warm caches),
+            exceptions and peak_bytes (cold run).
+    """
+    from streamlit.testing.v1 import AppTest
+
+    _clear_caches()
+    app = AppTest.from_file(script, default_timeout=timeout)
+    start = time.perf_counter()
+    app.run()
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    app.run()
+    result = {'first_s': first,
+              'rerun_s': time.perf_counter() - start,
+              'exceptions': [exception.message for exception in app.exception]}
+    if memory:
+        _clear_caches()
+        result['peak_bytes'] = _peak_memory(
+            lambda: AppTest.from_file(script, default_timeout=timeout).run())
+    return result
+
+
+########################################################################
+def uncovered_functions():
+    """
+    Lists the public graph_legos functions without a benchmark case.
+
+    Returns:
+        list: Function names.
+    """
+    covered = {func_name for _, func_name, _ in CASES}
+    return [name for name, func in inspect.getmembers(gl, inspect.isfunction)
+            if func.__module__ == gl.__name__ and not name.startswith('_')
+            and name not in covered]
+
+
+########################################################################
+def run_benchmarks(repeat=5, memory=True, pages=True, only=None):
+    """
+    Runs the benchmark suite.
+
+    Args:
+        repeat (int, optional): Runs per function timing (default is 5).
+        memory (bool, optional): Also measure peak memory (default is True).
+        pages (bool, optional): Also render the pages (default is True).
+        only (list, optional): Only benchmark these functions (default is
+            all).
+
+    Returns:
+        dict: 'meta' (versions and date), 'functions' keyed on
+            'function[label]' and 'pages' keyed on script path.
+    """
+    results = {'meta': {'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                        'python': platform.python_version(),
+                        'platform': platform.platform(),
+                        'pandas': pd.__version__,
+                        'altair': alt.__version__,
+                        'repeat': repeat},
+               'functions': {},
+               'pages': {}}
+    for label, func_name, kwargs in CASES:
+        if only is None or func_name in only:
+            results['functions'][f'{func_name}[{label}]'] = \
+                bench_function(func_name, kwargs, repeat, memory)
+    if pages:
+        for script in PAGES:
+            results['pages'][script] = bench_page(script, memory)
+    return results
+
+
+########################################################################
+def compare(results, baseline, threshold=0.25):
+    """
+    Compares benchmark results with a baseline.
+
+    Args:
+        results (dict): Output of run_benchmarks.
+        baseline (dict): An earlier output of run_benchmarks.
+        threshold (float, optional): Allowed relative increase of any
+            timing, size or memory metric (default is 0.25, i.e. 25%).
+
+    Returns:
+        list: (entry, metric, baseline value, new value) of every
+            regression; increases under NOISE_FLOORS are ignored.
+    """
+    regressions = []
+    for section in ('functions', 'pages'):
+        for entry, metrics in results[section].items():
+            old_metrics = baseline.get(section, {}).get(entry, {})
+            for metric, value in metrics.items():
+                old = old_metrics.get(metric)
+                if not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+                    continue
+                floor = next((v for suffix, v in NOISE_FLOORS.items()
+                              if metric.endswith(suffix)), 0)
+                if value > old * (1 + threshold) and value - old > floor:
+                    regressions.append((entry, metric, old, value))
+    return regressions
+
+
+########################################################################
+def _format(metric, value):
+    """Human readable metric value."""
+    if metric.endswith('_s'):
+        return f'{value * 1000:.1f}ms'
+    if metric.endswith('_bytes'):
+        return f'{value / 1024:.1f}KB'
+    return str(value)
+
+
+########################################################################
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the plot functions and pages.')
+    parser.add_argument('--output', default='bench_results.json', help='results file')
+    parser.add_argument('--baseline', default='bench_baseline.json', help='baseline to compare with')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='store these results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed relative increase per metric (default 0.25)')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per timing (default 5)')
+    parser.add_argument('--only', nargs='+', metavar='FUNCTION', help='only these plot functions')
+    parser.add_argument('--no-pages', action='store_true', help='skip the AppTest page runs')
+    parser.add_argument('--no-memory', action='store_true', help='skip peak memory measurements')
+    args = parser.parse_args()
+
+    for name in uncovered_functions():
+        print(f'warning: no benchmark case for graph_legos.{name}')
+    results = run_benchmarks(args.repeat, not args.no_memory, not args.no_pages, args.only)
+
+    print(f"{'load':>9} {'transform':>9} {'to_dict':>9} {'spec':>9} {'peak':>9}  function")
+    for entry, metrics in results['functions'].items():
+        if 'skipped' in metrics:
+            print(f"{'':>49}  {entry} skipped: {metrics['skipped']}")
+            continue
+        columns = [_format(metric, metrics.get(metric, 0)) for metric in
+                   ('load_s', 'transform_s', 'to_dict_s', 'spec_bytes', 'peak_bytes')]
+        print(' '.join(f'{column:>9}' for column in columns) + f'  {entry}')
+    for script, metrics in results['pages'].items():
+        print(f"{_format('first_s', metrics['first_s']):>9} first, "
+              f"{_format('rerun_s', metrics['rerun_s']):>9} rerun, "
+              f"{_format('peak_bytes', metrics.get('peak_bytes', 0)):>9} peak  {script}"
+              + (f"  ({len(metrics['exceptions'])} exceptions)" if metrics['exceptions'] else ''))
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=1)
+    print(f'wrote {args.output}')
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=1)
+        print(f'stored {args.baseline} as the baseline')
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for entry, metric, old, new in regressions:
+            print(f'REGRESSION {entry} {metric}: {_format(metric, old)} -> {_format(metric, new)}')
+        print(f'{len(regressions)} regressions over {args.threshold:.0%} against {args.baseline}')
+        sys.exit(1 if regressions else 0)
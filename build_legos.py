@@ -0,0 +1,1133 @@
+"""
+A group of functions used to build the LegoData artifacts from the raw
+Rebrickable downloads (and a Brickset export for the recommendations).
+
+Usage:
+    python build_legos.py build RAW_DIR [--brickset FILE] [--out LegoData] [--dry-run]
+"""
+
+import argparse
+import base64
+import hashlib
+import inspect
+import json
+import mimetypes
+import os
+import re
+import time
+import types
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+import cube_legos as cu
+import load_legos as ll
+import metrics_legos as mt
+import palette_legos as pl
+import recs_legos as rc
+
+# Sets released after this year are left out of the analysis.
+LAST_YEAR = 2023
+
+# Rows of inventory_parts read at a time.
+CHUNK_ROWS = 500_000
+
+# Thresholds of the pink and purple classifier (see palette_legos). They are
+# hashed with load_colors, so tuning them rebuilds the color artifacts.
+FAMILY_THRESHOLDS = {'min_chroma': pl.MIN_CHROMA,
+                     'pink_hues': pl.PINK_HUES,
+                     'purple_hues': pl.PURPLE_HUES,
+                     'vivid_chroma': pl.VIVID_CHROMA,
+                     'vivid_purple_hue': pl.VIVID_PURPLE_HUE,
+                     'dark_pink_lightness': pl.DARK_PINK_LIGHTNESS}
+
+# Display order of the categories.
+CATEGORIES = ['princess', 'unicorn', 'fairy', 'mermaid', 'kitty']
+
+# Keywords of each category, in matching priority. Set names are matched
+# before theme names, so "Kitty Fairy's Garden Party" is a kitty set and a
+# fairy set inside the Disney Princess theme stays a fairy set.
+CATEGORY_KEYWORDS = [('kitty', ['kitty']),
+                     ('mermaid', ['mermaid']),
+                     ('unicorn', ['unicorn']),
+                     ('fairy', ['fairy', 'fairies']),
+                     ('princess', ['princess'])]
+
+# Typed reads of the raw Rebrickable tables.
+RAW_DTYPES = {
+    'sets': {'set_num': str, 'name': str, 'year': 'int16', 'theme_id': 'int32',
+             'num_parts': 'int32', 'img_url': str},
+    'themes': {'id': 'int32', 'name': str, 'parent_id': 'float32'},
+    'colors': {'id': 'int32', 'name': str, 'rgb': str, 'is_trans': str,
+               'num_parts': 'float64', 'num_sets': 'float64', 'y1': 'float64', 'y2': 'float64'},
+    'inventories': {'id': 'int32', 'version': 'int16', 'set_num': str},
+    'inventory_parts': {'inventory_id': 'int32', 'part_num': str, 'color_id': 'int32',
+                        'quantity': 'int32', 'img_url': str},
+}
+
+# Brickset export columns used by the recommendations, and their names here.
+BRICKSET_COLUMNS = {'Number': 'number', 'Variant': 'variant', 'Theme': 'theme_name',
+                    'Subtheme': 'Subtheme', 'Year': 'year', 'Name': 'set_name',
+                    'Minifigs': 'Minifigs', 'Pieces': 'num_parts',
+                    'USRetailPrice': 'us_retail', 'LaunchDate': 'launch_date',
+                    'ExitDate': 'exit_date'}
+BRICKSET_IMAGE = 'https://images.brickset.com/sets/large/{}.jpg'
+BRICKSET_LINK = 'https://brickset.com/sets/{}#ui-id-10:~:text=41953%20%C2%BB-,BUY,-NEWS'
+
+# Column order and dtypes of the joined inventory table.
+JOINED_DTYPES = {'set_num': object, 'set_name': object, 'year': 'float64',
+                 'theme_id': 'float64', 'num_parts': 'float64', 'set_image': object,
+                 'inventory_id': 'int64', 'version': 'int64', 'theme_name': object,
+                 'parent_id': 'float64', 'part_num': object, 'color_id': 'int64',
+                 'quantity': 'int64', 'part_image': object, 'color_name': object,
+                 'rgb': object, 'hex': object, 'color_group': object, 'category': object}
+
+
+########################################################################
+def raw_path(raw_dir, name):
+    """
+    Finds a raw Rebrickable download.
+
+    Args:
+        raw_dir (str): Directory holding the Rebrickable downloads.
+        name (str): Table name, e.g. 'sets' (sets.csv or sets.csv.gz).
+
+    Returns:
+        str: Path of the download.
+    """
+    for file_name in (f'{name}.csv', f'{name}.csv.gz'):
+        path = os.path.join(raw_dir, file_name)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f'no {name}.csv(.gz) in {raw_dir}')
+
+
+########################################################################
+def read_raw(path, name, **kwargs):
+    """
+    Reads a raw Rebrickable table with typed columns.
+
+    Args:
+        path (str): Path of the download.
+        name (str): Table name, e.g. 'sets'.
+        **kwargs: Extra pandas.read_csv arguments, e.g. chunksize.
+
+    Returns:
+        pandas.DataFrame (or an iterator of them when chunksize is given).
+    """
+    return pd.read_csv(path, dtype=RAW_DTYPES.get(name), **kwargs)
+
+
+########################################################################
+def keyword_matcher(category_keywords=CATEGORY_KEYWORDS):
+    """
+    Compiles category keywords into a single matcher.
+
+    Args:
+        category_keywords (list, optional): (category, keywords) pairs in
+            matching priority (default is CATEGORY_KEYWORDS).
+
+    Returns:
+        tuple: Compiled pattern matching any keyword (longest first, lower
+            case), dict of keyword to category, and the categories in
+            priority order.
+    """
+    labels = {}
+    for label, keywords in category_keywords:
+        for keyword in keywords:
+            labels.setdefault(keyword.lower(), label)
+    pattern = re.compile('|'.join(map(re.escape, sorted(labels, key=len, reverse=True))))
+    return pattern, labels, [label for label, _ in category_keywords]
+
+
+########################################################################
+def match_categories(names, matcher):
+    """
+    Finds every category whose keywords appear in each name, scanning all
+    names in one pass.
+
+    Args:
+        names (pandas.Series): Names to scan (NaN matches nothing).
+        matcher (tuple): Output of keyword_matcher.
+
+    Returns:
+        pandas.DataFrame: One boolean column per category, in priority
+            order, indexed like names.
+    """
+    pattern, labels, categories = matcher
+    found = names.fillna('').str.lower().str.findall(pattern).explode().dropna()
+    hits = pd.crosstab(found.index, found.map(labels)).astype(bool)
+    hits = hits.reindex(index=names.index, columns=categories, fill_value=False)
+    return hits.rename_axis(index=names.index.name, columns=None)
+
+
+########################################################################
+def tag_categories(sets, category_keywords=CATEGORY_KEYWORDS):
+    """
+    Tags each set with every category named in its set or theme name, and
+    picks its main category: the first in priority matched by the set name,
+    else by the theme name.
+
+    Args:
+        sets (pandas.DataFrame): Sets with set_name and theme_name columns.
+        category_keywords (list, optional): (category, keywords) pairs in
+            matching priority (default is CATEGORY_KEYWORDS).
+
+    Returns:
+        pandas.DataFrame: One boolean column per category and the main
+            category (NaN for sets in no category).
+    """
+    matcher = keyword_matcher(category_keywords)
+    by_set = match_categories(sets['set_name'], matcher)
+    by_theme = match_categories(sets['theme_name'], matcher)
+    main = by_set.idxmax(axis=1).where(by_set.any(axis=1))
+    main = main.fillna(by_theme.idxmax(axis=1).where(by_theme.any(axis=1)))
+    return (by_set | by_theme).assign(category=main)
+
+
+########################################################################
+def load_colors(colors_path):
+    """
+    Reads the raw colors and tags the pink and purple families from their
+    hex codes (see palette_legos.classify_colors).
+
+    Args:
+        colors_path (str): Path of the colors download.
+
+    Returns:
+        pandas.DataFrame: Colors with hex and color_group ('pink', 'purple'
+            or 'other') columns.
+    """
+    colors = read_raw(colors_path, 'colors').rename(columns={'id': 'color_id', 'name': 'color_name'})
+    colors['hex'] = '#' + colors['rgb']
+    colors['color_group'] = pl.classify_colors(colors['hex'], **FAMILY_THRESHOLDS)
+    return colors
+
+
+########################################################################
+def join_tables(sets_path, themes_path, inventories_path, parts_path, colors,
+                last_year=LAST_YEAR, chunk_rows=CHUNK_ROWS):
+    """
+    Joins sets, themes, inventories, inventory parts and colors, keeping
+    only the parts that are pink or purple or that belong to a category set.
+    inventory_parts is streamed in chunks, so memory stays bounded by the
+    kept rows.
+
+    Args:
+        sets_path (str): Path of the sets download.
+        themes_path (str): Path of the themes download.
+        inventories_path (str): Path of the inventories download.
+        parts_path (str): Path of the inventory_parts download.
+        colors (pandas.DataFrame): Output of load_colors.
+        last_year (int, optional): Last release year included (default is
+            LAST_YEAR).
+        chunk_rows (int, optional): Rows of inventory_parts read at a time
+            (default is CHUNK_ROWS).
+
+    Returns:
+        tuple: pink_and_purple (category is the color family), category_df,
+            category_pink_purple and the set summary used by the
+            recommendations (one row per set, with its category and
+            pink/purple piece count).
+    """
+    themes = read_raw(themes_path, 'themes').rename(columns={'id': 'theme_id', 'name': 'theme_name'})
+    sets = read_raw(sets_path, 'sets').rename(columns={'name': 'set_name', 'img_url': 'set_image'})
+    sets = sets[sets['year'] <= last_year].merge(themes, on='theme_id', how='left')
+    sets['category'] = tag_categories(sets)['category']
+
+    inventories = read_raw(inventories_path, 'inventories').rename(columns={'id': 'inventory_id'})
+    inventories = inventories.merge(sets, on='set_num')
+
+    keep_colors = colors.loc[colors['color_group'] != 'other', 'color_id']
+    keep_inventories = inventories.loc[inventories['category'].notna(), 'inventory_id']
+    chunks = []
+    for chunk in read_raw(parts_path, 'inventory_parts', chunksize=chunk_rows,
+                          usecols=list(RAW_DTYPES['inventory_parts'])):
+        keep = chunk['color_id'].isin(keep_colors) | chunk['inventory_id'].isin(keep_inventories)
+        chunks.append(chunk[keep & chunk['inventory_id'].isin(inventories['inventory_id'])])
+    parts = pd.concat(chunks, ignore_index=True).rename(columns={'img_url': 'part_image'})
+
+    joined = inventories.merge(parts, on='inventory_id') \
+        .merge(colors[['color_id', 'color_name', 'rgb', 'hex', 'color_group']], on='color_id')
+    joined = joined[list(JOINED_DTYPES)].astype(JOINED_DTYPES)
+
+    pink = joined['color_group'] != 'other'
+    pink_and_purple = joined[pink].drop(columns=['category']) \
+        .rename(columns={'color_group': 'category'})
+    category_df = joined[joined['category'].notna()]
+
+    pieces = pink_and_purple.groupby('set_num')['quantity'].sum()
+    summary = sets[['set_num', 'set_name', 'year', 'theme_name', 'num_parts', 'set_image', 'category']]
+    summary = summary.assign(pink_pieces=summary['set_num'].map(pieces).fillna(0).astype('int64'))
+
+    return pink_and_purple, category_df, category_df[pink[category_df.index]], summary
+
+
+########################################################################
+def read_brickset(path):
+    """
+    Reads a Brickset export (see BRICKSET_COLUMNS).
+
+    Args:
+        path (str): Path to the Brickset CSV.
+
+    Returns:
+        pandas.DataFrame: Brickset sets keyed on the Rebrickable set_num.
+    """
+    df = pd.read_csv(path, usecols=list(BRICKSET_COLUMNS)).rename(columns=BRICKSET_COLUMNS)
+    df['set_num'] = df['number'].astype(str) + '-' + df['variant'].astype(str)
+    return df.drop(columns=['number', 'variant'])
+
+
+########################################################################
+def _ranked(df, keys, measure, n, per_category):
+    """Top n groups of df by measure ('colors', 'pieces' or 'sets'), ties broken by name."""
+    column, func = {'colors': ('color_name', 'nunique'),
+                    'pieces': ('quantity', 'sum'),
+                    'sets': ('set_num', 'nunique')}[measure]
+    group = (['category'] if per_category else []) + keys
+    scores = df.groupby(group)[column].agg(func).rename('score').reset_index() \
+        .sort_values('score', ascending=False, kind='stable')
+    if not per_category:
+        return scores.head(n)
+    order = scores['category'].map({c: i for i, c in enumerate(CATEGORIES)})
+    return scores.assign(order=order).sort_values('order', kind='stable') \
+        .groupby('category', sort=False).head(n).drop(columns=['order'])
+
+
+########################################################################
+def color_family(df, family):
+    """
+    Summarizes each color of a family: pieces, sets and themes.
+
+    Args:
+        df (pandas.DataFrame): pink_and_purple.
+        family (str): 'pink' or 'purple'.
+
+    Returns:
+        pandas.DataFrame: One row per color, with its palette image.
+    """
+    source = df[df['category'] == family]
+    out = source.groupby('color_name').agg(quantity=('quantity', 'sum'),
+                                           set_num=('set_num', 'nunique'),
+                                           theme_name=('theme_name', 'nunique'),
+                                           hex=('hex', 'first')).reset_index()
+    out['image'] = 'palette/' + out['color_name'] + '.png'
+    return out
+
+
+########################################################################
+def theme_colors(df, measure, n=10):
+    """
+    Lists the colors of the top themes, one row per theme and color.
+
+    Args:
+        df (pandas.DataFrame): pink_and_purple.
+        measure (str): Ranks themes by 'colors' or 'pieces'.
+        n (int, optional): Number of themes (default is 10).
+
+    Returns:
+        pandas.DataFrame: Pieces and sets per theme and color, with theme logos.
+    """
+    top = _ranked(df, ['theme_name'], measure, n, False)['theme_name']
+    out = df[df['theme_name'].isin(top)] \
+        .groupby(['theme_name', 'color_name']).agg(quantity=('quantity', 'sum'),
+                                                   set_num=('set_num', 'nunique'),
+                                                   hex=('hex', 'first')).reset_index()
+    out['image'] = 'themes/' + out['theme_name'] + '.png'
+    return out
+
+
+########################################################################
+def theme_sets(df, n=10, per_category=False):
+    """
+    Lists the themes with the most sets.
+
+    Args:
+        df (pandas.DataFrame): pink_and_purple or category_df.
+        n (int, optional): Number of themes (per category) (default is 10).
+        per_category (bool, optional): Rank within each category (default
+            is False).
+
+    Returns:
+        pandas.DataFrame: Set count per theme, with theme logos.
+    """
+    out = _ranked(df, ['theme_name'], 'sets', n, per_category).rename(columns={'score': 'set_num'})
+    out['image'] = 'themes/' + out['theme_name'] + '.png'
+    return out
+
+
+########################################################################
+def set_colors(df, measure, n=10, per_category=False, keep_category=False):
+    """
+    Lists the colors of the top sets, one row per set and color.
+
+    Args:
+        df (pandas.DataFrame): pink_and_purple or category_pink_purple.
+        measure (str): Ranks sets by 'colors' or 'pieces'.
+        n (int, optional): Number of sets (per category) (default is 10).
+        per_category (bool, optional): Rank within each category (default
+            is False).
+        keep_category (bool, optional): Keep the set category column
+            (default is per_category).
+
+    Returns:
+        pandas.DataFrame: Pieces per set and color, largest first.
+    """
+    keys = ['set_num'] + (['category'] if per_category or keep_category else [])
+    top = _ranked(df, ['set_num'], measure, n, per_category)
+    source = df[df['set_num'].isin(top['set_num'])]
+    out = source.groupby(keys + ['color_name']).agg(quantity=('quantity', 'sum'),
+                                                    set_name=('set_name', 'first'),
+                                                    theme_name=('theme_name', 'first'),
+                                                    hex=('hex', 'first'),
+                                                    set_image=('set_image', 'first')).reset_index()
+    return out.sort_values('quantity', ascending=False, kind='stable')
+
+
+########################################################################
+def set_images(*set_tables):
+    """
+    Lists the image of every set drawn by the set charts.
+
+    Args:
+        *set_tables (pandas.DataFrame): Outputs of set_colors.
+
+    Returns:
+        pandas.DataFrame: set_name, theme_name and image of each set.
+    """
+    out = pd.concat([df[['set_name', 'theme_name', 'set_image']] for df in set_tables], ignore_index=True)
+    out = out.drop_duplicates('set_name').rename(columns={'set_image': 'image'})
+    return out.reset_index(drop=True)
+
+
+########################################################################
+def top_pieces(df, n=10):
+    """
+    Lists the most common pieces (part and color) of each category.
+
+    Args:
+        df (pandas.DataFrame): pink_and_purple (categories are the color
+            families) or category_df/category_pink_purple.
+        n (int, optional): Number of pieces per category (default is 10).
+
+    Returns:
+        pandas.DataFrame: Pieces per category, indexed 0..n-1 within each.
+    """
+    pieces = df.groupby(['category', 'color_name', 'part_num']).agg(quantity=('quantity', 'sum'),
+                                                                    part_image=('part_image', 'first'),
+                                                                    hex=('hex', 'first')).reset_index()
+    pieces = pieces.sort_values('quantity', ascending=False, kind='stable')
+    groups = [group.head(n).reset_index(drop=True)
+              for category in CATEGORIES + ['pink', 'purple']
+              for label, group in pieces.groupby('category', sort=False) if label == category]
+    out = pd.concat(groups)
+    out['image'] = out['part_image']
+    return out[['color_name', 'part_num', 'quantity', 'part_image', 'hex', 'category', 'image']]
+
+
+########################################################################
+def parts_most_colors(df, min_colors=9):
+    """
+    Lists the parts that come in the most colors, one row per part and color.
+
+    Args:
+        df (pandas.DataFrame): pink_and_purple.
+        min_colors (int, optional): Fewest colors a part needs (default is 9).
+
+    Returns:
+        pandas.DataFrame: Pieces per part and color; fraction scales each
+            color's share of the part to its number of colors.
+    """
+    out = df.groupby(['part_num', 'color_name']).agg(hex=('hex', 'first'),
+                                                     part_image=('part_image', 'first'),
+                                                     quantity=('quantity', 'sum')).reset_index()
+    part = out.groupby('part_num')
+    out['total_parts'] = part['quantity'].transform('sum')
+    out['num_colors'] = part['color_name'].transform('size')
+    out = out[out['num_colors'] >= min_colors]
+    out['fraction'] = out['quantity'] / out['total_parts'] * out['num_colors']
+    # picture each part in its most used color
+    top = out.sort_values('quantity', ascending=False, kind='stable').drop_duplicates('part_num')
+    out['image'] = out['part_num'].map(top.set_index('part_num')['part_image'])
+    return out.reset_index(drop=True)
+
+
+########################################################################
+def year_cube(pink_and_purple, category_df):
+    """
+    Lists the facts of the by-year cube (see cube_legos): pieces per year,
+    category, color family, color, theme, set and shape, over the pink and
+    purple parts of every set and every part of the category sets.
+
+    Args:
+        pink_and_purple (pandas.DataFrame): pink_and_purple.
+        category_df (pandas.DataFrame): category_df.
+
+    Returns:
+        pandas.DataFrame: One row per fact with its quantity and color hex.
+    """
+    # category sets are in both tables; their parts are taken from category_df
+    others = pink_and_purple[~pink_and_purple['set_num'].isin(category_df['set_num'])] \
+        .rename(columns={'category': 'family'}).assign(category=cu.NO_CATEGORY)
+    facts = pd.concat([others, category_df.rename(columns={'color_group': 'family'})], ignore_index=True)
+    keys = list(cu.DIMENSIONS + cu.MEMBERS)
+    return facts.groupby(keys, dropna=False).agg(quantity=('quantity', 'sum'), hex=('hex', 'first')).reset_index()
+
+
+########################################################################
+def summary_metrics(pink_and_purple, category_df, category_pink_purple):
+    """
+    Computes the headline statistics of the pages (see metrics_legos): per
+    color family over the pink and purple parts of every set, and per
+    category over all and over the pink and purple parts of its sets.
+
+    Args:
+        pink_and_purple (pandas.DataFrame): pink_and_purple.
+        category_df (pandas.DataFrame): category_df.
+        category_pink_purple (pandas.DataFrame): category_pink_purple.
+
+    Returns:
+        pandas.DataFrame: One row per scope and group.
+    """
+    return pd.concat([mt.summarize(pink_and_purple, 'family'),
+                      mt.summarize(category_df, 'category'),
+                      mt.summarize(category_pink_purple, 'pink_category')], ignore_index=True)
+
+
+########################################################################
+def color_timespans(colors):
+    """
+    Lists when each pink and purple color was first and last available.
+
+    Args:
+        colors (pandas.DataFrame): Raw colors table (needs the num_parts,
+            num_sets, y1 and y2 columns of recent Rebrickable downloads).
+
+    Returns:
+        pandas.DataFrame: One row per color, most recently available first.
+    """
+    out = colors[colors['color_group'] != 'other'] \
+        .rename(columns={'color_id': 'id', 'num_parts': 'quantity', 'num_sets': 'sets',
+                         'y1': 'first', 'y2': 'last'})
+    out = out[['id', 'color_name', 'rgb', 'quantity', 'sets', 'first', 'last', 'hex']]
+    return out.sort_values(['last', 'first'], ascending=False, kind='stable')
+
+
+########################################################################
+def theme_counts(sets):
+    """
+    Counts the sets of each theme: all of them, the pink/purple ones, those
+    of each category and the pink/purple ones of each category.
+
+    Args:
+        sets (pandas.DataFrame): Set summary from join_tables.
+
+    Returns:
+        pandas.DataFrame: One row per theme (see recs_legos.rank_themes).
+    """
+    flags = pd.DataFrame({'theme_name': sets['theme_name'],
+                          'sets': 1,
+                          'pink': sets['pink_pieces'] > 0})
+    for category in CATEGORIES:
+        flags[category] = sets['category'] == category
+        flags[f'pink {category}'] = flags[category] & flags['pink']
+    # sets without a theme stay in the totals that P(theme) divides by
+    return flags.groupby('theme_name', dropna=False).sum().astype('int64').reset_index()
+
+
+########################################################################
+def theme_probabilities(counts, n=15, min_sets=2, exclude=('Duplo',)):
+    """
+    Ranks themes by the probability that one of their sets is pink/purple
+    or belongs to a category (see recs_legos.rank_themes, which the
+    recommendations page runs live).
+
+    Args:
+        counts (pandas.DataFrame): theme_counts.
+        n (int, optional): Number of themes (default is 15).
+        min_sets (int, optional): Fewest sets a theme needs (default is 2).
+        exclude (tuple, optional): Themes containing these names are left
+            out (default is ('Duplo',)).
+
+    Returns:
+        pandas.DataFrame: Theme probabilities, most likely first.
+    """
+    return rc.rank_themes(counts, min_sets=min_sets, exclude=exclude, n=n)
+
+
+########################################################################
+def to_purchase(sets, brickset, probabilities):
+    """
+    Lists the pink/purple sets of the top themes with their Brickset retail
+    price and availability.
+
+    Args:
+        sets (pandas.DataFrame): Set summary from split_joined.
+        brickset (pandas.DataFrame): Output of read_brickset.
+        probabilities (pandas.DataFrame): Recs/probability_df.
+
+    Returns:
+        pandas.DataFrame: Candidate sets, most pink/purple pieces first.
+    """
+    source = sets[(sets['pink_pieces'] > 0) & sets['theme_name'].isin(probabilities['Theme'])]
+    source = source.rename(columns={'pink_pieces': 'quantity'}).drop(columns=['year', 'category'])
+    out = source.merge(brickset, on='set_num').dropna(subset=['us_retail', 'launch_date', 'exit_date'])
+
+    launch = pd.to_datetime(out['launch_date'])
+    exit_date = pd.to_datetime(out['exit_date'])
+    out['launch_date'] = launch.dt.strftime('%Y-%m-%d')
+    out['exit_date'] = exit_date.dt.strftime('%Y-%m-%d')
+    out['lifespan'] = (exit_date - launch).dt.days.astype(str) + ' days'
+    out['part_value'] = out['us_retail'] / out['num_parts_y']
+    out['exit_year'] = exit_date.dt.year
+    out = out[['set_num', 'set_name_x', 'num_parts_x', 'set_image', 'theme_name_x', 'quantity',
+               'Subtheme', 'year', 'Minifigs', 'us_retail', 'exit_date', 'launch_date',
+               'lifespan', 'part_value', 'exit_year']]
+    return out.sort_values('quantity', ascending=False, kind='stable').reset_index(drop=True)
+
+
+########################################################################
+def purchase_table(candidates, last_year=LAST_YEAR):
+    """
+    Formats the purchase candidates for the recommendations page.
+
+    Args:
+        candidates (pandas.DataFrame): Recs/to_purchase.
+        last_year (int, optional): Sets that left the market before the
+            following year are retired (default is LAST_YEAR).
+
+    Returns:
+        pandas.DataFrame: The 'Target Assets to Purchase' table.
+    """
+    return pd.DataFrame({'Set Number': candidates['set_num'],
+                         'Set Name': candidates['set_name_x'],
+                         'Piece Total': candidates['num_parts_x'],
+                         'Set Image': candidates['set_num'].map(BRICKSET_IMAGE.format),
+                         'Theme': candidates['theme_name_x'],
+                         'Pink/Purple Pieces': candidates['quantity'],
+                         'MSRP': candidates['us_retail'],
+                         'Retired?': candidates['exit_year'] <= last_year,
+                         'Purchase Link': candidates['set_num'].map(BRICKSET_LINK.format)})
+
+
+########################################################################
+def net_sets(candidates, last_year=LAST_YEAR):
+    """
+    Counts the purchase candidates entering and leaving the market each year.
+
+    Args:
+        candidates (pandas.DataFrame): Recs/to_purchase.
+        last_year (int, optional): Last year shown (default is LAST_YEAR).
+
+    Returns:
+        pandas.DataFrame: Entries, exits, net change and running count per
+            year.
+    """
+    launch_year = pd.to_datetime(candidates['launch_date']).dt.year
+    entries = launch_year.value_counts().rename('entries')
+    exits = candidates.loc[candidates['exit_year'] <= last_year, 'exit_year'] \
+        .value_counts().rename('exits')
+    out = pd.concat([entries, exits], axis=1).sort_index()
+    out = out[out.index <= last_year].astype('float64')
+    out.index = out.index.rename('year').astype('float64')
+    out = out.reset_index()
+    out['exit_year'] = out['year'].where(out['exits'].notna())
+    out = out.fillna({'entries': 0, 'exits': 0})
+    out['change'] = out['entries'] - out['exits']
+    out['count'] = out['change'].cumsum()
+    return out[['year', 'entries', 'exit_year', 'exits', 'change', 'count']]
+
+
+# Intermediate stages of the build: builder, inputs ('raw/<name>' downloads
+# or tables of other nodes), builder arguments and output tables. Tables
+# named like artifacts are written to the output root, the others to
+# BUILD_DIR inside it.
+STAGES = {
+    'colors': (load_colors, ['raw/colors'], {}, ['colors']),
+    'brickset': (read_brickset, ['raw/brickset'], {}, ['brickset']),
+    'base': (join_tables, ['raw/sets', 'raw/themes', 'raw/inventories', 'raw/inventory_parts', 'colors'],
+             {}, ['Colors/pink_and_purple', 'Category/category_df',
+                  'Category/category_pink_purple', 'sets']),
+}
+
+# Every artifact built from the intermediate tables: builder, input tables
+# (intermediate tables or other artifacts) and builder arguments.
+ARTIFACTS = {
+    'Colors/pink_names': (color_family, ['Colors/pink_and_purple'], {'family': 'pink'}),
+    'Colors/purple_names': (color_family, ['Colors/pink_and_purple'], {'family': 'purple'}),
+    'Colors/theme_colors': (theme_colors, ['Colors/pink_and_purple'], {'measure': 'colors'}),
+    'Colors/theme_pieces': (theme_colors, ['Colors/pink_and_purple'], {'measure': 'pieces'}),
+    'Colors/theme_sets': (theme_sets, ['Colors/pink_and_purple'], {}),
+    'Colors/set_colors': (set_colors, ['Colors/pink_and_purple'], {'measure': 'colors'}),
+    'Colors/set_pieces': (set_colors, ['Colors/pink_and_purple'], {'measure': 'pieces'}),
+    'Colors/parts_most_colors': (parts_most_colors, ['Colors/pink_and_purple'], {}),
+    'Colors/color_pieces': (top_pieces, ['Colors/pink_and_purple'], {}),
+    'Colors/pink_exit': (color_timespans, ['colors'], {}),
+    'Summary/metrics': (summary_metrics, ['Colors/pink_and_purple', 'Category/category_df',
+                                          'Category/category_pink_purple'], {}),
+    'Category/year_cube': (year_cube, ['Colors/pink_and_purple', 'Category/category_df'], {}),
+    'Category/all_cat_theme_sets': (theme_sets, ['Category/category_df'], {'n': 5}),
+    'Category/cat_theme_sets': (theme_sets, ['Category/category_df'], {'n': 5, 'per_category': True}),
+    'Category/all_set_colors': (set_colors, ['Category/category_pink_purple'],
+                                {'measure': 'colors', 'n': 5, 'keep_category': True}),
+    'Category/cat_set_colors': (set_colors, ['Category/category_pink_purple'],
+                                {'measure': 'colors', 'n': 5, 'per_category': True}),
+    'Category/all_pink_pieces': (set_colors, ['Category/category_pink_purple'],
+                                 {'measure': 'pieces', 'n': 5, 'keep_category': True}),
+    'Category/cat_pink_pieces': (set_colors, ['Category/category_pink_purple'],
+                                 {'measure': 'pieces', 'n': 5, 'per_category': True}),
+    'Images/set_images': (set_images, ['Colors/set_colors', 'Colors/set_pieces', 'Category/all_set_colors',
+                                       'Category/cat_set_colors', 'Category/all_pink_pieces',
+                                       'Category/cat_pink_pieces'], {}),
+    'Category/cat_top_pieces': (top_pieces, ['Category/category_df'], {}),
+    'Category/pink_top_pieces': (top_pieces, ['Category/category_pink_purple'], {}),
+    'Recs/theme_counts': (theme_counts, ['sets'], {}),
+    'Recs/probability_df': (theme_probabilities, ['Recs/theme_counts'], {}),
+    'Recs/to_purchase': (to_purchase, ['sets', 'brickset', 'Recs/probability_df'], {}),
+    'Recs/purchase_df': (purchase_table, ['Recs/to_purchase'], {}),
+    'Recs/net_sets': (net_sets, ['Recs/to_purchase'], {}),
+}
+
+# Raw Rebrickable downloads read by the build.
+RAW_TABLES = ['sets', 'themes', 'colors', 'inventories', 'inventory_parts']
+
+# Intermediate tables and the build manifest live here, inside the output root.
+BUILD_DIR = '.build'
+
+# Modules of this project live here; code_digest follows the code they define.
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Constants hashed by code_digest; other objects (caches, locks) are state,
+# not code.
+CONSTANT_TYPES = (bool, int, float, complex, str, bytes, tuple, list, dict, set, frozenset, type(None))
+
+
+########################################################################
+def image_uri(source, images_dir):
+    """
+    Embeds an image as a data URI. Sources are paths relative to images_dir
+    or remote URLs, which are looked up in images_dir by file name and kept
+    as URLs when no local copy exists.
+
+    Args:
+        source (str): Relative image path or URL.
+        images_dir (str): Directory holding the local images.
+
+    Returns:
+        str: A data URI, the URL itself, or None when nothing is found.
+    """
+    if not isinstance(source, str) or not source:
+        return None
+    remote = bool(urlparse(source).scheme)
+    path = os.path.join(images_dir, os.path.basename(urlparse(source).path) if remote else source)
+    if not os.path.exists(path):
+        return source if remote else None
+    mime = mimetypes.guess_type(path)[0] or 'image/png'
+    with open(path, 'rb') as f:
+        return f'data:{mime};base64,' + base64.b64encode(f.read()).decode()
+
+
+########################################################################
+def build_graph(last_year=LAST_YEAR):
+    """
+    Lists the nodes of the build DAG: the intermediate stages and the
+    artifacts.
+
+    Args:
+        last_year (int, optional): Last release year included (default is
+            LAST_YEAR); passed to every builder that takes it.
+
+    Returns:
+        dict: Node name to (builder, inputs, arguments, output tables), in
+            dependency order.
+    """
+    graph = {name: (builder, inputs, dict(params), outputs)
+             for name, (builder, inputs, params, outputs) in STAGES.items()}
+    graph.update({name: (builder, inputs, dict(params), [name])
+                  for name, (builder, inputs, params) in ARTIFACTS.items()})
+    for builder, _, params, _ in graph.values():
+        if 'last_year' in inspect.signature(builder).parameters:
+            params['last_year'] = last_year
+    return graph
+
+
+########################################################################
+def _global_names(code):
+    """Global names read by a code object and the code nested in it."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _global_names(const)
+    return names
+
+
+########################################################################
+def _in_project(value):
+    """Whether a module, function or class comes from a module of this project."""
+    module = value if inspect.ismodule(value) else inspect.getmodule(value)
+    source = getattr(module, '__file__', None)
+    return source is not None and os.path.dirname(os.path.abspath(source)) == PROJECT_DIR
+
+
+########################################################################
+def _read_values(func):
+    """
+    Lists the values a function reads: its globals, and the attributes it
+    reads from the modules of this project (e.g. rc.rank_themes).
+
+    Args:
+        func (function): The function.
+
+    Returns:
+        dict: Name (module.attribute for attributes) to value.
+    """
+    names = _global_names(func.__code__)
+    values = {}
+    for name in sorted(names):
+        if name not in func.__globals__:
+            continue
+        value = values[name] = func.__globals__[name]
+        if inspect.ismodule(value) and _in_project(value):
+            for attribute in sorted(names & vars(value).keys()):
+                values[f'{name}.{attribute}'] = getattr(value, attribute)
+    return values
+
+
+########################################################################
+def code_digest(funcs, params):
+    """
+    Hashes the code behind a node: the source of its functions, of every
+    function and class of this project they call (directly or through
+    their module, e.g. rc.rank_themes) and of the constants they read
+    (e.g. FAMILY_THRESHOLDS or pl.MIN_CHROMA), plus the builder arguments.
+
+    Args:
+        funcs (list): Functions run by the node.
+        params (dict): Builder arguments.
+
+    Returns:
+        str: Hex sha256 digest.
+    """
+    sha = hashlib.sha256(repr(sorted(params.items())).encode())
+    seen = set()
+    stack = list(funcs)
+    while stack:
+        code = stack.pop()
+        key = (code.__module__, code.__qualname__)
+        if key in seen:
+            continue
+        seen.add(key)
+        sha.update(inspect.getsource(code).encode())
+        if inspect.isclass(code):
+            for member in vars(code).values():
+                member = getattr(member, '__func__', member)
+                if inspect.isfunction(member):
+                    stack.append(member)
+            continue
+        for name, value in _read_values(code).items():
+            if inspect.isfunction(value) or inspect.isclass(value):
+                if _in_project(value):
+                    stack.append(value)
+            elif isinstance(value, CONSTANT_TYPES):
+                # sets repr in hash order, which changes between processes
+                if isinstance(value, (set, frozenset)):
+                    value = sorted(value, key=repr)
+                sha.update(f'{name}={value!r}'.encode())
+    return sha.hexdigest()
+
+
+########################################################################
+def table_path(out_dir, table):
+    """
+    Returns where a table of the build is stored.
+
+    Args:
+        out_dir (str): Output root, e.g. 'LegoData'.
+        table (str): Artifact name (e.g. 'Colors/pink_names') or
+            intermediate table name (e.g. 'sets').
+
+    Returns:
+        str: Path of the stored pickle.
+    """
+    if '/' in table:
+        return os.path.join(out_dir, table)
+    return os.path.join(out_dir, BUILD_DIR, table)
+
+
+########################################################################
+def read_manifest(out_dir):
+    """
+    Reads the build manifest: for every node, the hashes of its code, its
+    inputs and its outputs when it was last built.
+
+    Args:
+        out_dir (str): Output root.
+
+    Returns:
+        dict: The manifest (empty when nothing was built yet).
+    """
+    path = os.path.join(out_dir, BUILD_DIR, 'manifest.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+########################################################################
+def write_manifest(manifest, out_dir):
+    """
+    Writes the build manifest atomically.
+
+    Args:
+        manifest (dict): The manifest.
+        out_dir (str): Output root.
+    """
+    path = os.path.join(out_dir, BUILD_DIR, 'manifest.json')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp{os.getpid()}'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+########################################################################
+def stale_reasons(record, code, inputs, outputs, out_dir):
+    """
+    Explains why a node has to be rebuilt.
+
+    Args:
+        record (dict): The node's manifest entry (None if never built).
+        code (str): Current code digest of the node.
+        inputs (dict): Current digest of each input (None for inputs that
+            are about to be rebuilt).
+        outputs (list): Output tables of the node.
+        out_dir (str): Output root.
+
+    Returns:
+        list: Reasons to rebuild; empty when the node is up to date.
+    """
+    if record is None:
+        return ['never built']
+    reasons = []
+    if record['code'] != code:
+        reasons.append('code changed')
+    for table, digest in inputs.items():
+        if digest is None:
+            reasons.append(f'{table} is rebuilt')
+        elif record['inputs'].get(table) != digest:
+            reasons.append(f'{table} changed')
+    for table in outputs:
+        path = table_path(out_dir, table)
+        if not os.path.exists(path):
+            reasons.append(f'{table} missing')
+        elif ll.file_digest(path) != record['outputs'].get(table):
+            reasons.append(f'{table} modified on disk')
+    return reasons
+
+
+########################################################################
+def build_node(builder, frames, params, images_dir=None):
+    """
+    Runs the builder of one node (in a worker process).
+
+    Args:
+        builder (callable): The node's builder.
+        frames (list): Input tables (paths for raw downloads).
+        params (dict): Builder arguments.
+        images_dir (str, optional): Directory holding the local images; the
+            'image' column of the outputs is embedded from it (default is
+            None, for stages).
+
+    Returns:
+        tuple: The output tables and the seconds spent.
+    """
+    start = time.perf_counter()
+    result = builder(*frames, **params)
+    result = result if isinstance(result, tuple) else (result,)
+    if images_dir is not None:
+        for df in result:
+            if 'image' in df:
+                df['image'] = df['image'].map(lambda source: image_uri(source, images_dir))
+    return result, time.perf_counter() - start
+
+
+########################################################################
+def write_output(df, out_dir, table):
+    """
+    Writes a table of the build atomically, refreshing any columnar copy
+    next to it so that it never shadows the new pickle.
+
+    Args:
+        df (pandas.DataFrame): The table.
+        out_dir (str): Output root, e.g. 'LegoData'.
+        table (str): Table name, e.g. 'Colors/pink_names'.
+
+    Returns:
+        str: Path of the written pickle.
+    """
+    data_path = table_path(out_dir, table)
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+    tmp_path = f'{data_path}.tmp{os.getpid()}'
+    df.to_pickle(tmp_path)
+    os.replace(tmp_path, data_path)
+    for suffix in ll.COLUMNAR_SUFFIXES:
+        if os.path.exists(data_path + suffix):
+            ll.write_artifact(df, data_path, suffix[1:])
+    return data_path
+
+
+########################################################################
+def build(raw_dir, out_dir='LegoData', brickset=None, images_dir='LegoImages',
+          workers=None, last_year=LAST_YEAR, only=None, force=False, dry_run=False):
+    """
+    Brings the LegoData artifacts up to date with the raw downloads.
+
+    The build is a DAG of raw downloads, intermediate stages and artifacts.
+    The manifest records the content hashes of each node's code, inputs and
+    outputs, and only stale nodes are rebuilt, in a process pool, as soon as
+    their inputs are settled. A rebuilt node whose output is unchanged
+    leaves the nodes downstream of it up to date.
+
+    Args:
+        raw_dir (str): Directory holding the Rebrickable downloads.
+        out_dir (str, optional): Output root (default is 'LegoData').
+        brickset (str, optional): Brickset CSV; the recommendation artifacts
+            that need it are skipped without one (default is None).
+        images_dir (str, optional): Local palette, theme logo and part
+            images (default is 'LegoImages').
+        workers (int, optional): Worker processes (default is one per CPU).
+        last_year (int, optional): Last release year included (default is
+            LAST_YEAR).
+        only (list, optional): Only bring these nodes and the nodes they
+            depend on up to date (default is all).
+        force (bool, optional): Rebuild every node (default is False).
+        dry_run (bool, optional): Only report what would be rebuilt (default
+            is False).
+
+    Returns:
+        dict: 'built' maps each rebuilt node to its seconds (None on a dry
+            run) and reasons; 'fresh' and 'skipped' list the other nodes.
+    """
+    graph = build_graph(last_year)
+    sources = {f'raw/{name}': raw_path(raw_dir, name) for name in RAW_TABLES}
+    if brickset:
+        sources['raw/brickset'] = brickset
+    producer = {table: node for node, spec in graph.items() for table in spec[3]}
+
+    needed = set()
+    stack = list(graph if only is None else only)
+    while stack:
+        node = stack.pop()
+        if node not in needed:
+            needed.add(node)
+            stack.extend(producer[table] for table in graph[node][1] if table in producer)
+
+    manifest = read_manifest(out_dir)
+    digests = {source: ll.file_digest(path) for source, path in sources.items()}
+    unavailable = {'raw/brickset'} - set(sources)
+    tables = {}
+    report = {'built': {}, 'fresh': [], 'skipped': []}
+    pending = [node for node in graph if node in needed]
+    running = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            for node in list(pending):
+                builder, inputs, params, outputs = graph[node]
+                if not all(table in digests or table in unavailable for table in inputs):
+                    continue
+                pending.remove(node)
+                if unavailable & set(inputs):
+                    unavailable.update(outputs)
+                    report['skipped'].append(node)
+                    continue
+
+                funcs = [builder] if node in STAGES else [builder, image_uri]
+                code = code_digest(funcs, params)
+                input_digests = {table: digests[table] for table in inputs}
+                reasons = ['forced'] if force else \
+                    stale_reasons(manifest.get(node), code, input_digests, outputs, out_dir)
+                if not reasons:
+                    digests.update(manifest[node]['outputs'])
+                    report['fresh'].append(node)
+                elif dry_run:
+                    digests.update(dict.fromkeys(outputs))
+                    report['built'][node] = (None, reasons)
+                else:
+                    frames = [sources[table] if table in sources else
+                              tables[table] if table in tables else
+                              pd.read_pickle(table_path(out_dir, table)) for table in inputs]
+                    future = pool.submit(build_node, builder, frames, params,
+                                         None if node in STAGES else images_dir)
+                    running[future] = node, code, input_digests, reasons
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                node, code, input_digests, reasons = running.pop(future)
+                results, seconds = future.result()
+                output_digests = {}
+                for table, df in zip(graph[node][3], results):
+                    tables[table] = df
+                    output_digests[table] = ll.file_digest(write_output(df, out_dir, table))
+                digests.update(output_digests)
+                manifest[node] = {'code': code, 'inputs': input_digests, 'outputs': output_digests}
+                write_manifest(manifest, out_dir)
+                report['built'][node] = (seconds, reasons)
+
+    return report
+
+
+########################################################################
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the LegoData artifacts.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_parser = commands.add_parser('build', help='bring the artifacts up to date with raw downloads')
+    build_parser.add_argument('raw_dir', help='directory with the Rebrickable CSV downloads')
+    build_parser.add_argument('--out', default='LegoData', help='output root (default LegoData)')
+    build_parser.add_argument('--brickset', help='Brickset CSV export for the recommendations')
+    build_parser.add_argument('--images', default='LegoImages', help='local image directory')
+    build_parser.add_argument('--workers', type=int, help='worker processes (default: CPUs)')
+    build_parser.add_argument('--last-year', type=int, default=LAST_YEAR)
+    build_parser.add_argument('--only', nargs='+', metavar='NODE',
+                              help='only build these nodes, e.g. Colors/pink_names')
+    build_parser.add_argument('--force', action='store_true', help='rebuild every node')
+    build_parser.add_argument('--dry-run', action='store_true',
+                              help='print what would be rebuilt and why, without building')
+    tag_parser = commands.add_parser('tag', help='count the sets tagged with each category')
+    tag_parser.add_argument('raw_dir', help='directory with the Rebrickable CSV downloads')
+    tag_parser.add_argument('--keywords', help='JSON object of category to keywords, in priority '
+                                               '(default CATEGORY_KEYWORDS)')
+    args = parser.parse_args()
+
+    if args.command == 'tag':
+        category_keywords = CATEGORY_KEYWORDS
+        if args.keywords:
+            with open(args.keywords) as f:
+                category_keywords = list(json.load(f).items())
+        themes = read_raw(raw_path(args.raw_dir, 'themes'), 'themes') \
+            .rename(columns={'id': 'theme_id', 'name': 'theme_name'})
+        sets = read_raw(raw_path(args.raw_dir, 'sets'), 'sets').rename(columns={'name': 'set_name'}) \
+            .merge(themes, on='theme_id', how='left')
+        start = time.perf_counter()
+        tags = tag_categories(sets, category_keywords)
+        seconds = time.perf_counter() - start
+        labels = tags.drop(columns=['category'])
+        for label in labels.columns:
+            print(f"{label}: {labels[label].sum()} tagged, {(tags['category'] == label).sum()} as main category")
+        print(f"{len(sets)} sets tagged in {seconds:.3f}s, "
+              f"{(labels.sum(axis=1) > 1).sum()} in more than one category")
+        raise SystemExit
+
+    report = build(args.raw_dir, args.out, args.brickset, args.images, args.workers,
+                   args.last_year, args.only, args.force, args.dry_run)
+    for node, (seconds, reasons) in report['built'].items():
+        action = 'would rebuild' if seconds is None else f'built in {seconds:.2f}s:'
+        print(f"{node} {action} {', '.join(reasons)}")
+    for node in report['skipped']:
+        print(f'{node} skipped (no Brickset export)')
+    print(f"{len(report['built'])} rebuilt, {len(report['fresh'])} up to date")
@@ -0,0 +1,588 @@
+"""
+A group of functions used to memoize the Vega-Lite specs of the LEGO
+analysis charts, in each process and in an on-disk store shared by every
+worker on the host.
+"""
+
+import contextlib
+import hashlib
+import inspect
+import json
+import os
+import re
+import sys
+import threading
+import time
+import warnings
+
+import altair as alt
+import cachetools
+import numpy as np
+import pandas as pd
+
+import load_legos as ll
+import thumbs_legos as tl
+
+try:
+    import fcntl
+except ImportError:  # Windows: the store lock only covers this process
+    fcntl = None
+
+# Maximum number of chart specs kept by the in-process spec cache.
+SPEC_CACHE_ENTRIES = int(os.environ.get('LEGO_SPEC_CACHE_ENTRIES', 256))
+
+# Directory of the on-disk spec store, shared by the workers of a host and
+# kept across restarts; empty disables it.
+SPEC_STORE_DIR = os.environ.get('LEGO_SPEC_STORE_DIR', os.path.join('.cache', 'specs'))
+
+# Disk budget of the spec store, in megabytes.
+SPEC_STORE_BUDGET_MB = int(os.environ.get('LEGO_SPEC_STORE_BUDGET_MB', 64))
+
+# Libraries that shape a spec; a stored spec is only reused with the same
+# versions.
+LIBRARY_VERSIONS = {'altair': alt.__version__,
+                    'vega-lite': alt.SCHEMA_VERSION,
+                    'pandas': pd.__version__,
+                    'numpy': np.__version__}
+
+# Plot function arguments that name a LegoData artifact.
+ARTIFACT_ARGS = ('data_path', 'image_file', 'all_path')
+
+# A warning is issued for every chart whose spec is larger than this, in
+# kilobytes (0 disables the check).
+PAYLOAD_BUDGET_KB = int(os.environ.get('LEGO_PAYLOAD_BUDGET_KB', 1024))
+
+# Fields read by Vega expressions, e.g. datum.quantity or datum['set name'].
+DATUM_FIELD = re.compile(r"""datum\.(\w+)|datum\[['"](.+?)['"]\]""")
+
+
+########################################################################
+def _normalize(value):
+    """json.dumps hook for the chart arguments that are not plain JSON."""
+    if hasattr(value, 'item'):
+        return value.item()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return repr(value)
+
+
+########################################################################
+def spec_key(plot_func, *args, **kwargs):
+    """
+    Builds the cache key of a chart: the plot function, its normalized
+    arguments, the content hash of every artifact it reads and the state of
+    the thumbnail store, whose URLs the chart data holds (see
+    thumbs_legos.ThumbStore.generation).
+
+    Args:
+        plot_func (callable): A plot function from graph_legos.
+        *args: Positional arguments for plot_func.
+        **kwargs: Keyword arguments for plot_func.
+
+    Returns:
+        tuple: Function name, JSON encoded arguments, artifact hashes and
+            thumbnail store state.
+    """
+    bound = inspect.signature(plot_func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = dict(bound.arguments)
+    digests = []
+    for name in ARTIFACT_ARGS:
+        if arguments.get(name):
+            arguments[name] = os.path.abspath(arguments[name])
+            digests.append(ll.artifact_digest(arguments[name]))
+
+    name = f'{plot_func.__module__}.{plot_func.__qualname__}'
+    encoded = json.dumps(arguments, sort_keys=True, default=_normalize)
+    return name, encoded, tuple(digests), tl.thumb_store.generation()
+
+
+########################################################################
+def _spec_strings(node):
+    """Every string value of a spec (mapping keys excluded)."""
+    if isinstance(node, str):
+        yield node
+    elif isinstance(node, dict):
+        for value in node.values():
+            yield from _spec_strings(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _spec_strings(value)
+
+
+########################################################################
+def referenced_fields(spec):
+    """
+    Collects the data fields a spec can read: every string of the spec
+    outside its datasets (encoding, tooltip, sort, param and transform
+    fields) and every field used in a Vega expression.
+
+    Args:
+        spec (dict): A Vega-Lite spec.
+
+    Returns:
+        set: Names of the referenced fields.
+    """
+    fields = set()
+    for text in _spec_strings({k: v for k, v in spec.items() if k != 'datasets'}):
+        fields.add(text)
+        for match in DATUM_FIELD.finditer(text):
+            fields.add(match.group(1) or match.group(2))
+    return fields
+
+
+########################################################################
+def prune_datasets(spec):
+    """
+    Drops the inline data columns that the spec never references.
+
+    Args:
+        spec (dict): A Vega-Lite spec with its data in 'datasets'; it is
+            modified in place.
+
+    Returns:
+        dict: The pruned spec.
+    """
+    fields = referenced_fields(spec)
+    for name, rows in spec.get('datasets', {}).items():
+        spec['datasets'][name] = [{k: v for k, v in row.items() if k in fields}
+                                  for row in rows]
+    return spec
+
+
+########################################################################
+def payload_size(spec):
+    """
+    Measures what a chart sends to the browser.
+
+    Args:
+        spec (dict): A Vega-Lite spec.
+
+    Returns:
+        dict: Bytes of inline data, total spec bytes and inline data rows.
+    """
+    datasets = spec.get('datasets', {})
+    return {'data_bytes': len(json.dumps(datasets)),
+            'spec_bytes': len(json.dumps(spec)),
+            'rows': sum(len(rows) for rows in datasets.values())}
+
+
+########################################################################
+def render_spec(chart):
+    """
+    Serializes an altair chart the way st.altair_chart does: without the
+    default theme's width/height and with the data inlined in 'datasets'.
+    Data columns the chart never uses are left out.
+
+    Args:
+        chart (altair.Chart): The chart to serialize.
+
+    Returns:
+        dict: The Vega-Lite spec of the chart.
+    """
+    with alt.themes.enable('none'), \
+            alt.data_transformers.enable('default', max_rows=None):
+        return prune_datasets(chart.to_dict())
+
+
+########################################################################
+def code_digest(plot_func):
+    """
+    Hashes the code a plot function runs: the source of its module and of
+    the modules of this project it imports.
+
+    Args:
+        plot_func (callable): A plot function from graph_legos.
+
+    Returns:
+        str: Hex sha256 digest of the source files.
+    """
+    module = sys.modules[plot_func.__module__]
+    folder = os.path.dirname(os.path.abspath(module.__file__))
+    files = {os.path.abspath(module.__file__)}
+    for value in vars(module).values():
+        source = getattr(value, '__file__', None) if inspect.ismodule(value) else None
+        if source and os.path.dirname(os.path.abspath(source)) == folder:
+            files.add(os.path.abspath(source))
+    sha = hashlib.sha256()
+    for file_path in sorted(files):
+        sha.update(ll.file_digest(file_path).encode())
+    return sha.hexdigest()
+
+
+########################################################################
+class SpecStore:
+    """
+    On-disk store of finished Vega-Lite specs shared by every process of a
+    host. Each spec is one JSON file named by the hash of its key, which
+    adds the plot code (see code_digest) and LIBRARY_VERSIONS to the spec
+    key, so a deploy that changes neither the data nor the code finds its
+    specs again. Files are written under a temporary name and moved into
+    place; a file's modification time is its last use, and once the store
+    exceeds its budget the least recently used specs are deleted under a
+    file lock.
+
+    Args:
+        root (str, optional): Store directory (default is SPEC_STORE_DIR).
+        max_bytes (int, optional): Disk budget in bytes (default is
+            SPEC_STORE_BUDGET_MB megabytes).
+    """
+
+    def __init__(self, root=SPEC_STORE_DIR, max_bytes=SPEC_STORE_BUDGET_MB * 2 ** 20):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Holds the store lock, across processes where fcntl exists."""
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            with open(os.path.join(self.root, '.lock'), 'a') as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                yield
+
+    def _file(self, key):
+        """File of a stored key and the key's JSON encoding."""
+        encoded = json.dumps(key)
+        return os.path.join(self.root, hashlib.sha256(encoded.encode()).hexdigest() + '.json'), encoded
+
+    def store_key(self, plot_func, key):
+        """
+        Extends a spec key (see spec_key) to a store key.
+
+        Args:
+            plot_func (callable): The plot function of the spec.
+            key (tuple): Its spec key.
+
+        Returns:
+            list: The spec key (thumbnail store generation and offline mode
+                included, as the stored data holds their URLs), code digest
+                and library versions.
+        """
+        return [*key[:2], list(key[2]), key[3], code_digest(plot_func), LIBRARY_VERSIONS]
+
+    def get(self, key):
+        """
+        Returns a stored spec, marking it as just used.
+
+        Args:
+            key (list): A store key.
+
+        Returns:
+            tuple: The spec and its payload size, or None when not stored.
+        """
+        file_path, encoded = self._file(key)
+        try:
+            with open(file_path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('key') != encoded:
+            return None
+        try:
+            os.utime(file_path)
+        except OSError:
+            pass
+        return entry['spec'], entry['size']
+
+    def put(self, key, spec, size):
+        """
+        Stores a spec, then evicts specs while the store is over budget.
+
+        Args:
+            key (list): A store key.
+            spec (dict): The Vega-Lite spec.
+            size (dict): Its payload size (see payload_size).
+        """
+        file_path, encoded = self._file(key)
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f'{file_path}.tmp{os.getpid()}.{threading.get_ident()}'
+        with open(tmp_path, 'w') as f:
+            json.dump({'key': encoded, 'size': size, 'spec': spec}, f)
+        os.replace(tmp_path, file_path)
+        self.evict()
+
+    def _files(self):
+        """Path, size and last use of every stored spec."""
+        try:
+            entries = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return []
+        files = []
+        for entry in entries:
+            if entry.name.endswith('.json'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((entry.path, stat.st_size, stat.st_mtime))
+        return files
+
+    def evict(self, max_bytes=None):
+        """
+        Deletes the least recently used specs until the store fits its
+        budget.
+
+        Args:
+            max_bytes (int, optional): Budget in bytes (default is the store's).
+
+        Returns:
+            int: Number of specs deleted.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with self._locked():
+            files = sorted(self._files(), key=lambda file: file[2])
+            total = sum(file[1] for file in files)
+            dropped = 0
+            for file_path, nbytes, _ in files:
+                if total <= max_bytes:
+                    break
+                try:
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    pass
+                total -= nbytes
+                dropped += 1
+            return dropped
+
+    def clear(self):
+        """
+        Deletes every stored spec.
+
+        Returns:
+            int: Number of specs deleted.
+        """
+        return self.evict(0)
+
+    def stats(self):
+        """
+        Returns the store counters.
+
+        Returns:
+            dict: Stored specs, bytes on disk, the budget and the age in
+                seconds of the least recently used spec.
+        """
+        files = self._files()
+        return {'entries': len(files),
+                'bytes': sum(file[1] for file in files),
+                'max_bytes': self.max_bytes,
+                'oldest_s': time.time() - min(file[2] for file in files) if files else 0.0}
+
+
+########################################################################
+class SpecCache:
+    """
+    Bounded, thread-safe LRU cache of finished Vega-Lite specs. The payload
+    size of every spec is recorded when it is built, with a warning when it
+    exceeds the budget. Specs missing from the cache are looked up in the
+    on-disk store, if any, before being built, and built specs are stored.
+    Concurrent misses of one spec are built once (see load_legos.SingleFlight).
+
+    Args:
+        max_entries (int, optional): Maximum number of cached specs
+            (default is SPEC_CACHE_ENTRIES).
+        budget_kb (int, optional): Spec size budget in kilobytes, 0 for none
+            (default is PAYLOAD_BUDGET_KB).
+        store (SpecStore, optional): On-disk store shared with other
+            processes (default is None).
+    """
+
+    def __init__(self, max_entries=SPEC_CACHE_ENTRIES, budget_kb=PAYLOAD_BUDGET_KB, store=None):
+        self._lock = threading.RLock()
+        self._specs = cachetools.LRUCache(maxsize=max_entries)
+        self.budget_kb = budget_kb
+        self.store = store
+        self._flight = ll.SingleFlight()
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    def get(self, plot_func, *args, **kwargs):
+        """
+        Returns the spec of plot_func(*args, **kwargs), building it on a miss.
+
+        Returns:
+            dict: The cached spec. It is shared, so callers must not modify it.
+        """
+        key = spec_key(plot_func, *args, **kwargs)
+        with self._lock:
+            entry = self._specs.get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry[0]
+        return self._flight.do(key, lambda: self._build(key, plot_func, *args, **kwargs))
+
+    def _build(self, key, plot_func, *args, **kwargs):
+        """Reads a missing spec from the store or builds it, and caches it."""
+        store = self.store
+        stored = None
+        if store is not None:
+            store_key = store.store_key(plot_func, key)
+            stored = store.get(store_key)
+        if stored is not None:
+            spec, size = stored
+        else:
+            spec = render_spec(plot_func(*args, **kwargs))
+            size = payload_size(spec)
+            if self.budget_kb and size['spec_bytes'] > self.budget_kb * 1024:
+                warnings.warn(f"{key[0]} spec is {size['spec_bytes'] / 1024:.0f} KB, "
+                              f"over the {self.budget_kb} KB budget ({key[1]})", stacklevel=5)
+            if store is not None:
+                store.put(store_key, spec, size)
+        with self._lock:
+            if stored is not None:
+                self.store_hits += 1
+            else:
+                self.misses += 1
+            self._specs[key] = (spec, size)
+        return spec
+
+    def payloads(self):
+        """
+        Reports the payload size of every cached spec, largest first.
+
+        Returns:
+            list: One dict per spec with the chart name, its arguments, the
+                data_bytes, spec_bytes and rows of payload_size, and whether
+                it exceeds the budget.
+        """
+        with self._lock:
+            entries = list(self._specs.items())
+        report = [dict(chart=key[0], arguments=key[1], **size,
+                       over_budget=bool(self.budget_kb)
+                       and size['spec_bytes'] > self.budget_kb * 1024)
+                  for key, (_, size) in entries]
+        return sorted(report, key=lambda row: row['spec_bytes'], reverse=True)
+
+    def invalidate(self, plot_func=None, data_path=None):
+        """
+        Drops the cached specs of a plot function and/or an artifact; with no
+        arguments every spec is dropped.
+
+        Args:
+            plot_func (callable, optional): Only drop specs of this function.
+            data_path (str, optional): Only drop specs that read this artifact.
+
+        Returns:
+            int: Number of specs dropped.
+        """
+        name = plot_func and f'{plot_func.__module__}.{plot_func.__qualname__}'
+        path = data_path and json.dumps(os.path.abspath(data_path))
+        with self._lock:
+            stale = [key for key in self._specs
+                     if (name is None or key[0] == name)
+                     and (path is None or path in key[1])]
+            for key in stale:
+                del self._specs[key]
+        return len(stale)
+
+    def clear(self):
+        """Drops every cached spec (the on-disk store is kept) and resets the counters."""
+        with self._lock:
+            self._specs.clear()
+            self.hits = 0
+            self.store_hits = 0
+            self.misses = 0
+        self._flight.reset()
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: Hits, hits from the on-disk store, misses (specs built),
+                cached entries and the entry limit, with the misses
+                coalesced into another build and their wait (see
+                load_legos.SingleFlight.stats).
+        """
+        flight = self._flight.stats()
+        with self._lock:
+            return {'hits': self.hits,
+                    'store_hits': self.store_hits,
+                    'misses': self.misses,
+                    'coalesced': flight['coalesced'],
+                    'wait_s': flight['wait_s'],
+                    'max_wait_s': flight['max_wait_s'],
+                    'entries': len(self._specs),
+                    'max_entries': int(self._specs.maxsize)}
+
+
+spec_cache = SpecCache(store=SpecStore() if SPEC_STORE_DIR else None)
+
+
+########################################################################
+def chart_spec(plot_func, *args, **kwargs):
+    """
+    Returns the Vega-Lite spec of a graph_legos chart through the process-wide
+    spec cache, ready for st.vega_lite_chart.
+
+    Args:
+        plot_func (callable): A plot function from graph_legos.
+        *args: Positional arguments for plot_func.
+        **kwargs: Keyword arguments for plot_func.
+
+    Returns:
+        dict: The shared Vega-Lite spec.
+    """
+    return spec_cache.get(plot_func, *args, **kwargs)
+
+
+########################################################################
+def with_params(spec, **values):
+    """
+    Sets the values of top-level params of a shared spec (e.g. a marker
+    moved by a widget) without building the chart again. Only the top
+    level and its params are copied; the datasets stay shared.
+
+    Args:
+        spec (dict): A spec from chart_spec.
+        **values: Param name to its value.
+
+    Returns:
+        dict: The spec with the new param values.
+    """
+    params = [{**param, 'value': values[param['name']]} if param['name'] in values else param
+              for param in spec.get('params', [])]
+    return {**spec, 'params': params}
+
+
+########################################################################
+if __name__ == '__main__':
+    import argparse
+    import glob
+
+    from streamlit.testing.v1 import AppTest
+
+    # the pages use the imported module, not this __main__ copy
+    import cache_legos
+    spec_cache = cache_legos.spec_cache
+    parser = argparse.ArgumentParser(
+        description='Render every page headlessly and report the payload of each chart.')
+    parser.add_argument('--budget-kb', type=int, default=PAYLOAD_BUDGET_KB,
+                        help=f'spec size budget in KB (default {PAYLOAD_BUDGET_KB})')
+    parser.add_argument('--clear-store', action='store_true',
+                        help='delete the specs of the on-disk store instead of rendering')
+    args = parser.parse_args()
+
+    if args.clear_store:
+        if spec_cache.store is not None:
+            print(f'deleted {spec_cache.store.clear()} stored specs from {spec_cache.store.root}')
+        raise SystemExit
+
+    spec_cache.budget_kb = args.budget_kb
+    for script in ['intro.py'] + sorted(glob.glob('pages/*.py')):
+        AppTest.from_file(script, default_timeout=120).run()
+
+    report = spec_cache.payloads()
+    print(f"{'spec KB':>8} {'data KB':>8} {'rows':>6}  chart")
+    for row in report:
+        flag = '  OVER BUDGET' if row['over_budget'] else ''
+        print(f"{row['spec_bytes'] / 1024:8.1f} {row['data_bytes'] / 1024:8.1f} {row['rows']:6d}  "
+              f"{row['chart'].split('.')[-1]} {row['arguments']}{flag}")
+    print(f"{len(report)} charts, {sum(row['spec_bytes'] for row in report) / 1024:.0f} KB in total")
+    if spec_cache.store is not None:
+        stats = spec_cache.store.stats()
+        print(f"spec store {spec_cache.store.root}: {stats['entries']} specs, {stats['bytes'] / 1024:.0f} KB "
+              f"({spec_cache.stats()['store_hits']} reused this run)")
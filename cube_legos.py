@@ -0,0 +1,141 @@
+"""
+A group of functions used to count pieces, shapes, sets and themes per year
+from one aggregate cube of the LegoData parts, indexed by year, category,
+color family, color and theme.
+"""
+
+import numpy as np
+import pandas as pd
+
+import load_legos as ll
+
+# Dimensions of the cube.
+DIMENSIONS = ('year', 'category', 'family', 'color_name', 'theme_name')
+
+# Category of the sets that belong to no category.
+NO_CATEGORY = 'none'
+
+# Members counted once per cell by distinct-count measures, next to the
+# dimensions themselves (e.g. 'theme_name' counts the themes of a cell).
+MEMBERS = ('set_num', 'part_num')
+
+
+########################################################################
+class YearCube:
+    """
+    Sparse cube of part counts. Every fact is one year, category, color
+    family, color, theme, set and shape with its number of pieces, stored
+    as integer codes into sorted labels. Slices select facts; rollups sum
+    pieces and count distinct sets, shapes, themes or colors per cell, so
+    distinct counts stay exact at any level.
+    """
+
+    def __init__(self, labels, codes, quantity, hexes):
+        self.labels = labels
+        self.codes = codes
+        self.quantity = quantity
+        self.hexes = hexes
+
+    @classmethod
+    def from_facts(cls, facts):
+        """
+        Builds a cube from a year_cube artifact.
+
+        Args:
+            facts (pandas.DataFrame): One row per DIMENSIONS and MEMBERS
+                value with its quantity (and the hex of its color).
+
+        Returns:
+            YearCube: The cube over every fact.
+        """
+        labels, codes = {}, {}
+        for column in DIMENSIONS + MEMBERS:
+            values, index = pd.factorize(facts[column], sort=True)
+            codes[column] = values.astype(np.int32)
+            labels[column] = pd.Index(np.asarray(index), name=column)
+        hexes = facts.groupby('color_name', observed=True)['hex'].first().astype(str)
+        return cls(labels, codes, facts['quantity'].to_numpy(np.int64), hexes)
+
+    @property
+    def years(self):
+        """Every year from the first to the last of the cube's facts."""
+        present = self.labels['year'][np.unique(self.codes['year'])]
+        if not len(present):
+            return np.array([], dtype=int)
+        return np.arange(int(present.min()), int(present.max()) + 1)
+
+    def slice(self, **filters):
+        """
+        Selects the facts matching every filter.
+
+        Args:
+            **filters: Dimension name to a value or list of values; None
+                keeps every value.
+
+        Returns:
+            YearCube: A cube over the selected facts (sharing the labels).
+        """
+        mask = np.ones(len(self.quantity), dtype=bool)
+        for dim, values in filters.items():
+            if values is None:
+                continue
+            if np.ndim(values) == 0:
+                values = [values]
+            wanted = self.labels[dim].get_indexer(values)
+            mask &= np.isin(self.codes[dim], wanted[wanted >= 0])
+        codes = {column: values[mask] for column, values in self.codes.items()}
+        return YearCube(self.labels, codes, self.quantity[mask], self.hexes)
+
+    def rollup(self, by, measures=('quantity', 'part_num', 'set_num')):
+        """
+        Aggregates the cube to the given dimensions.
+
+        Args:
+            by (list): Dimensions to keep, e.g. ['year', 'color_name'].
+            measures (tuple, optional): 'quantity' (pieces) and any of
+                MEMBERS or DIMENSIONS, counted distinctly per cell (default
+                is pieces, shapes and sets).
+
+        Returns:
+            pandas.DataFrame: One row per non-empty cell with the kept
+                dimensions (plus hex when colors are kept) and the measures.
+        """
+        shape = [len(self.labels[dim]) for dim in by]
+        if by:
+            cell = np.ravel_multi_index([self.codes[dim] for dim in by], shape)
+        else:
+            cell = np.zeros(len(self.quantity), dtype=np.int64)
+        cells, inverse = np.unique(cell, return_inverse=True)
+
+        out = {}
+        if by:
+            for dim, codes in zip(by, np.unravel_index(cells, shape)):
+                out[dim] = self.labels[dim][codes]
+        for measure in measures:
+            if measure == 'quantity':
+                out[measure] = np.bincount(inverse, weights=self.quantity,
+                                           minlength=len(cells)).astype(np.int64)
+            else:
+                members = len(self.labels[measure])
+                pairs = np.unique(inverse.astype(np.int64) * members + self.codes[measure])
+                out[measure] = np.bincount(pairs // members, minlength=len(cells))
+        source = pd.DataFrame(out)
+        if 'color_name' in by:
+            source.insert(by.index('color_name') + 1, 'hex',
+                          source['color_name'].map(self.hexes))
+        return source
+
+
+########################################################################
+def read_cube(data_path):
+    """
+    Loads the cube of a year_cube artifact, rebuilding it only when the
+    artifact changes.
+
+    Args:
+        data_path (str): Path to the year_cube artifact.
+
+    Returns:
+        YearCube: The cube over every fact of the artifact.
+    """
+    return ll.memo_artifact(data_path, YearCube.from_facts)
@@ -7,22 +7,143 @@ import altair as alt
 import numpy as np
 import pandas as pd
 
+import cube_legos as cu
+import load_legos as ll
+import metrics_legos as mt
+import recs_legos as rc
+import thumbs_legos as tl
+
+# Options of the in-chart category picker, in page order.
+CATEGORY_OPTIONS = ['all', 'princess', 'unicorn', 'fairy', 'mermaid', 'kitty']
+
+
+########################################################################
+def _thumbs(df, size, column='image'):
+    """Points an image column at the served thumbnails (see thumbs_legos)."""
+    return df.assign(**{column: tl.thumb_urls(df[column], size)})
+
+
+########################################################################
+def _bind_category(data_path, all_path=None, value=None):
+    """
+    Loads the rows of every category for a chart that switches category in
+    the browser, and the param of its category radio.
+
+    Args:
+        data_path (str): Path to the pickled dataframe with a category column.
+        all_path (str, optional): Path to the pickled dataframe of the 'all'
+            option, added with category 'all' (default is None, no 'all' option).
+        value (str, optional): Category shown at start (default is the first option).
+
+    Returns:
+        tuple: The dataframe and the altair param named 'category'.
+    """
+    df = ll.read_artifact(data_path)
+    if all_path:
+        df = pd.concat([ll.read_artifact(all_path).assign(category='all'), df],
+                       ignore_index=True)
+    present = set(df['category'])
+    options = [option for option in CATEGORY_OPTIONS if option in present]
+    param = alt.param(name='category', value=value or options[0],
+                      bind=alt.binding_radio(options=options, name='Category '))
+    return df, param
+
+
+########################################################################
+def _bound_images(image_source, df, setname):
+    """
+    Adds the category and start flag of each set image of a category-bound chart.
+
+    Args:
+        image_source (pandas.DataFrame): Set images with set_name.
+        df (pandas.DataFrame): Rows of the chart with set_name and category.
+        setname (str or dict): Start set, or start set per category.
+
+    Returns:
+        pandas.DataFrame: The images of the chart's sets, one row per category.
+    """
+    images = image_source.merge(df[['set_name', 'category']].drop_duplicates(),
+                                on='set_name')
+    if isinstance(setname, str):
+        images['start'] = images['set_name'] == setname
+    else:
+        images['start'] = images['set_name'] == images['category'].map(setname)
+    return images
+
+
+########################################################################
+def _set_image(images, width, height):
+    """
+    Draws the image of the selected set: a single view with one image mark
+    centered in it, so only the picked set's image is laid out and fetched.
+
+    Args:
+        images (pandas.DataFrame): Set images with set_name, theme_name and image.
+        width (int): Width of the view and the image.
+        height (int): Height of the view and the image.
+
+    Returns:
+        altair.Chart: The image chart, not yet filtered on the selection.
+    """
+    return alt.Chart(images, width=width, height=height).mark_image(
+        width=width, height=height
+    ).encode(
+        x=alt.value(width / 2),
+        y=alt.value(height / 2),
+        url='image',
+        tooltip=[alt.Tooltip('set_name:N', title="Set Name"),
+                 alt.Tooltip('theme_name:N', title="Theme")])
+
+
+########################################################################
+def _filter_bound_images(chart, category, selector):
+    """
+    Shows the clicked set's image when the set belongs to the picked category,
+    otherwise the category's start set (see _bound_images).
+
+    Args:
+        chart (altair.Chart): Image chart of the _bound_images rows.
+        category (altair.Parameter): The category param of _bind_category.
+        selector (altair.Parameter): The named set click selection.
+
+    Returns:
+        altair.Chart: The filtered chart.
+    """
+    return chart.transform_filter(
+        alt.datum.category == category
+    ).transform_calculate(
+        picked=f"vlSelectionTest('{selector.name}_store', datum)"
+    ).transform_joinaggregate(
+        picks='sum(picked)'
+    ).transform_filter('datum.picked || (!datum.picks && datum.start)')
+
 
 ########################################################################
-def plot_colors(data_path):
+def plot_colors(data_path, preaggregate=True):
     """Generate an interactive plot of color shades  
 
     Args:
         data_path (str): pickled dataframe path 
+        preaggregate (bool, optional): Count the colors in pandas and send only
+            the plotted columns instead of letting Vega aggregate the raw rows
+            (default is True).
 
     Return:
         altair chart
     """
-    df = pd.read_pickle(data_path)
+    df = _thumbs(ll.read_artifact(data_path), 'logo')
     selector = alt.selection_point(fields=['color_name'])
     color_order = list(df.sort_values(by='quantity',
                                       ascending=False)['color_name'])
-    base = alt.Chart(df).encode(
+    if preaggregate:
+        source = df.groupby(['color_name', 'hex', 'image'], dropna=False, observed=True) \
+            .size().rename('count').reset_index()
+        y_var = 'count:Q'
+    else:
+        source = df
+        y_var = 'count(color_name)'
+
+    base = alt.Chart(source).encode(
         x=alt.X('color_name').sort(color_order)
         .title('Color Name')
         .axis(None)
@@ -31,7 +152,7 @@ def plot_colors(data_path):
 
     chart = base.mark_bar(cornerRadius=3, stroke='black',
                           ).encode(
-        y=alt.Y('count(color_name)').scale(domain=[0, 1])
+        y=alt.Y(y_var).scale(domain=[0, 1])
         .axis(None),
         color=alt.Color('hex').scale(None),
         tooltip=['image'])
@@ -40,25 +161,40 @@ def plot_colors(data_path):
 
 
 ########################################################################
-def plot_theme_colors(data_path):
+def plot_theme_colors(data_path, preaggregate=True):
     """
     Generates a horizontal bar plot of themes with most pink and 
     purple colors and theme logo. 
   
     Args:
         data_path (str): pickled dataframe path 
+        preaggregate (bool, optional): Count the colors in pandas and send one
+            row per bar segment and one row (and logo) per theme instead of
+            the raw rows (default is True).
 
     Return:
         altair chart
     """
-    df = pd.read_pickle(data_path)
+    df = _thumbs(ll.read_artifact(data_path), 'logo')
+    if preaggregate:
+        segments = df.groupby(['theme_name', 'color_name', 'hex'], observed=True) \
+            .size().rename('colors').reset_index()
+        themes = df.groupby('theme_name', observed=True) \
+            .agg(colors=('color_name', 'count'), image=('image', 'first')).reset_index()
+        theme_order = list(themes.sort_values(by='colors', ascending=False,
+                                              kind='stable')['theme_name'])
+        x_var = 'colors:Q'
+    else:
+        segments = themes = df
+        theme_order = '-x'
+        x_var = 'count(color_name)'
 
-    base = alt.Chart(df, title=alt.Title(f'Top Themes: Most Colors')
+    base = alt.Chart(themes, title=alt.Title(f'Top Themes: Most Colors')
                      ).transform_calculate(
         image_x="-3"
     ).encode(
-        x=alt.X('count(color_name)'),
-        y=alt.Y('theme_name').sort('-x').axis(None),
+        x=alt.X(x_var),
+        y=alt.Y('theme_name').sort(theme_order).axis(None),
     ).properties(width=500, height=600)
 
     image = base.mark_image(height=100, width=100,
@@ -69,14 +205,15 @@ def plot_theme_colors(data_path):
 
     bar = base.mark_bar(cornerRadius=3, height=25, stroke='black'
                         ).encode(
-        x=alt.X('count(color_name)').axis(None),
+        x=alt.X(x_var).axis(None),
         tooltip=[alt.Tooltip('theme_name', title="Theme"),
                  alt.Tooltip('color_name', title="Color")],
-        color=alt.Color('hex').scale(None))
+        color=alt.Color('hex').scale(None)
+    ).properties(data=segments)
 
     text = base.mark_text(align='left', baseline='middle', dx=5, fontSize=18
                           ).encode(
-        text=alt.Text('count(color_name)'))
+        text=alt.Text(x_var))
 
     chart = alt.layer(bar, image, text
                       ).configure_view(stroke=None)
@@ -85,7 +222,8 @@ def plot_theme_colors(data_path):
 
 
 ########################################################################
-def plot_theme_sets(data_path, category=None, h=400, img_x='-15', dom=125):
+def plot_theme_sets(data_path, category=None, h=400, img_x='-15', dom=125,
+                    bind_category=False, all_path=None):
     """
     Generates a horizontal bar plot displaying the themes with the most 
     pink and purple sets, along with the corresponding theme logos.
@@ -96,16 +234,27 @@ def plot_theme_sets(data_path, category=None, h=400, img_x='-15', dom=125):
         h (int, optional): Height of the plot (default is 400).
         img_x (str, optional): X-axis offset for the logo images (default is '-15').
         dom (int, optional): X-axis scaling (default is 125).
+        bind_category (bool, optional): Send the themes of every category once,
+            with a category radio that filters them in the browser; category is
+            then the one shown at start (default is False).
+        all_path (str, optional): Path to the pickled dataframe of the 'all'
+            option of the radio (default is None).
 
     Returns:
         altair.Chart: The generated Altair chart with themes and logos.
     """
-    df = pd.read_pickle(data_path)
-    if category:
-        df = df[df['category'] == category]
+    if bind_category:
+        df, picked = _bind_category(data_path, all_path, category)
+        title = alt.Title(alt.ExprRef(expr="'Top Themes: Most Sets - ' + upper(category)"))
     else:
-        category = 'all'
-    base = alt.Chart(df, title=alt.Title(f'Top Themes: Most Sets - {category.upper()}')
+        df = ll.read_artifact(data_path)
+        if category:
+            df = df[df['category'] == category]
+        else:
+            category = 'all'
+        title = alt.Title(f'Top Themes: Most Sets - {category.upper()}')
+    df = _thumbs(df, 'logo')
+    base = alt.Chart(df, title=title
                      ).transform_calculate(
         image_x=img_x
     ).encode(
@@ -129,14 +278,16 @@ def plot_theme_sets(data_path, category=None, h=400, img_x='-15', dom=125):
                           ).encode(
         text=alt.Text('set_num'))
 
-    chart = alt.layer(bar, image, text
-                      ).configure_view(stroke=None)
+    chart = alt.layer(bar, image, text)
+    if bind_category:
+        chart = chart.transform_filter(alt.datum.category == picked).add_params(picked)
 
-    return chart
+    return chart.configure_view(stroke=None)
 
 
 ########################################################################
-def plot_set_colors(data_path, setname, image_file, h=150, category=None):
+def plot_set_colors(data_path, setname, image_file, h=150, category=None,
+                    bind_category=False, all_path=None):
     """
     Generates a plot displaying the sets with the most pink and purple colors.
 
@@ -146,19 +297,30 @@ def plot_set_colors(data_path, setname, image_file, h=150, category=None):
         image_file (str): Path to the pickled dataframe containing the set images.
         h (int, optional): Height of the plot (default is 150).
         category (str, optional): The category to filter the sets by (default is None).
+        bind_category (bool, optional): Send the sets of every category once,
+            with a category radio that filters them in the browser; category is
+            then the one shown at start and setname may map each category to
+            its start set (default is False).
+        all_path (str, optional): Path to the pickled dataframe of the 'all'
+            option of the radio (default is None).
 
     Returns:
         altair.Chart: The generated Altair chart showing the set color distribution.
     """
-    df = pd.read_pickle(data_path)
-    if category:
-        source = df[df['category'] == category]
+    image_source = ll.read_artifact(image_file)
+    if bind_category:
+        source, picked = _bind_category(data_path, all_path, category)
+        image_source = _bound_images(image_source, source, setname)
+        selector = alt.selection_point(name='picked_set', fields=['set_name'], empty=False)
     else:
-        source = df
-
-    image_source = pd.read_pickle(image_file)
-
-    selector = alt.selection_point(fields=['set_name'], value=setname, empty=False)
+        df = ll.read_artifact(data_path)
+        if category:
+            source = df[df['category'] == category]
+        else:
+            source = df
+        selector = alt.selection_point(fields=['set_name'], value=setname, empty=False)
+        image_source = image_source[image_source['set_name'].isin(
+            set(source['set_name']) | {setname})]
 
     base = alt.Chart(source, title=alt.Title(f'Top Sets: Most Pink and Purple Colors',
                                              subtitle=['', '*click bar to see set image']
@@ -169,15 +331,12 @@ def plot_set_colors(data_path, setname, image_file, h=150, category=None):
         y=alt.Y('set_name').sort('-x'),
     ).add_params(selector).properties(height=h, width=250)
 
-    img_faceted = alt.Chart(image_source,
-                            width=375,
-                            height=275).mark_image().encode(
-        url='image',
-        tooltip=[alt.Tooltip('set_name', title="Set Name"),
-                 alt.Tooltip('theme_name', title='Theme')]
-    ).facet(
-        alt.Facet('image', title='', header=alt.Header(labelFontSize=0))
-    ).transform_filter(selector)
+    image = _set_image(_thumbs(image_source, 'set'), width=375, height=275)
+    if bind_category:
+        base = base.transform_filter(alt.datum.category == picked)
+        image = _filter_bound_images(image, picked, selector)
+    else:
+        image = image.transform_filter(selector)
 
     bar = base.mark_bar(cornerRadius=3, width=15, stroke='black'
                         ).encode(
@@ -198,7 +357,10 @@ def plot_set_colors(data_path, setname, image_file, h=150, category=None):
                  alt.Tooltip('count(color_name)', title='# of Colors')]
     ).add_params(selector)
 
-    chart = (bar + text | img_faceted).configure(
+    chart = bar + text | image
+    if bind_category:
+        chart = chart.add_params(picked)
+    chart = chart.configure(
         autosize=alt.AutoSizeParams(resize=True)
     ).configure_view(stroke=None).configure_axisY(
         labelFontSize=16,
@@ -211,25 +373,40 @@ def plot_set_colors(data_path, setname, image_file, h=150, category=None):
 
 
 ########################################################################
-def plot_theme_pieces(data_path):
+def plot_theme_pieces(data_path, preaggregate=True):
     """
     Generates a horizontal bar plot displaying the themes with the most pink and 
     purple pieces, along with the corresponding theme logos.
 
     Args:
         data_path (str): Path to the pickled dataframe containing theme and piece color data.
+        preaggregate (bool, optional): Sum the pieces in pandas and send one row
+            per bar segment and one row (and logo) per theme instead of the raw
+            rows (default is True).
 
     Returns:
         altair.Chart: The generated Altair chart showing the themes and their logos.
     """
-    df = pd.read_pickle(data_path)
+    df = _thumbs(ll.read_artifact(data_path), 'logo')
+    if preaggregate:
+        segments = df.groupby(['theme_name', 'color_name', 'hex'], observed=True)['quantity'] \
+            .sum().reset_index()
+        themes = df.groupby('theme_name', observed=True) \
+            .agg(quantity=('quantity', 'sum'), image=('image', 'first')).reset_index()
+        theme_order = list(themes.sort_values(by='quantity', ascending=False,
+                                              kind='stable')['theme_name'])
+        x_var = 'quantity:Q'
+    else:
+        segments = themes = df
+        theme_order = '-x'
+        x_var = 'sum(quantity):Q'
 
-    base = alt.Chart(df, title=alt.Title(f'Top Themes: Most Pieces')
+    base = alt.Chart(themes, title=alt.Title(f'Top Themes: Most Pieces')
                      ).transform_calculate(
         image_x='-3000'
     ).encode(
-        x=alt.X('sum(quantity):Q'),
-        y=alt.Y('theme_name').sort('-x').axis(None),
+        x=alt.X(x_var),
+        y=alt.Y('theme_name').sort(theme_order).axis(None),
     ).properties(width=500, height=500)
 
     image = base.mark_image(height=100, width=100,
@@ -244,11 +421,12 @@ def plot_theme_pieces(data_path):
         tooltip=[alt.Tooltip('theme_name', title="Theme"),
                  alt.Tooltip('color_name', title="Color"),
                  alt.Tooltip('quantity', title="# of Pieces")],
-        color=alt.Color('hex').scale(None))
+        color=alt.Color('hex').scale(None)
+    ).properties(data=segments)
 
     text = base.mark_text(align='left', baseline='middle', dx=5, fontSize=18
                           ).encode(
-        text=alt.Text('sum(quantity)'))
+        text=alt.Text(x_var))
 
     chart = alt.layer(bar, image, text
                       ).configure_view(stroke=None)
@@ -257,7 +435,8 @@ def plot_theme_pieces(data_path):
 
 
 ########################################################################
-def plot_sets_most_pieces(data_path, setname, image_file, h=150, category=None):
+def plot_sets_most_pieces(data_path, setname, image_file, h=150, category=None,
+                          bind_category=False, all_path=None):
     """
     Generates an interactive plot displaying the sets with the most pink and purple 
     pieces, including set images.
@@ -268,20 +447,34 @@ def plot_sets_most_pieces(data_path, setname, image_file, h=150, category=None):
         image_file (str): Path to the pickled dataframe containing the set images.
         h (int, optional): Height of the plot (default is 150).
         category (str, optional): The category to filter the sets by (default is None).
+        bind_category (bool, optional): Send the sets of every category once,
+            with a category radio that filters them in the browser; category is
+            then the one shown at start and setname may map each category to
+            its start set (default is False).
+        all_path (str, optional): Path to the pickled dataframe of the 'all'
+            option of the radio (default is None).
 
     Returns:
         altair.Chart: The generated Altair chart showing the sets, their piece counts, and images.
     """
-    df = pd.read_pickle(data_path)
-    if category:
-        df = df[df['category'] == category]
+    image_source = ll.read_artifact(image_file)
+    if bind_category:
+        df, picked = _bind_category(data_path, all_path, category)
+        image_source = _bound_images(image_source, df, setname)
+        selector = alt.selection_point(name='picked_set', fields=['set_name'], empty=False)
+        title = alt.ExprRef(expr="'Top Sets: Most Pink and Purple Pieces - ' + upper(category)")
     else:
-        category = 'all'
-
-    image_source = pd.read_pickle(image_file)
-    selector = alt.selection_point(fields=['set_name'], value=setname, empty=False)
-
-    base = alt.Chart(df, title=alt.Title(f'Top Sets: Most Pink and Purple Pieces - {category.upper()}',
+        df = ll.read_artifact(data_path)
+        if category:
+            df = df[df['category'] == category]
+        else:
+            category = 'all'
+        selector = alt.selection_point(fields=['set_name'], value=setname, empty=False)
+        image_source = image_source[image_source['set_name'].isin(
+            set(df['set_name']) | {setname})]
+        title = f'Top Sets: Most Pink and Purple Pieces - {category.upper()}'
+
+    base = alt.Chart(df, title=alt.Title(title,
                                          subtitle=['', '*click bar to see set image']
                                          )).mark_bar(
         cornerRadius=3, height=25, stroke='black'
@@ -290,15 +483,12 @@ def plot_sets_most_pieces(data_path, setname, image_file, h=150, category=None):
         y=alt.Y('set_name:N').sort('-x'),
     ).add_params(selector).properties(height=h, width=250)
 
-    img_faceted = alt.Chart(image_source,
-                            width=375,
-                            height=375).mark_image().encode(
-        url='image',
-        tooltip=[alt.Tooltip('set_name:N', title="Set Name"),
-                 alt.Tooltip('theme_name:N', title="Theme")]
-    ).facet(
-        alt.Facet('image', title='', header=alt.Header(labelFontSize=0))
-    ).transform_filter(selector)
+    image = _set_image(_thumbs(image_source, 'set'), width=375, height=375)
+    if bind_category:
+        base = base.transform_filter(alt.datum.category == picked)
+        image = _filter_bound_images(image, picked, selector)
+    else:
+        image = image.transform_filter(selector)
 
     bar = base.mark_bar(cornerRadius=3, width=15, stroke='black'
                         ).encode(
@@ -318,7 +508,10 @@ def plot_sets_most_pieces(data_path, setname, image_file, h=150, category=None):
                  alt.Tooltip('sum(quantity)', title="# of Pieces")]
     ).add_params(selector)
 
-    chart = (bar + text | img_faceted).configure(
+    chart = bar + text | image
+    if bind_category:
+        chart = chart.add_params(picked)
+    chart = chart.configure(
         autosize=alt.AutoSizeParams(resize=True)
     ).configure_view(stroke=None).configure_axisY(
         labelFontSize=16,
@@ -342,14 +535,18 @@ def plot_parts_most_colors(data_path):
     Returns:
         altair.Chart: The generated Altair chart displaying piece counts by color with images.
     """
-    df = pd.read_pickle(data_path)
+    df = _thumbs(ll.read_artifact(data_path), 'piece')
+    # the images and labels need one row per part, not one per part and color
+    parts = df.drop_duplicates('part_num')[['part_num', 'num_colors', 'image']]
+    part_order = list(parts.sort_values(by='num_colors', ascending=False,
+                                        kind='stable')['part_num'])
 
-    base = alt.Chart(df,
+    base = alt.Chart(parts,
                      title=alt.Title('Pieces With the Most Pink and Purple Shades')
                      ).transform_calculate(
         image_y="datum.num_colors + 2.5"
     ).encode(
-        x=alt.X('part_num:N').axis(labels=False).sort('-y').axis(None),
+        x=alt.X('part_num:N').axis(labels=False).sort(part_order).axis(None),
     )
 
     image = base.mark_image(
@@ -372,7 +569,7 @@ def plot_parts_most_colors(data_path):
         tooltip=[alt.Tooltip('part_num', title="Part #"),
                  alt.Tooltip('color_name', title='Color'),
                  alt.Tooltip('quantity', title='Quantity')]
-    )
+    ).properties(data=df.drop(columns=['image']))
 
     text = image.mark_text(
         align='center',
@@ -407,14 +604,16 @@ def plot_pieces_shapes(data_path, x_var='quantity', data_name='Pieces', category
     Returns:
         altair.Chart: The generated Altair chart displaying shape or piece counts per color.
     """
-    df = pd.read_pickle(data_path)
+    df = ll.read_artifact(data_path)
+    # hex is an unordered categorical once loaded, which has no max; each
+    # color has a single hex, so its first one is the same value
     if category:
-        source = df[df['category'] == category].groupby('color_name') \
-            .agg({'part_num': 'nunique', 'quantity': 'sum', 'hex': 'max'}) \
+        source = df[df['category'] == category].groupby('color_name', observed=True) \
+            .agg({'part_num': 'nunique', 'quantity': 'sum', 'hex': 'first'}) \
             .reset_index()
     else:
-        source = df.groupby('color_name') \
-            .agg({'part_num': 'nunique', 'quantity': 'sum', 'hex': 'max'}) \
+        source = df.groupby('color_name', observed=True) \
+            .agg({'part_num': 'nunique', 'quantity': 'sum', 'hex': 'first'}) \
             .reset_index()
 
     base = alt.Chart(source, title=f'{data_name} per Color').mark_bar(
@@ -460,7 +659,7 @@ def plot_pieces(data_path, category, offset):
     Returns:
         altair.Chart: The generated Altair chart showing piece counts and corresponding images.
     """
-    df = pd.read_pickle(data_path)
+    df = _thumbs(ll.read_artifact(data_path), 'piece')
     if category == 'all':
         source = df.sort_values(by='quantity', ascending=False)[:10] \
             .set_index([pd.Index([1, 2, 3, 4, 5, 6, 7, 8, 9, 10])]).reset_index()
@@ -508,30 +707,33 @@ def plot_pieces(data_path, category, offset):
 
 
 ########################################################################
-def plot_by_year(data_path, y_var, data_name, tooltip_opt=None, category=None):
+def plot_by_year(data_path, y_var, data_name, tooltip_opt=None, category=None, family=None):
     """
     Generates a bar graph showing the total amount of a specified variable (y_var) 
     available each year.
 
     Args:
-        data_path (str): Path to the pickled dataframe containing the data.
-        y_var (str): Column name for the y-axis variable (the variable to be totaled by year).
+        data_path (str): Path to the year_cube artifact (see cube_legos).
+        y_var (str): Column name for the y-axis variable (the variable to be totaled by year):
+            quantity (pieces), part_num (shapes), set_num (sets) or count(color_name).
         data_name (str): Name of the variable being plotted (used in the chart labels).
         tooltip_opt (list, optional): Optional list of tooltip specifications for additional information 
             on hover (default is None).
-        category (str, optional): Category to filter the data by (default is None).
+        category (str, optional): Category to filter the data by, or 'all' for the sets of every
+            category (default is None, every set).
+        family (list, optional): Color families to keep, e.g. ['pink', 'purple'] (default is
+            None, every color).
 
     Returns:
         altair.Chart: The generated bar graph showing totals by year.
     """
-    df = pd.read_pickle(data_path)
-    if category:
-        source = df[df['category'] == category]
-    else:
-        source = df
+    cube = cu.read_cube(data_path)
+    if category == 'all':
+        category = [name for name in cube.labels['category'] if name != cu.NO_CATEGORY]
+    source = cube.slice(category=category, family=family).rollup(['year', 'color_name'])
     chart_title = f'{data_name} Introduced Per Year'
     y_title = f"Number of {data_name}"
-    years = np.arange(1991, 2024, 1)
+    years = cube.years
     chart = alt.Chart(source, title=chart_title).mark_bar(
         cornerRadius=3,
         stroke='black',
@@ -546,7 +748,7 @@ def plot_by_year(data_path, y_var, data_name, tooltip_opt=None, category=None):
 
 
 ########################################################################
-def plot_set_theme_by_year(data_path, y_var, data_name,
+def plot_set_theme_by_year(data_path, y_var, data_name, by='category',
                            d_choice=['princess', 'unicorn', 'fairy', 'mermaid', 'kitty', 'all'],
                            r_choice=['hotpink', 'darkmagenta', 'rebeccapurple', 'deeppink', 'plum', 'white']):
     """
@@ -554,9 +756,11 @@ def plot_set_theme_by_year(data_path, y_var, data_name,
     purple, or both colors by year.
     
     Args:
-        data_path (str): Path to the pickled dataframe containing the data.
+        data_path (str): Path to the year_cube artifact (see cube_legos).
         y_var (str): Name of the column representing the y-axis variable (e.g., theme or set count).
         data_name (str): Label for the y variable (used in the chart).
+        by (str, optional): 'category' to split by category or 'family' to split by
+            color family (default is 'category').
         d_choice (list, optional): List of themes to filter by (default includes 'princess', 
             'unicorn', 'fairy', 'mermaid', 'kitty', and 'all').
         r_choice (list, optional): List of colors to filter by (default includes 'hotpink', 
@@ -565,14 +769,15 @@ def plot_set_theme_by_year(data_path, y_var, data_name,
     Returns:
         altair.Chart: The generated bar plot showing the number of themes or sets by year.
     """
-    df = pd.read_pickle(data_path)
-    source1 = df.groupby(['year', 'category'])[y_var] \
-        .nunique().reset_index()
-    source2 = df.groupby('year')[y_var].nunique().reset_index()
+    cube = cu.read_cube(data_path)
+    # distinct counts come from the cube, so the 'all' bars count each set or theme once
+    selected = cube.slice(**{by: [name for name in d_choice if name != 'all']})
+    source1 = selected.rollup(['year', by], measures=[y_var]).rename(columns={by: 'category'})
+    source2 = selected.rollup(['year'], measures=[y_var])
     source2['category'] = 'all'
     chart_title = f'{data_name}s Introduced Per Year'
     selector = alt.selection_point(fields=['category'], bind='legend')
-    years = np.arange(1991, 2024, 1)
+    years = cube.years
 
     both = alt.Chart(source2, title=chart_title
                      ).mark_bar(
@@ -616,7 +821,7 @@ def plot_color_timeline(data_path):
     Returns:
         altair.Chart: The generated timeline plot showing color distribution over time.
     """
-    df = pd.read_pickle(data_path)
+    df = ll.read_artifact(data_path)
     domain = np.arange(1990, 2026, 1)
     chart = alt.Chart(df, title='Color Timespan').mark_bar(
         stroke='black',
@@ -636,20 +841,23 @@ def plot_color_timeline(data_path):
 
 
 #######################################################################
-def plot_category_info(data_path, data_name, border):
+def plot_category_info(data_path, data_name, border, scope='category'):
     """
     Generates a plot displaying the number of sets, themes, and colors for each category.
 
     Args:
-        data_path (str): Path to the dataframe containing category data.
+        data_path (str): Path to the metrics artifact (Summary/metrics).
         data_name (str): Name of the variable being plotted (used in the chart labels).
         border (str): Color of bar borders in plot.
+        scope (str, optional): 'category' to count every part of the category's sets or
+            'pink_category' for their pink and purple parts (default is 'category').
 
     Returns:
         altair.Chart: The generated plot showing counts of sets, themes, and colors per category.
     """
-    df = pd.read_pickle(data_path)
-    source = df[df['category'] == data_name]
+    stats = mt.read_metrics(data_path)[scope, data_name]
+    source = pd.DataFrame([{'category': data_name, 'sets': stats['sets'],
+                            'themes': stats['themes'], 'colors': stats['colors']}])
 
     domain = ['sets', 'themes', 'colors']
     color_range = ['white', 'lightgray', 'gray']
@@ -698,7 +906,7 @@ def waterfall(data_path):
     Returns:
         altair.Chart: The generated waterfall chart displaying the net changes in set numbers.
     """
-    source = pd.read_pickle(data_path)
+    source = ll.read_artifact(data_path)
     axis_min = source['count'].min() - 5
     axis_max = source['count'].max() + 5
     base = alt.Chart(source).transform_window(
@@ -783,17 +991,44 @@ def waterfall(data_path):
 
 
 #######################################################################
-def plot_prices(data_path):
+def plot_prices(data_path, preaggregate=True):
     """
     Generates a plot visualizing the price distribution of items in the dataset.
 
     Args:
         data_path (str): Path to the data source containing pricing information.
+        preaggregate (bool, optional): Compute the box plot statistics in pandas
+            and send one row per theme instead of every price (default is True).
 
     Returns:
         altair.Chart: The generated plot showing the distribution of prices.
     """
-    df = pd.read_pickle(data_path)
+    df = ll.read_artifact(data_path, columns=['theme_name_x', 'us_retail'])
+    if preaggregate:
+        prices = df.groupby('theme_name_x', observed=True)['us_retail']
+        stats = prices.agg(['min', 'max', 'mean', 'median']).assign(
+            q1=prices.quantile(0.25),
+            q3=prices.quantile(0.75)).reset_index()
+        tooltip = [alt.Tooltip('theme_name_x:N', title='Theme'),
+                   alt.Tooltip('min:Q', title='Min', format='$,.2f'),
+                   alt.Tooltip('median:Q', title='Median', format='$,.2f'),
+                   alt.Tooltip('mean:Q', title='Mean', format='$,.2f'),
+                   alt.Tooltip('max:Q', title='Max', format='$,.2f')]
+        base = alt.Chart(stats).encode(
+            alt.Y("theme_name_x:N").axis(title="Theme"),
+            tooltip=tooltip)
+        whisker = base.mark_rule(color='#663399').encode(
+            alt.X("min:Q").axis(title="Retail Price (US$)", format='$,.2f'),
+            alt.X2("max:Q"))
+        box = base.mark_bar(color='#663399', size=14).encode(
+            x='q1:Q',
+            x2='q3:Q')
+        median = base.mark_tick(color='white', size=14).encode(
+            x='median:Q')
+        mean = base.mark_circle(color='#FF1493', size=50, opacity=1).encode(
+            x='mean:Q')
+        return whisker + box + median + mean
+
     plot = alt.Chart(df).mark_boxplot(color='#663399', extent="min-max").encode(
         alt.Y("theme_name_x:N").axis(title="Theme"),
         alt.X("us_retail:Q").axis(title="Retail Price (US$)", format='$,.2f'),
@@ -823,3 +1058,51 @@ def plot_prices(data_path):
                  alt.Tooltip('max:Q', title='Max', format='$,.2f')]
     )
     return plot
+
+
+#######################################################################
+def plot_purchase_frontier(data_path, pink=1.0, pieces=0.0, retired=0.0, diversity=0.0, points=400):
+    """
+    Creates a line chart of the best purchase value reachable at every budget
+    (see recs_legos.purchase_frontier), marking the chosen budget. The budget
+    is the chart's 'budget' param, set with cache_legos.with_params, so the
+    frontier is only computed again when the weights change.
+
+    Args:
+        data_path (str): Path to the purchase table (Recs/purchase_df).
+        pink (float, optional): Weight of the pink/purple pieces (default is 1.0).
+        pieces (float, optional): Weight of the piece total (default is 0.0).
+        retired (float, optional): Value of a retired set (default is 0.0).
+        diversity (float, optional): Value of each theme covered (default is 0.0).
+        points (int, optional): Budgets drawn along the line (default is 400).
+
+    Returns:
+        altair.LayerChart: The generated frontier chart.
+    """
+    frontier = rc.purchase_frontier(ll.read_artifact(data_path), pink=pink, pieces=pieces,
+                                    retired=retired, diversity=diversity)
+    if frontier.empty:
+        source = pd.DataFrame({'budget': [], 'value': []})
+    else:
+        # best value at evenly spaced budgets: the last step at or below each one
+        budgets = np.linspace(0, frontier['budget'].max(), points)
+        steps = np.searchsorted(frontier['budget'].to_numpy(), budgets, side='right') - 1
+        source = pd.DataFrame({'budget': budgets, 'value': frontier['value'].to_numpy()[steps]})
+
+    line = alt.Chart(source, title='Best Purchase Value per Budget').mark_line(
+        color='#663399',
+        interpolate='step-after',
+    ).encode(
+        alt.X('budget:Q').axis(title='Budget (US$)', format='$,.0f'),
+        alt.Y('value:Q').axis(title='Value'),
+        tooltip=[alt.Tooltip('budget:Q', title='Budget', format='$,.0f'),
+                 alt.Tooltip('value:Q', title='Value', format=',.2f')]
+    )
+    budget = alt.param(name='budget', value=0)
+    rule = alt.Chart().mark_rule(
+        color='#FF1493',
+        strokeDash=[4, 4],
+    ).encode(
+        x=alt.XDatum(alt.ExprRef(expr=budget.name), type='quantitative'),
+    )
+    return (line + rule).add_params(budget).properties(width=800, height=300)
@@ -0,0 +1,950 @@
+"""
+A group of functions used to load the LegoData artifacts shared by the
+plots and pages of the LEGO analysis.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+import cachetools
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Memory budget for the process-wide artifact cache, in megabytes.
+CACHE_BUDGET_MB = int(os.environ.get('LEGO_CACHE_BUDGET_MB', 512))
+
+# Columnar copies of an artifact, tried in this order before the pickle.
+COLUMNAR_SUFFIXES = ('.arrow', '.parquet')
+
+# Directory of the shared-memory data plane (see publish_plane), e.g.
+# /dev/shm/legodata. When set, artifacts published there are memory-mapped
+# from it, so every worker process shares one copy of their pages.
+DATA_PLANE = os.environ.get('LEGO_DATA_PLANE')
+
+# File of the data plane naming its current version; it is replaced
+# atomically when a new version is published.
+PLANE_MANIFEST = 'CURRENT'
+
+# Published versions kept in the data plane, so that workers still opening
+# files of the previous version find them.
+PLANE_KEEP_VERSIONS = 2
+
+# Folder of a data plane version holding the vocabulary of each
+# SHARED_VOCABULARIES column, which the published artifacts are coded on.
+PLANE_VOCABULARIES = '.vocabularies'
+
+# Layout of the published files; it is part of the version, so a plane
+# published in another layout is published again.
+PLANE_FORMAT = 'shared-vocabularies'
+
+# Latest manifest read from each data plane, with the stamp it was read from.
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+# Content hashes of files, keyed on path and stored with the stamp
+# they were computed for.
+_digests = {}
+_digests_lock = threading.Lock()
+
+# String columns with at most this share of distinct values are kept as
+# pandas categoricals.
+CATEGORY_RATIO = 0.5
+
+# Columns that draw on one vocabulary in every artifact. Their categoricals
+# share a single dtype (and so a single copy of the category strings) across
+# all loaded frames.
+SHARED_VOCABULARIES = ('category', 'color_name', 'hex', 'image', 'part_num',
+                       'set_name', 'set_num', 'theme_name')
+
+# Shared categorical dtype of each SHARED_VOCABULARIES column; a vocabulary
+# grows when a frame brings new values.
+_vocabularies = {}
+_vocabularies_lock = threading.Lock()
+
+# Shared categorical dtypes of the latest data plane versions read, keyed
+# on their version directory.
+_plane_dtypes = cachetools.LRUCache(PLANE_KEEP_VERSIONS)
+_plane_dtypes_lock = threading.Lock()
+
+
+########################################################################
+def artifact_stamp(data_path):
+    """
+    Returns the identity of an artifact file as it currently exists on disk.
+
+    Args:
+        data_path (str): Path to the artifact file.
+
+    Returns:
+        tuple: Absolute path, modification time (ns) and size of the file.
+    """
+    path = os.path.abspath(data_path)
+    stat = os.stat(path)
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+########################################################################
+def plane_manifest(plane=None):
+    """
+    Reads the manifest of the current data plane version, reading the file
+    again only when it is replaced.
+
+    Args:
+        plane (str, optional): Data plane directory (default is DATA_PLANE).
+
+    Returns:
+        dict: The manifest (version, source root and artifact files), or
+            None when no data plane is set or nothing is published yet.
+    """
+    plane = plane or DATA_PLANE
+    if not plane:
+        return None
+    try:
+        stamp = artifact_stamp(os.path.join(plane, PLANE_MANIFEST))
+    except FileNotFoundError:
+        return None
+    with _manifests_lock:
+        cached = _manifests.get(stamp[0])
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    with open(stamp[0]) as f:
+        manifest = json.load(f)
+    with _manifests_lock:
+        _manifests[stamp[0]] = (stamp, manifest)
+    return manifest
+
+
+########################################################################
+def _plane_file(data_path):
+    """Published file of an artifact in the current data plane version, if any."""
+    manifest = plane_manifest()
+    if manifest is None:
+        return None
+    name = os.path.relpath(os.path.abspath(data_path), manifest['root'])
+    file_name = manifest['artifacts'].get(name)
+    if file_name is None:
+        return None
+    return os.path.join(DATA_PLANE, manifest['version'], file_name)
+
+
+########################################################################
+def _in_plane(file_path):
+    """Whether a file belongs to the data plane."""
+    return bool(DATA_PLANE) and file_path.startswith(os.path.abspath(DATA_PLANE) + os.sep)
+
+
+########################################################################
+def resolve_artifact(data_path):
+    """
+    Returns the file that backs an artifact: its file in the data plane
+    when one is published, else its Arrow IPC or Parquet copy when one
+    exists, otherwise the pickle itself.
+
+    Args:
+        data_path (str): Path to the pickled dataframe.
+
+    Returns:
+        str: Path of the file to read.
+    """
+    file_path = _plane_file(data_path)
+    if file_path is not None:
+        return file_path
+    for suffix in COLUMNAR_SUFFIXES:
+        if os.path.exists(data_path + suffix):
+            return data_path + suffix
+    return data_path
+
+
+########################################################################
+def _index_columns(schema):
+    """Names of the stored pandas index columns of an arrow schema."""
+    metadata = schema.pandas_metadata or {}
+    return [name for name in metadata.get('index_columns', [])
+            if isinstance(name, str)]
+
+
+########################################################################
+def read_stored(file_path, columns=None, arrow_strings=False):
+    """
+    Reads an artifact file. Arrow IPC files are memory-mapped and Parquet
+    files are read column by column, so only the requested columns are
+    materialized; pickles are read whole.
+
+    Args:
+        file_path (str): Path of the stored file (see resolve_artifact).
+        columns (list, optional): Columns to load (default is all columns).
+        arrow_strings (bool, optional): Keep string columns as arrow-backed
+            'string[pyarrow]' columns, which stay views of a memory-mapped
+            file, instead of python strings (default is False).
+
+    Returns:
+        pandas.DataFrame: The loaded dataframe, with its original index.
+    """
+    if file_path.endswith('.arrow'):
+        table = pa.ipc.open_file(pa.memory_map(file_path)).read_all()
+    elif file_path.endswith('.parquet'):
+        table = pq.read_table(file_path, columns=columns, memory_map=True)
+    else:
+        df = pd.read_pickle(file_path)
+        return df if columns is None else df[list(columns)]
+
+    if columns is not None:
+        table = table.select(list(columns) + _index_columns(table.schema))
+    return _table_frame(table, arrow_strings)
+
+
+########################################################################
+def _table_frame(table, arrow_strings=False):
+    """Converts an arrow table to pandas, sharing its buffers where it can."""
+    types_mapper = {pa.string(): pd.StringDtype('pyarrow'),
+                    pa.large_string(): pd.StringDtype('pyarrow')}.get if arrow_strings else None
+    # split blocks keep null-free numeric columns as views of the map
+    return table.to_pandas(split_blocks=True, types_mapper=types_mapper)
+
+
+########################################################################
+def _plane_vocabularies(version_dir):
+    """
+    Returns the shared categorical dtypes a data plane version is coded on,
+    reading them once per version. They also become the vocabularies of
+    this process when they cover them, so frames read from elsewhere are
+    recoded onto the same dtypes.
+
+    Args:
+        version_dir (str): Directory of the data plane version.
+
+    Returns:
+        dict: Column name to its shared categorical dtype.
+    """
+    with _plane_dtypes_lock:
+        dtypes = _plane_dtypes.get(version_dir)
+    if dtypes is not None:
+        return dtypes
+    dtypes = {}
+    for name in SHARED_VOCABULARIES:
+        file_path = os.path.join(version_dir, PLANE_VOCABULARIES, name + '.arrow')
+        if os.path.exists(file_path):
+            table = pa.ipc.open_file(pa.memory_map(file_path)).read_all()
+            dtypes[name] = pd.CategoricalDtype(pd.Index(table.column('categories').to_pandas(), dtype=object))
+    with _vocabularies_lock:
+        for name, dtype in dtypes.items():
+            current = _vocabularies.get(name)
+            if current is None or current.categories.isin(dtype.categories).all():
+                _vocabularies[name] = dtype
+    with _plane_dtypes_lock:
+        _plane_dtypes[version_dir] = dtypes
+    return dtypes
+
+
+########################################################################
+def read_plane(file_path, columns=None):
+    """
+    Reads an artifact file of the data plane. The file was compacted and
+    coded on the version's shared vocabularies when it was published (see
+    publish_plane), so nothing is recoded: the codes of the shared columns
+    are wrapped in the shared dtypes as they are, and strings stay views of
+    the mapped file.
+
+    Args:
+        file_path (str): Path of the published file.
+        columns (list, optional): Columns to load (default is all columns).
+
+    Returns:
+        pandas.DataFrame: The loaded dataframe, with its original index.
+    """
+    plane = os.path.abspath(DATA_PLANE)
+    version = os.path.relpath(file_path, plane).split(os.sep)[0]
+    dtypes = _plane_vocabularies(os.path.join(plane, version))
+    table = pa.ipc.open_file(pa.memory_map(file_path)).read_all()
+    if columns is not None:
+        table = table.select(list(columns) + _index_columns(table.schema))
+
+    shared = {}
+    for name, dtype in dtypes.items():
+        field_type = table.schema.field(name).type if name in table.column_names else None
+        if field_type is not None and pa.types.is_dictionary(field_type) \
+                and pa.types.is_string(field_type.value_type):
+            indices = table.column(name).combine_chunks().indices
+            codes = pc.fill_null(indices, -1) if indices.null_count else indices
+            shared[name] = pd.Categorical.from_codes(codes.to_numpy(), dtype=dtype, validate=False)
+    df = _table_frame(table.drop(list(shared)), arrow_strings=True)
+    if not shared:
+        return df
+    index_columns = _index_columns(table.schema)
+    # built from the arrays themselves: inserting the columns would copy them
+    return pd.DataFrame({name: shared[name] if name in shared else df[name].array
+                         for name in table.column_names if name not in index_columns},
+                        index=df.index, copy=False)
+
+
+########################################################################
+def _shared_categories(name, values):
+    """Recodes a categorical column onto the shared vocabulary of its name."""
+    categories = values.cat.categories
+    with _vocabularies_lock:
+        dtype = _vocabularies.get(name)
+        if dtype is None or not categories.isin(dtype.categories).all():
+            if dtype is not None:
+                categories = dtype.categories.union(categories)
+            dtype = pd.CategoricalDtype(categories)
+            _vocabularies[name] = dtype
+    return values.astype(dtype)
+
+
+########################################################################
+def compact_frame(df):
+    """
+    Shrinks a dataframe in memory. String columns with few distinct values
+    become categoricals (on a shared dtype for SHARED_VOCABULARIES columns),
+    64-bit integers that fit are stored in 32 bits, and 64-bit floats are
+    stored in 32 bits when no value changes.
+
+    Args:
+        df (pandas.DataFrame): The dataframe to shrink.
+
+    Returns:
+        pandas.DataFrame: The compacted dataframe (df itself if nothing changed).
+    """
+    columns = {}
+    for name, values in df.items():
+        dtype = values.dtype
+        if dtype == object and len(values) \
+                and pd.api.types.infer_dtype(values, skipna=True) == 'string' \
+                and values.nunique() <= CATEGORY_RATIO * len(values):
+            values = values.astype('category')
+        elif dtype == 'int64' and len(values) \
+                and np.iinfo('int32').min <= values.min() <= values.max() <= np.iinfo('int32').max:
+            columns[name] = values.astype('int32')
+        elif dtype == 'float64':
+            narrow = values.astype('float32')
+            if narrow.astype('float64').equals(values):
+                columns[name] = narrow
+
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            if name in SHARED_VOCABULARIES and values.cat.categories.dtype == object:
+                values = _shared_categories(name, values)
+            if values is not df[name]:
+                columns[name] = values
+    return df.assign(**columns) if columns else df
+
+
+########################################################################
+def _shared_nbytes(df):
+    """Bytes of the shared category strings held by a compacted dataframe."""
+    return sum(int(df[name].cat.categories.memory_usage(deep=True))
+               for name in SHARED_VOCABULARIES
+               if name in df and isinstance(df[name].dtype, pd.CategoricalDtype)
+               and name in _vocabularies
+               and df[name].cat.categories is _vocabularies[name].categories)
+
+
+########################################################################
+def compaction_report(root='LegoData'):
+    """
+    Measures the memory each artifact uses as stored and once compacted
+    (see compact_frame). The shared vocabularies are counted once, in a
+    last 'shared vocabularies' row, rather than in every artifact.
+
+    Args:
+        root (str, optional): Directory holding the artifacts (default is
+            'LegoData').
+
+    Returns:
+        list: One dict per artifact with its path and bytes before and after.
+    """
+    report = []
+    for folder, _, files in sorted(os.walk(root)):
+        for name in sorted(files):
+            data_path = os.path.join(folder, name)
+            if os.path.splitext(name)[1]:
+                continue
+            df = pd.read_pickle(data_path)
+            if not isinstance(df, pd.DataFrame):
+                continue
+            compact = compact_frame(df)
+            report.append({'artifact': data_path,
+                           'before': frame_nbytes(df),
+                           'after': frame_nbytes(compact) - _shared_nbytes(compact)})
+    with _vocabularies_lock:
+        shared = sum(int(dtype.categories.memory_usage(deep=True))
+                     for dtype in _vocabularies.values())
+    report.append({'artifact': 'shared vocabularies', 'before': 0, 'after': shared})
+    return report
+
+
+########################################################################
+def write_artifact(df, data_path, fmt='arrow'):
+    """
+    Writes the columnar copy of an artifact next to its pickle, compacted
+    (see compact_frame) so that repeated strings are dictionary-encoded. The
+    file is written under a temporary name and moved into place, so readers
+    never see a partial file.
+
+    Args:
+        df (pandas.DataFrame): The artifact dataframe.
+        data_path (str): Path to the pickled dataframe.
+        fmt (str, optional): 'arrow' for an uncompressed Arrow IPC file that
+            can be memory-mapped, or 'parquet' (default is 'arrow').
+
+    Returns:
+        str: Path of the written file.
+    """
+    return _write_table(pa.Table.from_pandas(compact_frame(df)), f'{data_path}.{fmt}', fmt)
+
+
+########################################################################
+def _write_table(table, file_path, fmt):
+    """Writes an arrow table through a temporary file moved into place."""
+    tmp_path = f'{file_path}.tmp{os.getpid()}'
+    if fmt == 'arrow':
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    elif fmt == 'parquet':
+        pq.write_table(table, tmp_path)
+    else:
+        raise ValueError(f"unknown artifact format '{fmt}'")
+    os.replace(tmp_path, file_path)
+    return file_path
+
+
+########################################################################
+def convert_artifacts(root='LegoData', fmt='arrow'):
+    """
+    Writes a columnar copy of every pickled artifact under root. Pickles
+    that arrow cannot represent are skipped and keep being read as pickles.
+
+    Args:
+        root (str, optional): Directory holding the artifacts (default is
+            'LegoData').
+        fmt (str, optional): 'arrow' or 'parquet' (default is 'arrow').
+
+    Returns:
+        tuple: List of written files and list of skipped pickles.
+    """
+    written, skipped = [], []
+    for folder, _, files in sorted(os.walk(root)):
+        for name in sorted(files):
+            data_path = os.path.join(folder, name)
+            if os.path.splitext(name)[1]:
+                continue
+            try:
+                df = pd.read_pickle(data_path)
+                written.append(write_artifact(df, data_path, fmt))
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError,
+                    pa.ArrowTypeError, TypeError):
+                skipped.append(data_path)
+    return written, skipped
+
+
+########################################################################
+def _artifact_paths(root):
+    """Paths of the pickled artifacts under root, in a stable order."""
+    for folder, _, files in sorted(os.walk(root)):
+        for name in sorted(files):
+            if not os.path.splitext(name)[1]:
+                yield os.path.join(folder, name)
+
+
+########################################################################
+def publish_plane(root='LegoData', plane=None):
+    """
+    Publishes the artifacts under root to a data plane as compacted Arrow
+    IPC files (see write_artifact) in a new version directory, then points
+    the plane's manifest at it. Workers reading through the plane switch to
+    the new version on their next read; older versions beyond
+    PLANE_KEEP_VERSIONS are removed. Publishing unchanged artifacts again
+    is a no-op. The shared columns of every file are coded on one
+    vocabulary per column, published with the version, so workers read
+    them without recoding (see read_plane).
+
+    Args:
+        root (str, optional): Directory holding the artifacts (default is
+            'LegoData').
+        plane (str, optional): Data plane directory, ideally on a tmpfs
+            such as /dev/shm (default is DATA_PLANE).
+
+    Returns:
+        str: The published version.
+    """
+    plane = plane or DATA_PLANE
+    if not plane:
+        raise ValueError('no data plane directory given (set LEGO_DATA_PLANE)')
+    os.makedirs(plane, exist_ok=True)
+    sources = list(_artifact_paths(root))
+    sha = hashlib.sha256(PLANE_FORMAT.encode())
+    for data_path in sources:
+        sha.update(os.path.relpath(data_path, root).encode())
+        sha.update(file_digest(data_path).encode())
+    version = sha.hexdigest()[:16]
+    manifest = plane_manifest(plane)
+    if manifest is not None and manifest['version'] == version:
+        return version
+
+    staging = os.path.join(plane, f'.{version}.tmp{os.getpid()}')
+    frames = {}
+    for data_path in sources:
+        df = pd.read_pickle(data_path)
+        if isinstance(df, pd.DataFrame):
+            # grows the shared vocabularies over every artifact
+            frames[os.path.relpath(data_path, root)] = compact_frame(df)
+    with _vocabularies_lock:
+        vocabularies = dict(_vocabularies)
+    os.makedirs(os.path.join(staging, PLANE_VOCABULARIES))
+    for name, dtype in vocabularies.items():
+        _write_table(pa.table({'categories': pa.array(dtype.categories.to_numpy(), pa.string())}),
+                     os.path.join(staging, PLANE_VOCABULARIES, name + '.arrow'), 'arrow')
+
+    artifacts = {}
+    for name, df in frames.items():
+        # shared columns are coded on the final vocabularies, so workers
+        # use the codes as they are; the other categoricals keep their own
+        df = df.assign(**{column: values.astype(vocabularies[column])
+                          if column in vocabularies and values.cat.categories.dtype == object
+                          else values.cat.remove_unused_categories()
+                          for column, values in df.items() if isinstance(values.dtype, pd.CategoricalDtype)})
+        os.makedirs(os.path.dirname(os.path.join(staging, name)), exist_ok=True)
+        try:
+            _write_table(pa.Table.from_pandas(df), os.path.join(staging, name + '.arrow'), 'arrow')
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError,
+                pa.ArrowTypeError, TypeError):
+            continue  # read from root by the workers
+        artifacts[name] = name + '.arrow'
+    try:
+        os.replace(staging, os.path.join(plane, version))
+    except OSError:
+        # the version is already published (e.g. by a concurrent run)
+        shutil.rmtree(staging)
+
+    history = [version] + [v for v in (manifest or {}).get('history', []) if v != version]
+    new_manifest = {'version': version,
+                    'root': os.path.abspath(root),
+                    'artifacts': artifacts,
+                    'published': time.time(),
+                    'history': history[:PLANE_KEEP_VERSIONS]}
+    tmp_path = os.path.join(plane, f'{PLANE_MANIFEST}.tmp{os.getpid()}')
+    with open(tmp_path, 'w') as f:
+        json.dump(new_manifest, f, indent=1)
+    os.replace(tmp_path, os.path.join(plane, PLANE_MANIFEST))
+
+    for old in history[PLANE_KEEP_VERSIONS:]:
+        # workers keep mapped files readable after they are unlinked
+        shutil.rmtree(os.path.join(plane, old), ignore_errors=True)
+    return version
+
+
+########################################################################
+def file_digest(file_path):
+    """
+    Returns a content hash of a file. The hash is only recomputed when the
+    file's modification time or size changes.
+
+    Args:
+        file_path (str): Path to the file.
+
+    Returns:
+        str: Hex sha256 digest of the file contents.
+    """
+    stamp = artifact_stamp(file_path)
+    with _digests_lock:
+        entry = _digests.get(stamp[0])
+    if entry is not None and entry[0] == stamp:
+        return entry[1]
+
+    sha = hashlib.sha256()
+    with open(stamp[0], 'rb') as f:
+        for chunk in iter(lambda: f.read(2 ** 20), b''):
+            sha.update(chunk)
+    with _digests_lock:
+        _digests[stamp[0]] = (stamp, sha.hexdigest())
+    return sha.hexdigest()
+
+
+########################################################################
+def artifact_digest(data_path):
+    """
+    Returns a content hash of the file backing an artifact (see
+    resolve_artifact).
+
+    Args:
+        data_path (str): Path to the pickled dataframe.
+
+    Returns:
+        str: Hex sha256 digest of the file contents.
+    """
+    return file_digest(resolve_artifact(data_path))
+
+
+########################################################################
+def frame_nbytes(df):
+    """
+    Returns the deep memory usage of a dataframe in bytes.
+
+    Args:
+        df (pandas.DataFrame): The dataframe to measure.
+
+    Returns:
+        int: Bytes used by the dataframe, including its python objects.
+    """
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+########################################################################
+def _freeze(df):
+    """
+    Returns a dataframe over read-only views of the data of a cached
+    dataframe, so a caller writing into the values it shares with every
+    session fails instead of changing them. Nothing is copied: the views
+    share the data of df.
+
+    Args:
+        df (pandas.DataFrame): The dataframe to freeze.
+
+    Returns:
+        pandas.DataFrame: The same columns and index, backed by read-only
+        arrays.
+    """
+    columns = {}
+    for name, values in df.items():
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # the codes of a categorical are handed out as a read-only view
+            columns[name] = pd.Categorical.from_codes(values.cat.codes.to_numpy(),
+                                                      dtype=values.dtype, validate=False)
+        elif isinstance(values.dtype, np.dtype):
+            array = values.to_numpy(copy=False).view()
+            array.flags.writeable = False
+            columns[name] = array
+        else:
+            # arrow-backed columns are immutable already
+            columns[name] = values.array
+    frozen = pd.DataFrame(columns, index=df.index, copy=False)
+    frozen.columns = df.columns
+    return frozen
+
+
+########################################################################
+class _Flight:
+    """One call in progress: its result or error once done."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+########################################################################
+class SingleFlight:
+    """
+    Runs one call per key at a time. The first caller for a key runs it;
+    callers arriving for the same key while it runs wait for its result
+    (or its exception) instead of repeating the work. The coalesced calls
+    and the time spent waiting are counted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.wait_s = 0.0
+        self.max_wait_s = 0.0
+
+    def do(self, key, func):
+        """
+        Returns func(), sharing the call with concurrent callers of the key.
+
+        Args:
+            key (hashable): Identity of the work.
+            func (callable): The work, called without arguments.
+
+        Returns:
+            object: The result of the call, shared by every caller.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if leader:
+            try:
+                flight.result = func()
+            except BaseException as error:
+                flight.error = error
+                raise
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+            return flight.result
+
+        start = time.perf_counter()
+        flight.done.wait()
+        waited = time.perf_counter() - start
+        with self._lock:
+            self.wait_s += waited
+            self.max_wait_s = max(self.max_wait_s, waited)
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def reset(self):
+        """Resets the counters."""
+        with self._lock:
+            self.leaders = 0
+            self.coalesced = 0
+            self.wait_s = 0.0
+            self.max_wait_s = 0.0
+
+    def stats(self):
+        """
+        Returns the coordinator counters.
+
+        Returns:
+            dict: Calls run, calls coalesced into them, total and longest
+                wait of the coalesced calls in seconds, and calls in
+                progress.
+        """
+        with self._lock:
+            return {'leaders': self.leaders,
+                    'coalesced': self.coalesced,
+                    'wait_s': self.wait_s,
+                    'max_wait_s': self.max_wait_s,
+                    'in_flight': len(self._flights)}
+
+
+########################################################################
+class _FrameLRU(cachetools.LRUCache):
+    """LRU cache sized in bytes that counts its evictions."""
+
+    def __init__(self, maxsize):
+        super().__init__(maxsize=maxsize, getsizeof=lambda entry: entry[2])
+        self.evictions = 0
+
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+
+########################################################################
+class ArtifactCache:
+    """
+    Process-wide cache of LegoData artifacts.
+
+    Entries are keyed on the artifact and the loaded columns, and are
+    revalidated against the backing file's path, modification time and
+    size, so a rewritten or newly published artifact is reloaded on the
+    next call. Frames are compacted on load (see compact_frame), except
+    those of the data plane, compacted once when published (see
+    read_plane). Frames are shared between all callers: their data is
+    read-only (see _freeze) and each caller receives a shallow copy, so
+    adding or replacing its columns leaves the cached frame alone. The
+    least recently used frames are evicted once the memory budget is
+    exceeded. Concurrent misses of one artifact are read once (see
+    SingleFlight).
+
+    Args:
+        max_bytes (int, optional): Memory budget in bytes (default is
+            CACHE_BUDGET_MB megabytes).
+    """
+
+    def __init__(self, max_bytes=CACHE_BUDGET_MB * 2 ** 20):
+        self._lock = threading.RLock()
+        self._frames = _FrameLRU(max_bytes)
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, data_path, columns=None):
+        """
+        Returns the artifact stored at data_path, reading it on a cache miss.
+
+        Args:
+            data_path (str): Path to the pickled dataframe.
+            columns (list, optional): Columns to load (default is all columns).
+
+        Returns:
+            pandas.DataFrame: A shallow copy of the shared, read-only dataframe.
+        """
+        file_path = resolve_artifact(data_path)
+        if columns is not None and file_path == data_path:
+            # a pickle is read whole anyway, so project the cached frame
+            return self.load(data_path)[list(columns)]
+
+        stamp = artifact_stamp(file_path)
+        # keyed on the artifact, so a file replacing it (e.g. a new data
+        # plane version) replaces its entry
+        key = os.path.abspath(data_path), columns if columns is None else tuple(columns)
+        with self._lock:
+            entry = self._frames.get(key)
+            if entry is not None and entry[0] == stamp:
+                self.hits += 1
+                return entry[1].copy(deep=False)
+
+        df = self._flight.do((key, stamp), lambda: self._read(key, stamp, columns))
+        return df.copy(deep=False)
+
+    def _read(self, key, stamp, columns):
+        """Reads and caches an artifact on a miss."""
+        with self._lock:
+            self.misses += 1
+        # files of the data plane are compacted once, when published, and
+        # shared by every worker
+        if _in_plane(stamp[0]):
+            df = _freeze(read_plane(stamp[0], columns))
+        else:
+            df = _freeze(compact_frame(read_stored(stamp[0], columns)))
+        with self._lock:
+            try:
+                self._frames[key] = (stamp, df, frame_nbytes(df))
+            except ValueError:
+                # larger than the whole budget: hand it out uncached
+                self._frames.pop(key, None)
+        return df
+
+    def set_budget(self, max_bytes):
+        """
+        Changes the memory budget, evicting frames until the cache fits.
+
+        Args:
+            max_bytes (int): New memory budget in bytes.
+        """
+        with self._lock:
+            frames = _FrameLRU(max_bytes)
+            frames.evictions = self._frames.evictions
+            for key, entry in self._frames.items():
+                if entry[2] <= max_bytes:
+                    frames[key] = entry
+            self._frames = frames
+
+    def clear(self):
+        """Drops every cached frame and resets the counters."""
+        with self._lock:
+            self._frames = _FrameLRU(self._frames.maxsize)
+            self.hits = 0
+            self.misses = 0
+        self._flight.reset()
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: Hits, misses (reads), evictions, cached entries, bytes in
+                use and the memory budget, with the misses coalesced into
+                another read and their wait (see SingleFlight.stats).
+        """
+        flight = self._flight.stats()
+        with self._lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'coalesced': flight['coalesced'],
+                    'wait_s': flight['wait_s'],
+                    'max_wait_s': flight['max_wait_s'],
+                    'evictions': self._frames.evictions,
+                    'entries': len(self._frames),
+                    'bytes': int(self._frames.currsize),
+                    'max_bytes': int(self._frames.maxsize)}
+
+
+artifact_cache = ArtifactCache()
+
+
+########################################################################
+def read_artifact(data_path, columns=None):
+    """
+    Loads a LegoData artifact through the process-wide cache, from its
+    columnar copy when one exists.
+
+    Args:
+        data_path (str): Path to the pickled dataframe.
+        columns (list, optional): Columns to load (default is all columns).
+
+    Returns:
+        pandas.DataFrame: A shallow copy of the shared, read-only dataframe.
+    """
+    return artifact_cache.load(data_path, columns)
+
+
+# Latest object built from each artifact by each memo_artifact build, with
+# the stamp it was built from.
+_memos = {}
+_memos_lock = threading.Lock()
+
+# Concurrent builds of one object run once (see SingleFlight).
+_memo_flight = SingleFlight()
+
+
+########################################################################
+def memo_artifact(data_path, build):
+    """
+    Returns an object built from an artifact, building it again only when
+    the artifact changes. Concurrent callers of a stale object share one
+    build.
+
+    Args:
+        data_path (str): Path to the artifact.
+        build (callable): Builds the object from the artifact dataframe;
+            a module-level function, since it is part of the memo key.
+
+    Returns:
+        object: The object built from the current artifact.
+    """
+    key = (os.path.abspath(data_path), build)
+    stamp = artifact_stamp(resolve_artifact(data_path))
+    with _memos_lock:
+        cached = _memos.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    built = _memo_flight.do((stamp, build), lambda: build(read_artifact(data_path)))
+    with _memos_lock:
+        _memos[key] = (stamp, built)
+    return built
+
+
+########################################################################
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Write Arrow IPC or Parquet copies of the LegoData pickles, or publish them to a data plane.')
+    parser.add_argument('root', nargs='?', default='LegoData')
+    parser.add_argument('--format', choices=['arrow', 'parquet'], default='arrow')
+    parser.add_argument('--report', action='store_true',
+                        help='print the memory saved by compaction instead of converting')
+    parser.add_argument('--publish', metavar='PLANE',
+                        help='publish the artifacts to a shared-memory data plane (e.g. /dev/shm/legodata) '
+                             'instead of converting')
+    args = parser.parse_args()
+
+    if args.publish:
+        version = publish_plane(args.root, args.publish)
+        print(f"published version {version} with {len(plane_manifest(args.publish)['artifacts'])} artifacts "
+              f"to {args.publish}")
+        raise SystemExit
+
+    if args.report:
+        report = compaction_report(args.root)
+        for row in report:
+            print(f"{row['artifact']:<50} {row['before'] / 1024:>10.1f} KB -> {row['after'] / 1024:>9.1f} KB")
+        before = sum(row['before'] for row in report)
+        after = sum(row['after'] for row in report)
+        print(f"{'total':<50} {before / 2**20:>10.1f} MB -> {after / 2**20:>9.1f} MB "
+              f"({1 - after / before:.0%} saved)")
+        raise SystemExit
+
+    written, skipped = convert_artifacts(args.root, args.format)
+    for file_path in written:
+        print(f'wrote {file_path}')
+    for data_path in skipped:
+        print(f'skipped {data_path} (kept as pickle)')
@@ -0,0 +1,63 @@
+"""
+A group of functions used to compute the headline statistics of the LEGO
+analysis (colors, pieces, sets and themes per color family and per
+category) once at build time, and to look them up from the pages.
+"""
+
+import load_legos as ll
+
+# Statistics of each group: distinct colors, pieces, distinct sets and
+# distinct themes.
+STATISTICS = ('colors', 'pieces', 'sets', 'themes')
+
+# Groupings of the metrics: 'family' groups the pink and purple parts of
+# every set by color family, 'category' every part of the category sets and
+# 'pink_category' their pink and purple parts, both by category.
+SCOPES = ('family', 'category', 'pink_category')
+
+
+########################################################################
+def summarize(df, scope, by='category'):
+    """
+    Computes the statistics of each group of a parts table.
+
+    Args:
+        df (pandas.DataFrame): Parts with set_num, theme_name, color_name
+            and quantity columns.
+        scope (str): Scope of the groups, one of SCOPES.
+        by (str, optional): Column holding the groups (default is
+            'category').
+
+    Returns:
+        pandas.DataFrame: scope, group and the STATISTICS, one row per group.
+    """
+    out = df.groupby(by, observed=True).agg(colors=('color_name', 'nunique'),
+                                            pieces=('quantity', 'sum'),
+                                            sets=('set_num', 'nunique'),
+                                            themes=('theme_name', 'nunique'))
+    out = out.rename_axis('group').reset_index()
+    out.insert(0, 'scope', scope)
+    return out[['scope', 'group', *STATISTICS]]
+
+
+########################################################################
+def _lookup(df):
+    """Indexes the rows of a metrics artifact by scope and group."""
+    return {(str(row.scope), str(row.group)): {stat: int(getattr(row, stat)) for stat in STATISTICS}
+            for row in df.itertuples(index=False)}
+
+
+########################################################################
+def read_metrics(data_path):
+    """
+    Loads a metrics artifact as a lookup, reading it again only when the
+    artifact changes.
+
+    Args:
+        data_path (str): Path to the metrics artifact (Summary/metrics).
+
+    Returns:
+        dict: (scope, group) to a dict of the STATISTICS, e.g.
+            metrics['family', 'pink']['sets'].
+    """
+    return ll.memo_artifact(data_path, _lookup)
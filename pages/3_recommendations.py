@@ -1,11 +1,43 @@
-import pandas as pd
+import os
+
 import streamlit as st
 
+import cache_legos as cl
 import graph_legos as gl
+import load_legos as ll
+import recs_legos as rc
+import thumbs_legos as tl
 
 ########################################################################
 st.set_page_config(page_title="Recommendations", layout='wide')
 
+# Column formats of the purchase tables.
+PURCHASE_COLUMNS = {
+    "Set Name": st.column_config.Column(
+        width='medium'
+    ),
+    "Pink/Purple Pieces": st.column_config.Column(
+        width='small'
+    ),
+    "Piece Total": st.column_config.NumberColumn(
+        format="%f", width='small'
+    ),
+    "MSRP": st.column_config.NumberColumn(
+        format="$%.2f",
+    ),
+    'Set Image': st.column_config.ImageColumn(
+    ),
+    "Retired": st.column_config.CheckboxColumn(
+        default=True
+    ),
+    "Purchase Link": st.column_config.LinkColumn(
+        display_text="BUY"
+    ),
+}
+
+# Columns the purchase table can be sorted by, across every page.
+PURCHASE_SORTS = ['Set Name', 'Theme', 'Piece Total', 'Pink/Purple Pieces', 'MSRP', 'Retired?']
+
 with st.sidebar:
     st.image('LegoData/Images/color_lego.png')
 
@@ -26,9 +58,33 @@ with st.container(height=None, border=False):
             "probability that given a theme, we would be able to find a set from the pink/purple group or the "
             "princess/unicorn/fairy/mermaid/kitty group. We then selected the top 15 themes that had the highest "
             "probability of containing sets from either group to include in our recommendations.  Duplo themes and "
-            "themes with only 1 set were excluded.")
+            "themes with only 1 set were excluded.  The table lists the themes from most to least likely, larger "
+            "themes first among equally likely ones, so themes with every set in a group (e.g. Elves) come before "
+            "Disney Princess; our original table listed the same 15 themes in catalog order.")
 
-        p_table = pd.read_pickle('./LegoData/Recs/probability_df')
+        # re-ranked on every change from the per-theme set counts
+        counts_path = './LegoData/Recs/theme_counts'
+        if os.path.exists(counts_path):
+            counts = ll.read_artifact(counts_path)
+        else:
+            # until build_legos writes them, the stored ranking gives back the counts of its themes
+            counts = rc.stored_theme_counts(ll.read_artifact('./LegoData/Recs/probability_df'))
+        controls = st.columns((2, 1, 1))
+        with controls[0]:
+            groups = st.multiselect("Count sets that are:",
+                                    options=['pink/purple'] + rc.count_categories(counts),
+                                    default=['pink/purple'] + rc.count_categories(counts))
+        with controls[1]:
+            min_sets = st.number_input("Fewest sets per theme:", min_value=1, value=2, step=1)
+        with controls[2]:
+            top_n = st.number_input("Themes shown:", min_value=1, value=15, step=1)
+        exclude = st.text_input("Exclude themes containing (comma separated):", value='Duplo')
+        p_table = rc.rank_themes(counts,
+                                 categories=[group for group in groups if group != 'pink/purple'],
+                                 pink='pink/purple' in groups,
+                                 min_sets=min_sets,
+                                 exclude=tuple(name.strip() for name in exclude.split(',')),
+                                 n=top_n)
         st.dataframe(
             p_table,
             hide_index=True,
@@ -44,7 +100,7 @@ with st.container(height=None, border=False):
         st.write("Our data set included all unique Lego sets, including retired sets. We performed a net change "
                  "analysis to see how many sets are in current production versus how many would need to be sourced "
                  "from secondhand vendors.")
-        st.altair_chart(gl.waterfall(data_path='./LegoData/Recs/net_sets'), use_container_width=True)
+        st.vega_lite_chart(cl.chart_spec(gl.waterfall, data_path='./LegoData/Recs/net_sets'), use_container_width=True)
 
 ########################################################################
 # Set pricing
@@ -55,7 +111,7 @@ with st.container(height=None, border=False):
         st.write(
             "An important consideration for any future acquisition is price, so we compiled a summary of the price "
             "distribution of sets within our top 20 themes.")
-        st.altair_chart(gl.plot_prices('./LegoData/Recs/to_purchase'), use_container_width=True)
+        st.vega_lite_chart(cl.chart_spec(gl.plot_prices, './LegoData/Recs/to_purchase'), use_container_width=True)
 
 ########################################################################
 # Recommendation chart
@@ -68,40 +124,63 @@ with st.container(height=None, border=False):
             "based on their priorities (theme, piece total, category, price, new/used, etc.). Doubleclick on "
             "thumbnails to view set image.  To purchase, click 'BUY' link to go to brickset.com to view a compilation "
             "of available purchasing options for new or used sets.")
-        df = pd.read_pickle('./LegoData/Recs/purchase_df')
+        index = rc.read_purchase_index('./LegoData/Recs/purchase_df')
         theme_options = st.multiselect("Pick Theme:",
-                                       options=['All'] + list(df['Theme'].unique()),
+                                       options=['All'] + index.themes,
                                        default='All')
+        themes = None if theme_options == ['All'] else theme_options
 
-        if theme_options == ['All']:
-            df = df
+        controls = st.columns(4)
+        sort = controls[0].selectbox("Sort by:", options=[None] + PURCHASE_SORTS,
+                                     format_func=lambda column: 'Recommended' if column is None else column)
+        ascending = controls[1].radio("Order:", options=['Ascending', 'Descending'],
+                                      horizontal=True) == 'Ascending'
+        page_size = controls[2].selectbox("Rows per page:", options=[25, 50, 100], index=1)
+        page = controls[3].number_input("Page:", min_value=1, value=1, step=1)
 
-        else:
-            df = df[df['Theme'].isin(theme_options)]
+        df, page, total = index.page(themes, sort, ascending, page, page_size)
+        df = df.assign(**{'Set Image': tl.thumb_urls(df['Set Image'], 'set')})
+        first = (page - 1) * page_size
+        st.caption(f"Rows {min(first + 1, total)}–{first + len(df)} of {total} "
+                   f"(page {page} of {max(1, -(-total // page_size))})")
+        st.dataframe(df, column_config=PURCHASE_COLUMNS, hide_index=True, use_container_width=True)
 
-        st.dataframe(
-            df,
-            column_config={
-                "Set Name": st.column_config.Column(
-                    width='medium'
-                ),
-                "Pink/Purple Pieces": st.column_config.Column(
-                    width='small'
-                ),
-                "Piece Total": st.column_config.NumberColumn(
-                    format="%f", width='small'
-                ),
-                "MSRP": st.column_config.NumberColumn(
-                    format="$%.2f",
-                ),
-                'Set Image': st.column_config.ImageColumn(
-                ),
-                "Retired": st.column_config.CheckboxColumn(
-                    default=True
-                ),
-                "Purchase Link": st.column_config.LinkColumn(
-                    display_text="BUY"
-                ),
-            },
-            hide_index=True, use_container_width=True
-        )
+########################################################################
+# Purchase optimizer
+with st.container(height=None, border=False):
+    st.subheader("Purchase Optimizer")
+    col = st.columns((5, 1), gap='small')
+    with col[0]:
+        st.write(
+            "Pick a budget and what matters most, and the optimizer selects the combination of sets with the highest "
+            "total value that fits the budget (prices are rounded up to whole dollars). Pieces are weighed against "
+            "the best set in the catalog, and each theme covered adds the theme diversity weight.")
+        catalog = ll.read_artifact('./LegoData/Recs/purchase_df')
+        # no budget buys more than the whole catalog
+        max_budget = int(rc.catalog_cost(catalog))
+        controls = st.columns(5)
+        with controls[0]:
+            budget = st.number_input("Budget ($):", min_value=0, max_value=max_budget, value=min(500, max_budget),
+                                     step=50)
+        with controls[1]:
+            pink_weight = st.slider("Pink/purple pieces:", 0.0, 1.0, 1.0, step=0.1)
+        with controls[2]:
+            pieces_weight = st.slider("Piece total:", 0.0, 1.0, 0.0, step=0.1)
+        with controls[3]:
+            retired_weight = st.slider("Retired (+) or current (-):", -1.0, 1.0, 0.0, step=0.1)
+        with controls[4]:
+            diversity_weight = st.slider("Theme diversity:", 0.0, 1.0, 0.0, step=0.1)
+
+        weights = dict(pink=pink_weight, pieces=pieces_weight, retired=retired_weight, diversity=diversity_weight)
+        picks = rc.optimize_purchases(catalog, budget, **weights)
+        picks = picks.assign(**{'Set Image': tl.thumb_urls(picks['Set Image'], 'set')})
+
+        totals = st.columns(4)
+        totals[0].metric(label="Sets", value=len(picks))
+        totals[1].metric(label="Spent", value=f"${picks['MSRP'].sum():,.2f}")
+        totals[2].metric(label="Pink/Purple Pieces", value=int(picks['Pink/Purple Pieces'].sum()))
+        totals[3].metric(label="Themes", value=picks['Theme'].nunique())
+        st.dataframe(picks, column_config=PURCHASE_COLUMNS, hide_index=True, use_container_width=True)
+        # the frontier depends on the weights only; the budget marker is a param of its spec
+        frontier = cl.chart_spec(gl.plot_purchase_frontier, data_path='./LegoData/Recs/purchase_df', **weights)
+        st.vega_lite_chart(cl.with_params(frontier, budget=budget), use_container_width=True)
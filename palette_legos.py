@@ -0,0 +1,216 @@
+"""
+A group of functions used to sort the LEGO palette into the pink and purple
+color families from the colors' hex codes, in the CIELAB/LCh color space.
+
+Usage:
+    python palette_legos.py check [--colors colors.csv]
+    python palette_legos.py classify colors.csv
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Families tagged by hand before the classifier; check() compares against them.
+PINK_COLORS = ['Bright Pink', 'Chrome Pink', 'Clikits Pink', 'Coral', 'Dark Pink',
+               'Duplo Pink', 'Glitter Trans-Dark Pink', 'Glitter Trans-Pink', 'Light Pink',
+               'Light Purple', 'Light Salmon', 'Medium Dark Pink', 'Pink', 'Trans-Dark Pink',
+               'Trans-Dark Pink Opal', 'Trans-Pink']
+PURPLE_COLORS = ['Dark Purple', 'Duplo Dark Purple', 'Glitter Trans-Medium Purple',
+                 'Glitter Trans-Purple', 'Lavender', 'Light Lilac', 'Light Violet', 'Magenta',
+                 'Medium Bluish Violet', 'Medium Lavender', 'Medium Violet', 'Purple',
+                 'Reddish Lilac', 'Sand Purple', 'Trans-Light Purple', 'Trans-Medium Purple',
+                 'Trans-Purple', 'Trans-Purple Opal', 'Violet']
+
+# Colors with less chroma than this are greys and belong to no family.
+MIN_CHROMA = 10
+
+# LCh hue range (degrees, from inclusive to exclusive, wrapping at 360) of
+# each family.
+PINK_HUES = (335, 25)
+PURPLE_HUES = (285, 335)
+
+# CIELAB bends saturated blues toward purple hues, so colors with at least
+# VIVID_CHROMA need at least VIVID_PURPLE_HUE to count as purple.
+VIVID_CHROMA = 60
+VIVID_PURPLE_HUE = 308
+
+# Pink hues darker than this lightness read as purple (e.g. Magenta).
+DARK_PINK_LIGHTNESS = 42
+
+# sRGB (D65) to CIE XYZ, and the D65 white point.
+_RGB_TO_XYZ = np.array([[0.4124564, 0.3575761, 0.1804375],
+                        [0.2126729, 0.7151522, 0.0721750],
+                        [0.0193339, 0.1191920, 0.9503041]])
+_WHITE = np.array([0.95047, 1.0, 1.08883])
+
+
+########################################################################
+def hex_to_lab(hex_codes):
+    """
+    Converts hex color codes to CIELAB.
+
+    Args:
+        hex_codes (list-like): Codes such as '#FC97AC' (the '#' is optional).
+
+    Returns:
+        numpy.ndarray: An (n, 3) array of L*, a* and b*; rows of codes that
+            are not six hex digits are NaN.
+    """
+    codes = pd.Series(hex_codes, dtype=object).astype(str).str.lstrip('#')
+    valid = codes.str.fullmatch('[0-9A-Fa-f]{6}').to_numpy()
+    rgb = np.full((len(codes), 3), np.nan)
+    rgb[valid] = np.frombuffer(bytes.fromhex(''.join(codes[valid])), dtype=np.uint8).reshape(-1, 3) / 255
+
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ _RGB_TO_XYZ.T / _WHITE
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([116 * f[:, 1] - 16,
+                     500 * (f[:, 0] - f[:, 1]),
+                     200 * (f[:, 1] - f[:, 2])], axis=1)
+
+
+########################################################################
+def lab_to_lch(lab):
+    """
+    Converts CIELAB to LCh (lightness, chroma and hue angle).
+
+    Args:
+        lab (numpy.ndarray): An (n, 3) array of L*, a* and b*.
+
+    Returns:
+        numpy.ndarray: An (n, 3) array of L*, chroma and hue in degrees [0, 360).
+    """
+    hue = np.degrees(np.arctan2(lab[:, 2], lab[:, 1])) % 360
+    return np.stack([lab[:, 0], np.hypot(lab[:, 1], lab[:, 2]), hue], axis=1)
+
+
+########################################################################
+def _in_hues(hue, hues):
+    """Whether each hue lies in a (from, to) range that may wrap past 360."""
+    start, end = hues
+    if start <= end:
+        return (hue >= start) & (hue < end)
+    return (hue >= start) | (hue < end)
+
+
+########################################################################
+def classify_colors(hex_codes, min_chroma=MIN_CHROMA, pink_hues=PINK_HUES,
+                    purple_hues=PURPLE_HUES, vivid_chroma=VIVID_CHROMA,
+                    vivid_purple_hue=VIVID_PURPLE_HUE, dark_pink_lightness=DARK_PINK_LIGHTNESS):
+    """
+    Sorts colors into the pink and purple families by their LCh coordinates.
+    The default thresholds reproduce PINK_COLORS and PURPLE_COLORS.
+
+    Args:
+        hex_codes (list-like): Hex codes of the colors.
+        min_chroma (float, optional): Chroma below which a color is grey
+            (default is MIN_CHROMA).
+        pink_hues (tuple, optional): Hue range of the pinks (default is
+            PINK_HUES).
+        purple_hues (tuple, optional): Hue range of the purples (default is
+            PURPLE_HUES).
+        vivid_chroma (float, optional): Chroma from which vivid_purple_hue
+            applies (default is VIVID_CHROMA).
+        vivid_purple_hue (float, optional): Lowest purple hue of vivid colors
+            (default is VIVID_PURPLE_HUE).
+        dark_pink_lightness (float, optional): Lightness below which pinks
+            are purple (default is DARK_PINK_LIGHTNESS).
+
+    Returns:
+        numpy.ndarray: 'pink', 'purple' or 'other' for each color (unreadable
+            codes are 'other').
+    """
+    lightness, chroma, hue = lab_to_lch(hex_to_lab(hex_codes)).T
+    colorful = chroma >= min_chroma
+    pinkish = colorful & _in_hues(hue, pink_hues)
+    purple = colorful & _in_hues(hue, purple_hues) & ((chroma < vivid_chroma) | (hue >= vivid_purple_hue))
+    purple |= pinkish & (lightness < dark_pink_lightness)
+    pink = pinkish & ~purple
+    return np.select([pink, purple], ['pink', 'purple'], 'other')
+
+
+########################################################################
+def legodata_palette(root='LegoData'):
+    """
+    Collects the named colors found in the artifacts.
+
+    Args:
+        root (str, optional): Directory holding the artifacts (default is
+            'LegoData').
+
+    Returns:
+        pandas.DataFrame: color_name and hex, one row per distinct pair.
+    """
+    frames = []
+    for folder, _, files in sorted(os.walk(root)):
+        for name in sorted(files):
+            if os.path.splitext(name)[1]:
+                continue
+            df = pd.read_pickle(os.path.join(folder, name))
+            if isinstance(df, pd.DataFrame) and {'color_name', 'hex'} <= set(df.columns):
+                frames.append(df[['color_name', 'hex']].astype(str))
+    return pd.concat(frames).drop_duplicates().reset_index(drop=True)
+
+
+########################################################################
+def read_palette(colors_path):
+    """
+    Reads a Rebrickable colors download.
+
+    Args:
+        colors_path (str): Path of colors.csv (may be gzipped).
+
+    Returns:
+        pandas.DataFrame: color_name and hex columns.
+    """
+    colors = pd.read_csv(colors_path, dtype={'rgb': str})
+    return pd.DataFrame({'color_name': colors['name'], 'hex': '#' + colors['rgb']})
+
+
+########################################################################
+def check(palette, **thresholds):
+    """
+    Compares the classifier with the hand-tagged families.
+
+    Args:
+        palette (pandas.DataFrame): color_name and hex columns.
+        **thresholds: Arguments passed on to classify_colors.
+
+    Returns:
+        pandas.DataFrame: The colors classified differently, with both
+            families (empty when the classifier reproduces the lists).
+    """
+    tagged = np.select([palette['color_name'].isin(PINK_COLORS),
+                        palette['color_name'].isin(PURPLE_COLORS)], ['pink', 'purple'], 'other')
+    out = palette.assign(tagged=tagged, family=classify_colors(palette['hex'], **thresholds))
+    # a color is tagged once per name, so one readable hex of it is enough
+    agrees = (out['tagged'] == out['family']).groupby(out['color_name']).transform('any')
+    return out[~agrees]
+
+
+########################################################################
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sort the LEGO palette into pink and purple families.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    check_parser = subparsers.add_parser('check', help='compare the classifier with the hand-tagged lists')
+    check_parser.add_argument('--colors', help='Rebrickable colors.csv (default: the colors in LegoData)')
+    classify_parser = subparsers.add_parser('classify', help='list the pink and purple colors of a palette')
+    classify_parser.add_argument('colors', help='Rebrickable colors.csv')
+    args = parser.parse_args()
+
+    if args.command == 'check':
+        palette = read_palette(args.colors) if args.colors else legodata_palette()
+        mismatches = check(palette)
+        print(f"{palette['color_name'].nunique()} colors, {mismatches['color_name'].nunique()} classified differently")
+        if len(mismatches):
+            print(mismatches.to_string(index=False))
+            raise SystemExit(1)
+    else:
+        palette = read_palette(args.colors)
+        palette['family'] = classify_colors(palette['hex'])
+        for family in ['pink', 'purple']:
+            names = sorted(palette.loc[palette['family'] == family, 'color_name'])
+            print(f'{family} ({len(names)}): ' + ', '.join(names))
@@ -0,0 +1,406 @@
+"""
+A group of functions used to compute the recommendations of the LEGO
+analysis: theme rankings, purchase optimization and the indexed purchase
+table.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+import load_legos as ll
+
+# Columns of the probability table, in display order.
+PROBABILITY_COLUMNS = ['Theme', 'P(theme)', 'P(pink)', 'P(category)', 'P(both)', 'P(pink or cat|theme)']
+
+# Largest total of sets stored_theme_counts tries, as a multiple of the
+# smallest total the ranked probabilities allow.
+MAX_TOTAL_MULTIPLE = 10
+
+
+########################################################################
+def count_categories(counts):
+    """
+    Lists the categories counted in a theme_counts artifact.
+
+    Args:
+        counts (pandas.DataFrame): theme_counts.
+
+    Returns:
+        list: Category names, in column order.
+    """
+    return [column for column in counts.columns if f'pink {column}' in counts.columns]
+
+
+########################################################################
+def stored_theme_counts(probabilities):
+    """
+    Recovers the set counts behind a stored theme ranking, for a tree
+    without the theme_counts artifact. Every P(theme) divides by the same
+    number of sets, so the smallest total that makes every theme's count
+    whole gives them back; the sets of unranked themes go in one row
+    without a theme, which stays in the totals but is never ranked. The
+    ranking only counts the categories together, so they come back as a
+    single 'category'.
+
+    Args:
+        probabilities (pandas.DataFrame): Recs/probability_df.
+
+    Returns:
+        pandas.DataFrame: theme_counts of the ranked themes.
+
+    Raises:
+        ValueError: No total up to MAX_TOTAL_MULTIPLE times the smallest
+            one gives whole counts.
+    """
+    stored = probabilities['P(theme)'].to_numpy()
+    eps = np.finfo(np.result_type(*stored)).eps
+    p_theme = stored.astype(np.float64)
+    for multiple in range(1, MAX_TOTAL_MULTIPLE + 1):
+        total = round(multiple / p_theme.min())
+        sets = p_theme * total
+        # whole within the precision the probabilities were stored with
+        if np.abs(sets - sets.round()).max() < max(1e-6, 4 * eps * total):
+            break
+    else:
+        raise ValueError(f'no total up to {MAX_TOTAL_MULTIPLE} times the smallest one makes every '
+                         f'theme count whole; the ranking does not come from whole set counts')
+    sets = sets.round()
+
+    counts = pd.DataFrame({'theme_name': probabilities['Theme'].to_numpy(object), 'sets': sets})
+    for column, probability in (('pink', 'P(pink)'), ('category', 'P(category)'), ('pink category', 'P(both)')):
+        counts[column] = (probabilities[probability].to_numpy(np.float64) * sets).round()
+    rest = total - sets.sum()
+    if rest > 0:
+        counts.loc[len(counts)] = [None, rest, 0, 0, 0]
+    return counts.astype({column: 'int64' for column in counts.columns[1:]})
+
+
+########################################################################
+def rank_themes(counts, categories=None, pink=True, min_sets=2, exclude=('Duplo',), n=15):
+    """
+    Ranks themes by the probability that one of their sets is pink/purple
+    or belongs to one of the chosen categories, over every theme at once.
+
+    Args:
+        counts (pandas.DataFrame): theme_counts (sets, pink sets, sets per
+            category and pink sets per category of each theme).
+        categories (list, optional): Categories that count (default is None,
+            every category).
+        pink (bool, optional): Whether pink/purple sets count (default is
+            True).
+        min_sets (int, optional): Fewest sets a theme needs (default is 2).
+        exclude (tuple, optional): Themes containing these names are left
+            out (default is ('Duplo',)).
+        n (int, optional): Number of themes (default is 15).
+
+    Returns:
+        pandas.DataFrame: Theme probabilities, most likely first.
+    """
+    if categories is None:
+        categories = count_categories(counts)
+    total = counts['sets'].to_numpy(np.float64)
+    in_category = counts[list(categories)].to_numpy(np.float64).sum(axis=1)
+    pink_in_category = counts[[f'pink {name}' for name in categories]].to_numpy(np.float64).sum(axis=1)
+
+    p_pink = counts['pink'].to_numpy(np.float64) / total
+    p_category = in_category / total
+    p_both = pink_in_category / total
+    p_any = (p_pink + p_category - p_both) if pink else p_category
+    p_theme = total / total.sum()
+
+    keep = (total >= min_sets) & counts['theme_name'].notna().to_numpy()
+    names = counts['theme_name'].astype(str)
+    for name in exclude:
+        if name:
+            keep &= ~names.str.contains(name, regex=False).to_numpy()
+    rows = np.flatnonzero(keep)
+    # stable sort, most likely first and larger themes first among ties
+    order = rows[np.lexsort((-p_theme[rows], -p_any[rows]))][:n]
+
+    out = pd.DataFrame({'Theme': names.to_numpy()[order],
+                        'P(theme)': p_theme[order],
+                        'P(pink)': p_pink[order],
+                        'P(category)': p_category[order],
+                        'P(both)': p_both[order],
+                        'P(pink or cat|theme)': p_any[order]}, index=counts.index[order])
+    return out[PROBABILITY_COLUMNS]
+
+
+########################################################################
+def purchase_values(df, pink=1.0, pieces=0.0, retired=0.0):
+    """
+    Scores each purchase candidate. Pink/purple pieces and piece totals are
+    scaled by their catalog maximum, so a weight of 1 is worth as much as
+    the best set on that count.
+
+    Args:
+        df (pandas.DataFrame): purchase_df.
+        pink (float, optional): Weight of the pink/purple pieces (default
+            is 1.0).
+        pieces (float, optional): Weight of the piece total (default is 0.0).
+        retired (float, optional): Value of a retired set; negative values
+            favor sets still on the market (default is 0.0).
+
+    Returns:
+        numpy.ndarray: Value of each row.
+    """
+    values = np.zeros(len(df))
+    for column, weight in (('Pink/Purple Pieces', pink), ('Piece Total', pieces)):
+        counts = df[column].fillna(0).to_numpy(np.float64)
+        if weight and counts.max(initial=0) > 0:
+            values += weight * counts / counts.max()
+    return values + retired * df['Retired?'].fillna(False).to_numpy(np.float64)
+
+
+########################################################################
+def _knapsack(costs, values, groups, bonus, capacity, record=True):
+    """
+    Solves the 0/1 knapsack with a bonus for every group (theme) that has at
+    least one pick, for every capacity from 0 to capacity at once. Each
+    group keeps two states, nothing picked yet and something picked, and
+    each item updates the whole capacity axis in one NumPy step.
+
+    Args:
+        costs (numpy.ndarray): Integer cost of each item.
+        values (numpy.ndarray): Value of each item.
+        groups (numpy.ndarray): Integer group of each item.
+        bonus (float): Value of each group with a pick.
+        capacity (int): Largest capacity solved.
+        record (bool, optional): Keep the choices needed to recover the
+            picks (default is True).
+
+    Returns:
+        tuple: Best value per capacity, per-item choices (0 skipped, 1
+            picked after another item of its group, 2 first pick of its
+            group), per-group flags of whether the group is picked, and
+            the items of each group in processing order (choices and flags
+            are None when not recorded).
+    """
+    best = np.zeros(capacity + 1)
+    members = [np.flatnonzero(groups == group) for group in np.unique(groups)]
+    choices = np.zeros((len(costs), capacity + 1), dtype=np.uint8) if record else None
+    picked = np.zeros((len(members), capacity + 1), dtype=bool) if record else None
+    for g, items in enumerate(members):
+        some = np.full(capacity + 1, -np.inf)
+        for i in items:
+            cost = costs[i]
+            if cost > capacity:
+                continue
+            options = np.full((3, capacity + 1), -np.inf)
+            options[0] = some
+            options[1, cost:] = some[:capacity + 1 - cost] + values[i]
+            options[2, cost:] = best[:capacity + 1 - cost] + values[i] + bonus
+            if record:
+                choices[i] = options.argmax(axis=0)
+            some = options.max(axis=0)
+        if record:
+            picked[g] = some > best
+        best = np.maximum(best, some)
+    return best, choices, picked, members
+
+
+########################################################################
+def _purchase_inputs(df, unit):
+    """Rows with a price, their integer costs in units and theme codes."""
+    rows = np.flatnonzero(df['MSRP'].notna().to_numpy() & (df['MSRP'].to_numpy(np.float64) >= 0))
+    costs = np.ceil(df['MSRP'].to_numpy(np.float64)[rows] / unit).astype(np.int64)
+    groups = pd.factorize(df['Theme'].iloc[rows])[0]
+    return rows, costs, groups
+
+
+########################################################################
+def catalog_cost(df, unit=1.0):
+    """
+    Prices the whole purchase catalog the way the optimizer does (each
+    price rounded up to the unit), the largest budget that can buy more.
+
+    Args:
+        df (pandas.DataFrame): purchase_df.
+        unit (float, optional): Price resolution in dollars (default is 1.0).
+
+    Returns:
+        float: Cost of every priced set, in dollars.
+    """
+    return float(_purchase_inputs(df, unit)[1].sum() * unit)
+
+
+########################################################################
+def optimize_purchases(df, budget, pink=1.0, pieces=0.0, retired=0.0, diversity=0.0, unit=1.0):
+    """
+    Picks the purchases with the highest total value within a budget (see
+    purchase_values), with an optional bonus for every theme covered. The
+    solution is exact for prices rounded up to the unit.
+
+    Args:
+        df (pandas.DataFrame): purchase_df.
+        budget (float): Money available, in dollars.
+        pink (float, optional): Weight of the pink/purple pieces (default
+            is 1.0).
+        pieces (float, optional): Weight of the piece total (default is 0.0).
+        retired (float, optional): Value of a retired set (default is 0.0).
+        diversity (float, optional): Value of each theme with at least one
+            purchase (default is 0.0).
+        unit (float, optional): Price resolution in dollars (default is 1.0).
+
+    Returns:
+        pandas.DataFrame: The picked rows of df, in their original order.
+    """
+    rows, costs, groups = _purchase_inputs(df, unit)
+    capacity = int(np.floor(budget / unit + 1e-9))
+    if capacity < 0 or not len(rows):
+        return df.iloc[[]]
+    values = purchase_values(df, pink, pieces, retired)[rows]
+    _, choices, picked, members = _knapsack(costs, values, groups, diversity, capacity)
+
+    picks = []
+    left = capacity
+    for g in reversed(range(len(members))):
+        if not picked[g, left]:
+            continue
+        for i in reversed(members[g]):
+            choice = choices[i, left]
+            if choice:
+                picks.append(i)
+                left -= costs[i]
+            if choice == 2:
+                break
+    return df.iloc[np.sort(rows[picks]) if picks else []]
+
+
+########################################################################
+def purchase_frontier(df, max_budget=None, pink=1.0, pieces=0.0, retired=0.0, diversity=0.0, unit=1.0):
+    """
+    Computes the best purchase value for every budget in one pass (see
+    optimize_purchases).
+
+    Args:
+        df (pandas.DataFrame): purchase_df.
+        max_budget (float, optional): Largest budget, in dollars (default
+            is None, the price of the whole catalog).
+        pink (float, optional): Weight of the pink/purple pieces (default
+            is 1.0).
+        pieces (float, optional): Weight of the piece total (default is 0.0).
+        retired (float, optional): Value of a retired set (default is 0.0).
+        diversity (float, optional): Value of each theme with at least one
+            purchase (default is 0.0).
+        unit (float, optional): Price resolution in dollars (default is 1.0).
+
+    Returns:
+        pandas.DataFrame: budget and value at every budget where the best
+            value grows.
+    """
+    rows, costs, groups = _purchase_inputs(df, unit)
+    capacity = int(costs.sum()) if max_budget is None else int(np.floor(max_budget / unit + 1e-9))
+    values = purchase_values(df, pink, pieces, retired)[rows]
+    best = _knapsack(costs, values, groups, diversity, capacity, record=False)[0]
+    steps = np.flatnonzero(np.diff(best, prepend=-np.inf) > 1e-12)
+    return pd.DataFrame({'budget': steps * unit, 'value': best[steps]})
+
+
+########################################################################
+class PurchaseIndex:
+    """
+    Row positions of each theme and sort orders of a purchase table, so a
+    filtered, sorted page is cut from position arrays without scanning or
+    sorting the table again. Sort orders are built on first use.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        codes, themes = pd.factorize(df['Theme'])
+        by_theme = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[by_theme], np.arange(len(themes) + 1))
+        self.themes = list(themes)
+        self.rows = {theme: by_theme[bounds[i]:bounds[i + 1]] for i, theme in enumerate(self.themes)}
+        self._orders = {}
+        self._lock = threading.Lock()
+
+    def order(self, column, ascending=True):
+        """
+        Returns the row positions of the whole table sorted by a column
+        (stable, missing values last).
+
+        Args:
+            column (str): Column to sort by.
+            ascending (bool, optional): Sort direction (default is True).
+
+        Returns:
+            numpy.ndarray: Row positions.
+        """
+        key = (column, ascending)
+        with self._lock:
+            order = self._orders.get(key)
+        if order is None:
+            values = self.df[column].reset_index(drop=True)
+            order = values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+            with self._lock:
+                self._orders[key] = order
+        return order
+
+    def select(self, themes=None, sort=None, ascending=True):
+        """
+        Lists the rows of the chosen themes in display order.
+
+        Args:
+            themes (list, optional): Themes to keep (default is None, every
+                theme).
+            sort (str, optional): Column to sort by (default is None, table
+                order).
+            ascending (bool, optional): Sort direction (default is True).
+
+        Returns:
+            numpy.ndarray: Row positions.
+        """
+        if themes is None:
+            rows = None
+        else:
+            parts = [self.rows[theme] for theme in themes if theme in self.rows]
+            rows = np.sort(np.concatenate(parts)) if parts else np.array([], dtype=np.int64)
+        if sort is None:
+            return np.arange(len(self.df)) if rows is None else rows
+        order = self.order(sort, ascending)
+        if rows is None:
+            return order
+        keep = np.zeros(len(self.df), dtype=bool)
+        keep[rows] = True
+        return order[keep[order]]
+
+    def page(self, themes=None, sort=None, ascending=True, page=1, page_size=50):
+        """
+        Cuts one page of the filtered, sorted table.
+
+        Args:
+            themes (list, optional): Themes to keep (default is None, every
+                theme).
+            sort (str, optional): Column to sort by (default is None, table
+                order).
+            ascending (bool, optional): Sort direction (default is True).
+            page (int, optional): Page number, from 1; pages past the last
+                show the last (default is 1).
+            page_size (int, optional): Rows per page (default is 50).
+
+        Returns:
+            tuple: The page's rows of the table, the page number shown and
+                the number of matching rows.
+        """
+        rows = self.select(themes, sort, ascending)
+        pages = max(1, -(-len(rows) // page_size))
+        page = min(max(1, page), pages)
+        return self.df.iloc[rows[(page - 1) * page_size:page * page_size]], page, len(rows)
+
+
+########################################################################
+def read_purchase_index(data_path):
+    """
+    Loads the index of a purchase table, rebuilding it only when the
+    artifact changes.
+
+    Args:
+        data_path (str): Path to the purchase table (Recs/purchase_df).
+
+    Returns:
+        PurchaseIndex: The index over the whole table.
+    """
+    return ll.memo_artifact(data_path, PurchaseIndex)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the modules of the app live in the folder above
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
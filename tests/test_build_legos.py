@@ -0,0 +1,60 @@
+"""Tests of the code hashing that marks build nodes stale."""
+
+import importlib
+import sys
+
+import pytest
+
+import build_legos as bl
+
+
+########################################################################
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """A project with a helper module and a node calling it through the module."""
+    (tmp_path / 'stale_helper.py').write_text('FACTOR = 2\n\n\ndef scale(df):\n    return df * FACTOR\n')
+    (tmp_path / 'stale_node.py').write_text('import stale_helper as sh\n\n\ndef node(df):\n    return sh.scale(df)\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(bl, 'PROJECT_DIR', str(tmp_path))
+    yield tmp_path
+    for name in ('stale_helper', 'stale_node'):
+        sys.modules.pop(name, None)
+
+
+########################################################################
+def test_code_digest_follows_module_attributes(project):
+    import stale_helper
+    import stale_node
+
+    digest = bl.code_digest([stale_node.node], {})
+    assert bl.code_digest([stale_node.node], {}) == digest
+    assert bl.code_digest([stale_node.node], {'n': 5}) != digest
+
+    # the helper's code changes
+    (project / 'stale_helper.py').write_text('FACTOR = 2\n\n\ndef scale(df):\n    return df * FACTOR * 1\n')
+    importlib.reload(stale_helper)
+    changed = bl.code_digest([stale_node.node], {})
+    assert changed != digest
+
+    # a constant the helper reads changes
+    (project / 'stale_helper.py').write_text('FACTOR = 3\n\n\ndef scale(df):\n    return df * FACTOR * 1\n')
+    importlib.reload(stale_helper)
+    assert bl.code_digest([stale_node.node], {}) not in (digest, changed)
+
+
+########################################################################
+def test_code_digest_marks_nodes_of_edited_modules_stale():
+    graph = bl.build_graph()
+    builder, _, params, _ = graph['Recs/probability_df']
+    digest = bl.code_digest([builder, bl.image_uri], params)
+
+    def changed_by(module, name):
+        func = getattr(module, name)
+        try:
+            setattr(module, name, lambda *args, **kwargs: func(*args, **kwargs))
+            return bl.code_digest([builder, bl.image_uri], params) != digest
+        finally:
+            setattr(module, name, func)
+
+    assert changed_by(bl.rc, 'rank_themes')
+    assert not changed_by(bl.mt, 'summarize')
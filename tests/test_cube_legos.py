@@ -0,0 +1,49 @@
+"""Tests of the by-year cube."""
+
+import numpy as np
+import pandas as pd
+
+import cube_legos as cu
+
+
+########################################################################
+def _facts(rows=400, seed=3):
+    rng = np.random.default_rng(seed)
+    colors = {'Pink': '#FF69B4', 'Lavender': '#E6E6FA', 'Magenta': '#FF00FF'}
+    facts = pd.DataFrame({'year': rng.integers(2000, 2004, rows),
+                          'category': rng.choice(['princess', 'fairy', cu.NO_CATEGORY], rows),
+                          'family': rng.choice(['pink', 'purple'], rows),
+                          'color_name': rng.choice(list(colors), rows),
+                          'theme_name': rng.choice(['Friends', 'Elves', 'Disney'], rows),
+                          'set_num': rng.choice([f'{n}-1' for n in range(12)], rows),
+                          'part_num': rng.choice([f'p{n}' for n in range(20)], rows),
+                          'quantity': rng.integers(1, 9, rows)})
+    facts['hex'] = facts['color_name'].map(colors)
+    return facts
+
+
+########################################################################
+def test_rollup_counts_distinct_members_per_cell():
+    facts = _facts()
+    cube = cu.YearCube.from_facts(facts)
+
+    for by in (['year'], ['year', 'color_name'], ['category', 'family']):
+        out = cube.rollup(by, measures=('quantity', 'part_num', 'set_num', 'theme_name'))
+        expected = facts.groupby(by).agg(quantity=('quantity', 'sum'),
+                                         part_num=('part_num', 'nunique'),
+                                         set_num=('set_num', 'nunique'),
+                                         theme_name=('theme_name', 'nunique')).reset_index()
+        pd.testing.assert_frame_equal(out[expected.columns].reset_index(drop=True), expected,
+                                      check_dtype=False)
+
+
+########################################################################
+def test_rollup_of_a_slice_counts_each_set_once():
+    facts = _facts()
+    cube = cu.YearCube.from_facts(facts).slice(family='pink', year=[2001, 2002])
+    kept = facts[(facts['family'] == 'pink') & facts['year'].isin([2001, 2002])]
+
+    total = cube.rollup([])
+    assert total['quantity'].item() == kept['quantity'].sum()
+    assert total['set_num'].item() == kept['set_num'].nunique()
+    assert total['part_num'].item() == kept['part_num'].nunique()
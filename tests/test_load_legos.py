@@ -0,0 +1,99 @@
+"""Tests of the artifact cache and the single-flight coordinator."""
+
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import load_legos as ll
+
+
+########################################################################
+def _write(path, df, mtime):
+    df.to_pickle(path)
+    os.utime(path, (mtime, mtime))
+
+
+########################################################################
+def test_cache_reads_an_artifact_again_when_it_changes(tmp_path):
+    path = str(tmp_path / 'sets')
+    _write(path, pd.DataFrame({'sets': [1, 2, 3]}), 1_000_000)
+    cache = ll.ArtifactCache()
+
+    assert cache.load(path)['sets'].tolist() == [1, 2, 3]
+    assert cache.load(path)['sets'].tolist() == [1, 2, 3]
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 1)
+
+    _write(path, pd.DataFrame({'sets': [4, 5]}), 1_000_100)
+    assert cache.load(path)['sets'].tolist() == [4, 5]
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 2)
+
+
+########################################################################
+def test_cached_frames_are_read_only_and_copies_are_independent(tmp_path):
+    path = str(tmp_path / 'parts')
+    _write(path, pd.DataFrame({'quantity': [1, 2], 'color_name': ['Pink', 'Lavender']}), 1_000_000)
+    cache = ll.ArtifactCache()
+
+    df = cache.load(path)
+    with pytest.raises(ValueError):
+        df.loc[0, 'quantity'] = 10
+    df['extra'] = 1
+    assert list(cache.load(path).columns) == ['quantity', 'color_name']
+    assert cache.load(path)['quantity'].tolist() == [1, 2]
+
+
+########################################################################
+def test_memo_artifact_builds_again_when_the_artifact_changes(tmp_path):
+    path = str(tmp_path / 'metrics')
+    _write(path, pd.DataFrame({'sets': [1, 2]}), 1_000_000)
+    built = []
+
+    def total(df):
+        built.append(len(df))
+        return int(df['sets'].sum())
+
+    assert ll.memo_artifact(path, total) == 3
+    assert ll.memo_artifact(path, total) == 3
+    _write(path, pd.DataFrame({'sets': [5]}), 1_000_100)
+    assert ll.memo_artifact(path, total) == 5
+    assert built == [2, 1]
+
+
+########################################################################
+def test_single_flight_hands_the_error_to_every_waiting_caller():
+    flight = ll.SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls, errors = [], []
+
+    def fail():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        raise ValueError('read failed')
+
+    def call():
+        try:
+            flight.do('sets', fail)
+        except ValueError as error:
+            errors.append(error)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    assert started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    deadline = time.monotonic() + 5
+    while flight.stats()['coalesced'] == 0 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert len(calls) == 1
+    assert len(errors) == 2 and errors[0] is errors[1]
+    assert flight.stats()['in_flight'] == 0
+    # the failure is not kept: the next call runs again
+    assert flight.do('sets', lambda: 'read') == 'read'
@@ -0,0 +1,58 @@
+"""Tests of the purchase optimizer and the purchase table index."""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+import recs_legos as rc
+
+
+########################################################################
+def _brute_force(costs, values, groups, bonus, capacity):
+    """Best value of every capacity over every subset of the items."""
+    best = np.zeros(capacity + 1)
+    for picks in itertools.product([False, True], repeat=len(costs)):
+        picks = np.array(picks, dtype=bool)
+        cost = int(costs[picks].sum())
+        if cost > capacity:
+            continue
+        value = values[picks].sum() + bonus * len(np.unique(groups[picks]))
+        best[cost:] = np.maximum(best[cost:], value)
+    return best
+
+
+########################################################################
+def test_knapsack_matches_brute_force_on_small_inputs():
+    rng = np.random.default_rng(7)
+    for _ in range(200):
+        items = int(rng.integers(1, 8))
+        costs = rng.integers(0, 6, items)
+        values = rng.random(items).round(3)
+        groups = rng.integers(0, 3, items)
+        bonus = float(rng.choice([0.0, 0.25, 1.0]))
+        capacity = int(rng.integers(0, 15))
+        best = rc._knapsack(costs, values, groups, bonus, capacity)[0]
+        assert np.allclose(best, _brute_force(costs, values, groups, bonus, capacity))
+
+
+########################################################################
+def test_purchase_index_pages_stay_in_bounds():
+    df = pd.DataFrame({'Theme': ['Friends', 'Elves', 'Friends', 'Disney', 'Friends', 'Elves', 'Friends'],
+                       'MSRP': [10.0, 30.0, None, 20.0, 5.0, 40.0, 15.0]})
+    index = rc.PurchaseIndex(df)
+
+    rows, page, total = index.page(page=1, page_size=3)
+    assert (page, total, len(rows)) == (1, 7, 3)
+    rows, page, total = index.page(page=0, page_size=3)
+    assert (page, len(rows)) == (1, 3)
+    rows, page, total = index.page(page=99, page_size=3)
+    assert (page, rows.index.tolist()) == (3, [6])
+
+    rows, page, total = index.page(themes=['Friends'], sort='MSRP', page=2, page_size=3)
+    assert (page, total) == (2, 4)
+    # missing prices sort last
+    assert rows.index.tolist() == [2]
+
+    rows, page, total = index.page(themes=['Ninjago'], page=5)
+    assert (page, total, len(rows)) == (1, 0, 0)
@@ -0,0 +1,127 @@
+"""Tests of the thumbnail store and the prefetch, against a local stand-in image server."""
+
+import base64
+import http.server
+import io
+import threading
+import time
+from email.utils import formatdate
+
+import pandas as pd
+import pytest
+from PIL import Image
+
+import thumbs_legos as tl
+
+ETAG = '"pink"'
+
+
+########################################################################
+def _png(color=(255, 105, 180)):
+    image = io.BytesIO()
+    Image.new('RGB', (64, 64), color).save(image, format='PNG')
+    return image.getvalue()
+
+
+########################################################################
+@pytest.fixture
+def stand_in():
+    """
+    A local image server: throttles its first image (503 with Retry-After
+    in seconds, then 429 with a date), fails one with 500, misses one with
+    404, delays the others and answers 304 to a matching If-None-Match. It
+    records the times of the requests to each path and the most requests
+    served at once.
+    """
+    image = _png()
+    hits = {}
+    active = {'now': 0, 'max': 0}
+    lock = threading.Lock()
+
+    class StandIn(http.server.BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, headers=(), body=b''):
+            self.send_response(status)
+            for name, value in headers:
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            with lock:
+                hits.setdefault(self.path, []).append(time.monotonic())
+                count = len(hits[self.path])
+                active['now'] += 1
+                active['max'] = max(active['max'], active['now'])
+            try:
+                if self.path.startswith('/slow/'):
+                    time.sleep(0.2)
+                if self.path == '/throttled.png' and count == 1:
+                    self._reply(503, [('Retry-After', '0.3')])
+                elif self.path == '/throttled.png' and count == 2:
+                    self._reply(429, [('Retry-After', formatdate(time.time() + 1, usegmt=True))])
+                elif self.path == '/broken.png':
+                    self._reply(500)
+                elif self.path == '/missing.png':
+                    self._reply(404)
+                elif self.headers.get('If-None-Match') == ETAG:
+                    self._reply(304, [('ETag', ETAG)])
+                else:
+                    self._reply(200, [('Content-Type', 'image/png'), ('ETag', ETAG),
+                                      ('Last-Modified', formatdate(usegmt=True))], image)
+            finally:
+                with lock:
+                    active['now'] -= 1
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f'http://127.0.0.1:{server.server_port}', hits, active
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+########################################################################
+def test_prefetch_retries_revalidates_and_limits_connections(stand_in, tmp_path):
+    base, hits, active = stand_in
+    workers, per_host = 4, 2
+    names = ['throttled.png', 'image.png', 'broken.png', 'missing.png'] + [f'slow/{i}.png' for i in range(8)]
+    sources = {f'{base}/{name}': ['piece'] for name in names}
+    store = tl.ThumbStore(root=str(tmp_path), offline=False)
+
+    first = tl.prefetch(workers=workers, per_host=per_host, retries=2, backoff=0.05,
+                        store=store, sources=sources)
+    second = tl.prefetch(workers=workers, per_host=per_host, retries=2, backoff=0.05,
+                         refresh=True, store=store, sources=sources)
+
+    assert first['stored'] == 10
+    assert first['failed'] == 2
+    # retried after each Retry-After, in seconds then as a date
+    throttled = hits['/throttled.png']
+    assert len(throttled) == 4 and throttled[1] - throttled[0] >= 0.3
+    # a failing image is retried on each run, a missing one is not
+    assert len(hits['/broken.png']) == 6
+    assert len(hits['/missing.png']) == 2
+    assert second['unchanged'] == 10
+    assert active['max'] == min(workers, per_host)
+
+
+########################################################################
+def test_thumb_urls_write_the_index_once_per_chart(tmp_path, monkeypatch):
+    store = tl.ThumbStore(root=str(tmp_path), offline=True)
+    monkeypatch.setattr(tl, 'thumb_store', store)
+    saves = []
+    save = store._save
+    monkeypatch.setattr(store, '_save', lambda *args: saves.append(1) or save(*args))
+    sources = pd.Series([f'data:image/png;base64,{base64.b64encode(_png((n, 0, 0))).decode()}'
+                         for n in range(20)])
+
+    urls = tl.thumb_urls(sources, 'piece')
+
+    assert urls.str.startswith(tl.THUMB_URL).all()
+    assert len(saves) == 1
+    assert tl.ThumbStore(root=str(tmp_path)).stats()['entries'] == 20
@@ -0,0 +1,747 @@
+"""
+A group of functions used to keep small copies of the set, theme and part
+images of the LEGO analysis and serve them from the app.
+
+Thumbnails are stored under THUMB_DIR, named by the hash of their contents,
+and served by Streamlit's static file serving (see .streamlit/config.toml).
+Embedded (data URI) images are resized on first use; remote images are only
+downloaded by the prefetch command, so pages never wait on other hosts.
+
+Usage:
+    python thumbs_legos.py prefetch [--root LegoData] [--workers 16] [--refresh] [--offline]
+    python thumbs_legos.py stats
+    python thumbs_legos.py evict [--budget-mb 64]
+"""
+
+import argparse
+import asyncio
+import base64
+import contextlib
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import aiohttp
+import requests
+from PIL import Image
+
+import load_legos as ll
+
+try:
+    import fcntl
+except ImportError:  # Windows: the index lock only covers this process
+    fcntl = None
+
+# Directory of the stored thumbnails, inside the app's static folder.
+THUMB_DIR = os.environ.get('LEGO_THUMB_DIR', os.path.join('static', 'thumbs'))
+
+# URL the app serves THUMB_DIR under.
+THUMB_URL = 'app/static/thumbs'
+
+# Disk budget of the thumbnail store, in megabytes.
+THUMB_BUDGET_MB = int(os.environ.get('LEGO_THUMB_BUDGET_MB', 64))
+
+# In offline mode remote images are never downloaded, and the charts leave out
+# remote images that are not stored yet instead of linking to their hosts.
+OFFLINE = os.environ.get('LEGO_OFFLINE', '') not in ('', '0')
+
+# A store over its budget with every thumbnail in use starts a new generation
+# (see ThumbStore.generation) at most this often, in seconds, so that the
+# thumbnails the rebuilt charts stop showing can be evicted.
+GENERATION_MIN_S = int(os.environ.get('LEGO_THUMB_GENERATION_MIN_S', 300))
+
+# Largest side in pixels of each kind of image, as drawn by graph_legos
+# (set images are also shown enlarged in the purchase table).
+DISPLAY_SIZES = {'logo': 100, 'piece': 50, 'set': 375}
+
+# Thumbnails are stored at this multiple of the display size, for high
+# density screens.
+THUMB_SCALE = 2
+
+# Image columns shown by the pages: (artifact, column, display size).
+PREFETCH = [('Colors/pink_names', 'image', 'logo'),
+            ('Colors/purple_names', 'image', 'logo'),
+            ('Colors/theme_colors', 'image', 'logo'),
+            ('Colors/theme_sets', 'image', 'logo'),
+            ('Colors/theme_pieces', 'image', 'logo'),
+            ('Category/all_cat_theme_sets', 'image', 'logo'),
+            ('Category/cat_theme_sets', 'image', 'logo'),
+            ('Colors/parts_most_colors', 'image', 'piece'),
+            ('Colors/color_pieces', 'image', 'piece'),
+            ('Category/cat_top_pieces', 'image', 'piece'),
+            ('Category/pink_top_pieces', 'image', 'piece'),
+            ('Images/set_images', 'image', 'set'),
+            ('Colors/set_colors', 'set_image', 'set'),
+            ('Colors/set_pieces', 'set_image', 'set'),
+            ('Category/all_set_colors', 'set_image', 'set'),
+            ('Category/cat_set_colors', 'set_image', 'set'),
+            ('Category/all_pink_pieces', 'set_image', 'set'),
+            ('Category/cat_pink_pieces', 'set_image', 'set'),
+            ('Recs/purchase_df', 'Set Image', 'set'),
+            ('Recs/to_purchase', 'set_image', 'set')]
+
+# Concurrent downloads of the prefetch, in total and per host.
+PREFETCH_WORKERS = int(os.environ.get('LEGO_PREFETCH_WORKERS', 16))
+HOST_WORKERS = 4
+
+# Download attempts after the first, the first retry delay in seconds (doubled
+# on each attempt) and the responses worth retrying.
+RETRIES = 3
+BACKOFF = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+########################################################################
+def is_remote(source):
+    """
+    Tells whether an image source is a remote http(s) URL.
+
+    Args:
+        source (str): Image URL or data URI.
+
+    Returns:
+        bool: True for http and https URLs.
+    """
+    return urlparse(source).scheme in ('http', 'https')
+
+
+########################################################################
+def source_key(source):
+    """
+    Returns the store key of an image source: the URL of a remote image, or
+    the hash of an embedded one.
+
+    Args:
+        source (str): Image URL or data URI.
+
+    Returns:
+        str: The key.
+    """
+    if is_remote(source):
+        return source
+    return 'sha256:' + hashlib.sha256(source.encode()).hexdigest()
+
+
+########################################################################
+def read_source(source, timeout=20):
+    """
+    Reads the bytes of an image, downloading remote images.
+
+    Args:
+        source (str): Image URL or data URI.
+        timeout (int, optional): Download timeout in seconds (default is 20).
+
+    Returns:
+        bytes: The image file contents.
+    """
+    if source.startswith('data:'):
+        return base64.b64decode(source.split(',', 1)[1])
+    response = requests.get(source, timeout=timeout)
+    response.raise_for_status()
+    return response.content
+
+
+########################################################################
+def make_thumbnail(data, size):
+    """
+    Shrinks an image to fit a display size; smaller images keep their size.
+
+    Args:
+        data (bytes): The image file contents.
+        size (str): A key of DISPLAY_SIZES.
+
+    Returns:
+        bytes: The thumbnail as a WebP file.
+    """
+    side = DISPLAY_SIZES[size] * THUMB_SCALE
+    with Image.open(io.BytesIO(data)) as img:
+        img = img.convert('RGBA' if 'A' in img.getbands() or 'transparency' in img.info
+                          else 'RGB')
+        img.thumbnail((side, side), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, format='WEBP', quality=85)
+    return out.getvalue()
+
+
+########################################################################
+class ThumbStore:
+    """
+    Content-addressed store of resized images.
+
+    Each thumbnail is written once as THUMB_DIR/<sha256>.webp, and an index
+    maps every (source, display size) to its file and the time it was last
+    used. The index is shared by every process of a host: each process
+    keeps its new entries and last-used times until it saves them, and
+    saving merges them into the index on disk under a file lock, as
+    eviction does.
+
+    Charts hold the URLs of the thumbnails they show, so the index counts
+    generations (see generation) and chart specs are cached per generation:
+    a new one starts whenever remote images are stored. Once the files
+    exceed the budget, the least recently used thumbnails are deleted,
+    except those used since the generation started, which the charts of the
+    generation may show; when that is not enough, a new generation starts
+    (at most every GENERATION_MIN_S seconds) so the rebuilt charts mark the
+    thumbnails they still show.
+
+    Args:
+        root (str, optional): Store directory (default is THUMB_DIR).
+        max_bytes (int, optional): Disk budget in bytes (default is
+            THUMB_BUDGET_MB megabytes).
+        offline (bool, optional): Never download remote images (default is
+            OFFLINE).
+    """
+
+    def __init__(self, root=THUMB_DIR, max_bytes=THUMB_BUDGET_MB * 2 ** 20, offline=OFFLINE):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._lock = threading.RLock()
+        # the index as last read from or written to disk, and its file stamp
+        self._index = None
+        self._stamp = None
+        # entries stored and last-used times of this process, not saved yet
+        self._added = {}
+        self._used = {}
+
+    def _index_path(self):
+        return os.path.join(self.root, 'index.json')
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Holds the index lock, across processes where fcntl exists."""
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            with open(os.path.join(self.root, '.lock'), 'a') as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                yield
+
+    def _read(self):
+        """
+        The index on disk (generation, its start time and the entries), read
+        again whenever another process replaced it (the lock must be held).
+        """
+        try:
+            stamp = ll.artifact_stamp(self._index_path())
+        except FileNotFoundError:
+            stamp = None
+        if self._index is None or stamp != self._stamp:
+            try:
+                with open(self._index_path()) as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                index = {}
+            if 'entries' not in index:
+                # an index without generations holds only entries
+                index = {'generation': 0, 'started': 0.0, 'entries': index}
+            self._index, self._stamp = index, stamp
+        return self._index
+
+    def _entries(self):
+        """The entries of the index on disk (the lock must be held)."""
+        return self._read()['entries']
+
+    def _entry(self, key):
+        """The entry of a key, saved or not (the lock must be held)."""
+        return self._added.get(key) or self._entries().get(key)
+
+    def _save(self, max_bytes=None):
+        """
+        Merges the unsaved entries and last-used times into the index on
+        disk, evicts over the budget and writes the index atomically (the
+        index lock must be held, see _locked).
+
+        Args:
+            max_bytes (int, optional): Budget in bytes (default is the store's).
+
+        Returns:
+            int: Number of index entries dropped.
+        """
+        self._index = None
+        index = self._read()
+        entries = {key: dict(entry) for key, entry in index['entries'].items()}
+        # charts showed remote images stored now (or stored with other
+        # contents) from their source
+        # a process evicting before they were saved may have deleted the
+        # files of entries stored without saving (see store)
+        added = {key: entry for key, entry in self._added.items() if os.path.exists(self._file(entry['digest']))}
+        changed = any(is_remote(key.split('|', 1)[1]) and entries.get(key, {}).get('digest') != entry['digest']
+                      for key, entry in added.items())
+        entries.update(added)
+        for key, used in self._used.items():
+            if key in entries:
+                entries[key]['used'] = max(entries[key]['used'], used)
+        dropped, over = self._evict(entries, self.max_bytes if max_bytes is None else max_bytes,
+                                    index['started'])
+        generation, started = index['generation'], index['started']
+        now = time.time()
+        # dropped thumbnails were last used before the generation started,
+        # so none of its charts shows them
+        if changed or (over and now - started >= GENERATION_MIN_S):
+            generation, started = generation + 1, now
+        if added or self._used or dropped or generation != index['generation']:
+            index = {'generation': generation, 'started': started, 'entries': entries}
+            tmp_path = f'{self._index_path()}.tmp{os.getpid()}'
+            with open(tmp_path, 'w') as f:
+                json.dump(index, f)
+            os.replace(tmp_path, self._index_path())
+            self._index, self._stamp = index, ll.artifact_stamp(self._index_path())
+        self._added.clear()
+        self._used.clear()
+        return dropped
+
+    def _evict(self, entries, max_bytes, started):
+        """
+        Drops the least recently used entries until their files fit the
+        budget, deleting the files no entry uses anymore. Entries used since
+        the generation started are kept.
+
+        Args:
+            entries (dict): The merged index; it is modified in place.
+            max_bytes (int): Budget in bytes.
+            started (float): Start time of the generation.
+
+        Returns:
+            tuple: Number of entries dropped, and whether the files still
+                exceed the budget.
+        """
+        sizes = {entry['digest']: entry['bytes'] for entry in entries.values()}
+        total = sum(sizes.values())
+        dropped = 0
+        for key in sorted(entries, key=lambda k: entries[k]['used']):
+            if total <= max_bytes or entries[key]['used'] >= started:
+                break
+            digest = entries.pop(key)['digest']
+            dropped += 1
+            if not any(entry['digest'] == digest for entry in entries.values()):
+                total -= sizes[digest]
+                try:
+                    os.remove(self._file(digest))
+                except FileNotFoundError:
+                    pass
+        return dropped, total > max_bytes
+
+    def _file(self, digest):
+        return os.path.join(self.root, digest + '.webp')
+
+    def lookup(self, source, size):
+        """
+        Returns the stored thumbnail of an image, if any.
+
+        Args:
+            source (str): Image URL or data URI.
+            size (str): A key of DISPLAY_SIZES.
+
+        Returns:
+            str: The thumbnail's content hash, or None when it is not stored.
+        """
+        key = f'{size}|{source_key(source)}'
+        with self._lock:
+            entry = self._entry(key)
+            if entry is None or not os.path.exists(self._file(entry['digest'])):
+                return None
+            self._used[key] = time.time()
+            return entry['digest']
+
+    def validators(self, source):
+        """
+        Returns the HTTP validators recorded when a remote image was stored.
+
+        Args:
+            source (str): Image URL.
+
+        Returns:
+            dict: Its ETag and Last-Modified headers, empty when not stored.
+        """
+        with self._lock:
+            for size in DISPLAY_SIZES:
+                entry = self._entry(f'{size}|{source_key(source)}')
+                if entry is not None:
+                    return {name: entry[name] for name in ('etag', 'last_modified')
+                            if entry.get(name)}
+        return {}
+
+    def store(self, source, size, data=None, validators=None, save=True):
+        """
+        Resizes an image and stores the thumbnail.
+
+        Args:
+            source (str): Image URL or data URI.
+            size (str): A key of DISPLAY_SIZES.
+            data (bytes, optional): The image contents, when already read
+                (default is None, read them from source).
+            validators (dict, optional): ETag and Last-Modified headers of the
+                download, kept for conditional requests (default is None).
+            save (bool, optional): Save the index now (default is True); see
+                flush.
+
+        Returns:
+            str: The thumbnail's content hash.
+        """
+        if data is None:
+            if self.offline and is_remote(source):
+                raise ConnectionError(f'offline: not downloading {source}')
+            data = read_source(source)
+        thumb = make_thumbnail(data, size)
+        digest = hashlib.sha256(thumb).hexdigest()
+        file_path = self._file(digest)
+        entry = dict(validators or {}, digest=digest, bytes=len(thumb), used=time.time())
+
+        # the file is written under the index lock when saving, so another
+        # process evicting its digest cannot delete it before it is indexed;
+        # otherwise _save leaves out the entry if its file was deleted
+        with (self._locked() if save else self._lock):
+            os.makedirs(self.root, exist_ok=True)
+            if not os.path.exists(file_path):
+                tmp_path = f'{file_path}.tmp{os.getpid()}.{threading.get_ident()}'
+                with open(tmp_path, 'wb') as f:
+                    f.write(thumb)
+                os.replace(tmp_path, file_path)
+            self._added[f'{size}|{source_key(source)}'] = entry
+            if save:
+                self._save()
+        return digest
+
+    def url(self, source, size):
+        """
+        Returns the URL to show an image at a display size. Embedded images
+        are resized and stored on first use, without saving the index (see
+        keep_used). Remote images that are not stored keep their own URL, or
+        are left out in offline mode.
+
+        Args:
+            source (str): Image URL or data URI.
+            size (str): A key of DISPLAY_SIZES.
+
+        Returns:
+            str: The served thumbnail URL, the source itself, or None.
+        """
+        if not isinstance(source, str) or not source:
+            return None
+        digest = self.lookup(source, size)
+        if digest is None and is_remote(source):
+            return None if self.offline else source
+        if digest is None:
+            try:
+                digest = self.store(source, size, save=False)
+            except (OSError, ValueError):
+                return source
+        return f'{THUMB_URL}/{digest}.webp'
+
+    def generation(self):
+        """
+        Returns the state of the store that charts showing its images depend
+        on: its generation, which changes whenever a stored thumbnail may
+        replace the URL a chart holds, and the offline mode.
+
+        Returns:
+            str: Store directory, generation and offline flag.
+        """
+        with self._lock:
+            generation = self._read()['generation']
+        return f"{os.path.abspath(self.root)}#{generation}{' offline' if self.offline else ''}"
+
+    def keep_used(self):
+        """
+        Saves the thumbnails stored by this process, and the last use of the
+        thumbnails it looked up when the index does not protect them from
+        eviction yet, i.e. when they were last used before the generation
+        started. Called once a chart's images are resolved, so the index is
+        written once per chart and no process evicts thumbnails it shows.
+        """
+        with self._lock:
+            index = self._read()
+            unsaved = bool(self._added) or \
+                any(index['entries'].get(key, {}).get('used', -1.0) < index['started'] for key in self._used)
+        if unsaved:
+            self.flush()
+
+    def evict(self, max_bytes=None):
+        """
+        Deletes the least recently used thumbnails until the store fits its
+        budget, after saving this process's changes to the index. Thumbnails
+        used since the generation started are kept (see ThumbStore).
+
+        Args:
+            max_bytes (int, optional): Budget in bytes (default is the store's).
+
+        Returns:
+            int: Number of index entries dropped.
+        """
+        with self._locked():
+            return self._save(max_bytes)
+
+    def flush(self):
+        """Saves the entries stored and the last-used times to the index."""
+        with self._locked():
+            self._save()
+
+    def stats(self):
+        """
+        Returns the store counters.
+
+        Returns:
+            dict: Index entries, distinct files, bytes on disk, the budget and
+                the generation.
+        """
+        with self._lock:
+            index = self._read()
+            entries = dict(index['entries'], **self._added)
+            sizes = {entry['digest']: entry['bytes'] for entry in entries.values()}
+            return {'generation': index['generation'],
+                    'entries': len(entries),
+                    'files': len(sizes),
+                    'bytes': sum(sizes.values()),
+                    'max_bytes': self.max_bytes}
+
+
+thumb_store = ThumbStore()
+
+
+########################################################################
+def thumb_urls(sources, size):
+    """
+    Maps a column of image sources to the URLs to show them at a display
+    size (see ThumbStore.url), then saves the thumbnails stored for them in
+    one index write and keeps those used from eviction (see
+    ThumbStore.keep_used).
+
+    Args:
+        sources (pandas.Series): Image URLs or data URIs.
+        size (str): A key of DISPLAY_SIZES.
+
+    Returns:
+        pandas.Series: The image URLs.
+    """
+    urls = {source: thumb_store.url(source, size) for source in sources.dropna().unique()}
+    thumb_store.keep_used()
+    return sources.map(urls)
+
+
+########################################################################
+def image_sources(root='LegoData'):
+    """
+    Collects the distinct images shown by the pages (see PREFETCH).
+
+    Args:
+        root (str, optional): Directory holding the artifacts (default is
+            'LegoData').
+
+    Returns:
+        dict: The display sizes of each image source.
+    """
+    found = {}
+    for artifact, column, size in PREFETCH:
+        data_path = os.path.join(root, artifact)
+        if not os.path.exists(ll.resolve_artifact(data_path)):
+            continue
+        for source in ll.read_artifact(data_path, columns=[column])[column].dropna().unique():
+            sizes = found.setdefault(source, [])
+            if size not in sizes:
+                sizes.append(size)
+    return found
+
+
+########################################################################
+def _retry_delay(response, attempt, backoff):
+    """Seconds before the next attempt: the server's Retry-After, else exponential backoff."""
+    value = response is not None and response.headers.get('Retry-After')
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return backoff * 2 ** attempt
+
+
+########################################################################
+async def fetch_image(session, url, headers=None, retries=RETRIES, backoff=BACKOFF, timeout=20):
+    """
+    Downloads an image with a pooled aiohttp session, retrying connection
+    errors and throttled or failed responses (RETRY_STATUSES) after the
+    server's Retry-After delay, or with exponential backoff.
+
+    Args:
+        session (aiohttp.ClientSession): The pooled session.
+        url (str): Image URL.
+        headers (dict, optional): Request headers (default is None).
+        retries (int, optional): Attempts after the first (default is RETRIES).
+        backoff (float, optional): First retry delay in seconds, doubled on
+            every attempt (default is BACKOFF).
+        timeout (int, optional): Request timeout in seconds (default is 20).
+
+    Returns:
+        tuple: The last response (aiohttp.ClientResponse, released) and its
+            body.
+    """
+    for attempt in range(retries + 1):
+        try:
+            async with session.get(url, headers=headers,
+                                   timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                body = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if attempt == retries:
+                raise
+            response = None
+        else:
+            if response.status not in RETRY_STATUSES or attempt == retries:
+                return response, body
+        await asyncio.sleep(_retry_delay(response, attempt, backoff))
+
+
+########################################################################
+async def _prefetch_remote(store, items, workers, per_host, retries, backoff, progress):
+    """
+    Downloads remote images concurrently and stores their thumbnails. The
+    session's connection pool opens at most workers connections, and
+    per_host to each host; the thumbnails are made on worker threads.
+
+    Args:
+        store (ThumbStore): Store to fill.
+        items (list): (url, sizes to store, conditional request headers).
+        workers (int): Concurrent downloads in total.
+        per_host (int): Concurrent downloads per host.
+        retries (int): Attempts after the first.
+        backoff (float): First retry delay in seconds.
+        progress (callable): Called with (done, total) after each image, or None.
+
+    Returns:
+        dict: Numbers of images stored, unchanged (304) and failed.
+    """
+    counts = {'stored': 0, 'unchanged': 0, 'failed': 0}
+
+    async def fetch(session, url, sizes, headers):
+        try:
+            response, data = await fetch_image(session, url, headers, retries, backoff)
+            if response.status == 304:
+                return 'unchanged'
+            response.raise_for_status()
+            validators = {'etag': response.headers.get('ETag'),
+                          'last_modified': response.headers.get('Last-Modified')}
+            for size in sizes:
+                await asyncio.to_thread(store.store, url, size, data, validators, False)
+            return 'stored'
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError, ValueError):
+            return 'failed'
+
+    connector = aiohttp.TCPConnector(limit=workers, limit_per_host=per_host)
+    try:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            tasks = [asyncio.ensure_future(fetch(session, *item)) for item in items]
+            for done, task in enumerate(asyncio.as_completed(tasks), 1):
+                outcome = await task
+                counts[outcome] += 1
+                if outcome == 'stored' and counts['stored'] % 25 == 0:
+                    # progress survives an interrupted run
+                    store.flush()
+                if progress:
+                    progress(done, len(items))
+    finally:
+        store.flush()
+    return counts
+
+
+########################################################################
+def prefetch(root='LegoData', workers=PREFETCH_WORKERS, per_host=HOST_WORKERS,
+             retries=RETRIES, backoff=BACKOFF, refresh=False, store=None,
+             sources=None, progress=None):
+    """
+    Stores the thumbnail of every image shown by the pages. Remote images are
+    downloaded with aiohttp, at most workers at a time and per_host per host.
+    Images that are already stored are skipped, so an interrupted run resumes
+    where it stopped.
+
+    Args:
+        root (str, optional): Directory holding the artifacts (default is
+            'LegoData').
+        workers (int, optional): Concurrent downloads (default is PREFETCH_WORKERS).
+        per_host (int, optional): Concurrent downloads per host (default is
+            HOST_WORKERS).
+        retries (int, optional): Attempts after the first (default is RETRIES).
+        backoff (float, optional): First retry delay in seconds (default is BACKOFF).
+        refresh (bool, optional): Revalidate stored remote images with
+            conditional requests (ETag / If-Modified-Since) instead of
+            skipping them (default is False).
+        store (ThumbStore, optional): Store to fill (default is thumb_store).
+        sources (dict, optional): Display sizes of each image source (default
+            is image_sources(root)).
+        progress (callable, optional): Called with (done, total) after each
+            download (default is None).
+
+    Returns:
+        dict: Numbers of images already stored, stored now, revalidated as
+            unchanged, skipped because the store is offline, and failed.
+    """
+    store = store or thumb_store
+    sources = image_sources(root) if sources is None else sources
+    counts = {'cached': 0, 'stored': 0, 'unchanged': 0, 'skipped': 0, 'failed': 0}
+    downloads = []
+    for source, sizes in sources.items():
+        missing = [size for size in sizes if not store.lookup(source, size)]
+        remote = is_remote(source)
+        if remote and store.offline:
+            counts['cached' if not missing else 'skipped'] += 1
+        elif remote and (missing or refresh):
+            headers = {}
+            if not missing:
+                validators = store.validators(source)
+                if validators.get('etag'):
+                    headers['If-None-Match'] = validators['etag']
+                if validators.get('last_modified'):
+                    headers['If-Modified-Since'] = validators['last_modified']
+            downloads.append((source, missing or sizes, headers))
+        elif missing:
+            try:
+                for size in missing:
+                    store.store(source, size, save=False)
+                counts['stored'] += 1
+            except (OSError, ValueError):
+                counts['failed'] += 1
+        else:
+            counts['cached'] += 1
+
+    if downloads:
+        fetched = asyncio.run(_prefetch_remote(store, downloads, workers, per_host,
+                                               retries, backoff, progress))
+        for outcome, number in fetched.items():
+            counts[outcome] += number
+    store.flush()
+    return counts
+
+
+########################################################################
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Fill, inspect or trim the local thumbnail store.')
+    parser.add_argument('command', choices=['prefetch', 'stats', 'evict'])
+    parser.add_argument('--root', default='LegoData')
+    parser.add_argument('--workers', type=int, default=PREFETCH_WORKERS)
+    parser.add_argument('--per-host', type=int, default=HOST_WORKERS)
+    parser.add_argument('--retries', type=int, default=RETRIES)
+    parser.add_argument('--refresh', action='store_true',
+                        help='revalidate stored images with conditional requests')
+    parser.add_argument('--offline', action='store_true', default=OFFLINE,
+                        help='only resize embedded images, never download')
+    parser.add_argument('--budget-mb', type=int, default=THUMB_BUDGET_MB)
+    args = parser.parse_args()
+
+    thumb_store.offline = args.offline
+    thumb_store.max_bytes = args.budget_mb * 2 ** 20
+    if args.command == 'prefetch':
+        print(prefetch(args.root, args.workers, args.per_host, args.retries,
+                       refresh=args.refresh,
+                       progress=lambda done, total: print(f'\r{done}/{total} downloaded',
+                                                          end='\n' if done == total else '')))
+    elif args.command == 'evict':
+        print(f'dropped {thumb_store.evict()} entries')
+        thumb_store.flush()
+    print(thumb_store.stats())
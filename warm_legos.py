@@ -0,0 +1,438 @@
+"""
+A group of functions used to warm the artifact and chart caches of the LEGO
+analysis in the background when the app process starts, so the first
+visitors do not wait for every artifact to load and every chart to build.
+
+The calls to warm are planned by running every page headlessly (AppTest, in
+a separate process) and recording the artifacts each page loads and the
+charts it builds, with their default widget values first and then with
+every combination of their radios and select boxes. `serve` records the
+plan (.cache/warmup_plan.pkl, not committed) before the server starts when
+it is missing or the pages, modules or libraries changed, starts the
+warm-up, then the server; the plan is replayed by a thread pool, page by
+page in WARMUP_ORDER, while the server accepts connections.
+
+Usage:
+    python warm_legos.py serve [streamlit options]
+    python warm_legos.py plan [--output .cache/warmup_plan.pkl]
+    python warm_legos.py run
+"""
+
+import argparse
+import glob
+import hashlib
+import importlib
+import os
+import pickle
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cache_legos as cl
+import load_legos as ll
+
+# Warm the caches when serve starts the app; 0 disables it.
+WARMUP = os.environ.get('LEGO_WARMUP', '1') not in ('', '0')
+
+# Pages warmed first, in this order; the others follow in app order.
+WARMUP_ORDER = [page for page in os.environ.get(
+    'LEGO_WARMUP_ORDER', 'pages/3_recommendations.py').split(',') if page]
+
+# Threads warming the caches.
+WARMUP_WORKERS = int(os.environ.get('LEGO_WARMUP_WORKERS', 4))
+
+# File of the recorded plan, relative to APP_DIR.
+WARMUP_PLAN = os.environ.get('LEGO_WARMUP_PLAN', os.path.join('.cache', 'warmup_plan.pkl'))
+
+# Loaders and chart builders called by the pages, as (module, function);
+# the plan records the calls the pages make to them.
+RECORDED_CALLS = [('load_legos', 'read_artifact'),
+                  ('cube_legos', 'read_cube'),
+                  ('metrics_legos', 'read_metrics'),
+                  ('recs_legos', 'read_purchase_index'),
+                  ('cache_legos', 'chart_spec')]
+
+# Widgets whose options are enumerated when recording the plan.
+RECORDED_WIDGETS = ('radio', 'selectbox')
+
+# Most page runs recorded per page; combinations beyond it are left out.
+PLAN_MAX_RUNS = int(os.environ.get('LEGO_PLAN_MAX_RUNS', 2000))
+
+# Folder of the app (intro.py and pages/), which the pages read from.
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Warm-up of this process, once started.
+_warmup = None
+_warmup_lock = threading.Lock()
+
+
+########################################################################
+def app_pages():
+    """
+    Lists the scripts of the app, main page first.
+
+    Returns:
+        list: Paths relative to APP_DIR.
+    """
+    pages = sorted(os.path.relpath(page, APP_DIR) for page in glob.glob(os.path.join(APP_DIR, 'pages', '*.py')))
+    return ['intro.py'] + pages
+
+
+########################################################################
+def ordered_pages(order=None):
+    """
+    Sorts the pages for the warm-up.
+
+    Args:
+        order (list, optional): Pages to warm first (default is WARMUP_ORDER).
+
+    Returns:
+        list: The pages of order that exist, then the others in app order.
+    """
+    pages = app_pages()
+    first = [page for page in (WARMUP_ORDER if order is None else order) if page in pages]
+    return first + [page for page in pages if page not in first]
+
+
+########################################################################
+def plan_digest():
+    """
+    Hashes what the recorded calls depend on: the pages and the modules of
+    the app, and the libraries whose objects the calls hold (e.g. Altair
+    tooltips).
+
+    Returns:
+        str: Hex sha256 digest of the source files and library versions.
+    """
+    files = [os.path.join(APP_DIR, page) for page in app_pages()]
+    files += sorted(glob.glob(os.path.join(APP_DIR, '*_legos.py')))
+    sha = hashlib.sha256(repr(sorted(cl.LIBRARY_VERSIONS.items())).encode())
+    for file_path in files:
+        sha.update(os.path.relpath(file_path, APP_DIR).encode())
+        sha.update(ll.file_digest(file_path).encode())
+    return sha.hexdigest()
+
+
+########################################################################
+def _choices(at):
+    """Radios and select boxes of a page run, in page order."""
+    return [node for block in (at.sidebar, at.main) for node in block if node.type in RECORDED_WIDGETS]
+
+
+########################################################################
+def _explore(at, fixed, runs, max_runs):
+    """
+    Runs a page with every combination of the options of its radios and
+    select boxes, depth first: each option of the first widget not yet
+    fixed, then the combinations of the widgets after it (including those
+    the option brings up).
+
+    Args:
+        at (AppTest): The page, already run.
+        fixed (frozenset): Ids of the widgets set by the callers.
+        runs (list): Count of page runs so far, shared by every call.
+        max_runs (int): Most page runs.
+    """
+    free = [widget for widget in _choices(at) if widget.id not in fixed]
+    if not free:
+        return
+    widget_id = free[0].id
+    for option in free[0].options:
+        widget = next((widget for widget in _choices(at) if widget.id == widget_id), None)
+        if widget is None or runs[0] >= max_runs:
+            return
+        if widget.value != option:
+            widget.set_value(option).run()
+            runs[0] += 1
+        _explore(at, fixed | {widget_id}, runs, max_runs)
+
+
+########################################################################
+def record_plan(pages=None, timeout=120, max_runs=PLAN_MAX_RUNS):
+    """
+    Runs pages headlessly and records their loader and chart calls, first
+    with the default widget values and then with every combination of the
+    options of their radios and select boxes. Calls made inside another
+    recorded call (e.g. the loads of a chart) are left to that call.
+    AppTest replaces Streamlit's runtime while it runs, so this must not
+    run inside the app's server process.
+
+    Args:
+        pages (list, optional): Pages to run (default is every page).
+        timeout (float, optional): Seconds allowed per page run (default
+            is 120).
+        max_runs (int, optional): Most runs per page (default is
+            PLAN_MAX_RUNS).
+
+    Returns:
+        dict: Page to its list of distinct calls, as (module, function,
+            args, kwargs), in the order the page made them.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    recorded = {}
+    current = {'calls': None, 'seen': None}
+    local = threading.local()
+
+    def recorder(func, module_name, name):
+        def wrapper(*args, **kwargs):
+            depth = getattr(local, 'depth', 0)
+            if depth == 0 and current['calls'] is not None:
+                call = (module_name, name, args, kwargs)
+                key = pickle.dumps(call)
+                if key not in current['seen']:
+                    current['seen'].add(key)
+                    current['calls'].append(call)
+            local.depth = depth + 1
+            try:
+                return func(*args, **kwargs)
+            finally:
+                local.depth = depth
+        return wrapper
+
+    originals = []
+    for module_name, name in RECORDED_CALLS:
+        module = importlib.import_module(module_name)
+        originals.append((module, name, getattr(module, name)))
+        setattr(module, name, recorder(getattr(module, name), module_name, name))
+    try:
+        for page in pages or app_pages():
+            current['calls'], current['seen'] = [], set()
+            at = AppTest.from_file(os.path.join(APP_DIR, page), default_timeout=timeout).run()
+            _explore(at, frozenset(), [1], max_runs)
+            recorded[page] = current['calls']
+    finally:
+        current['calls'] = None
+        for module, name, func in originals:
+            setattr(module, name, func)
+    return recorded
+
+
+########################################################################
+def write_plan(plan_path=WARMUP_PLAN):
+    """
+    Records the plan of every page (see record_plan) and writes it, with
+    the digest it was recorded for, under a temporary name moved into place.
+
+    Args:
+        plan_path (str, optional): File of the plan (default is WARMUP_PLAN).
+
+    Returns:
+        dict: Page to its recorded calls.
+    """
+    plan_path = os.path.join(APP_DIR, plan_path)
+    digest = plan_digest()
+    pages = record_plan()
+    os.makedirs(os.path.dirname(os.path.abspath(plan_path)), exist_ok=True)
+    tmp_path = f'{plan_path}.tmp{os.getpid()}'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'digest': digest, 'pages': pages}, f)
+    os.replace(tmp_path, plan_path)
+    return pages
+
+
+########################################################################
+def load_plan(plan_path=WARMUP_PLAN):
+    """
+    Reads the plan. It is never recorded here: a plan recorded for other
+    pages or modules is returned as it is (see update_plan).
+
+    Args:
+        plan_path (str, optional): File of the plan (default is WARMUP_PLAN).
+
+    Returns:
+        tuple: Page to its recorded calls, and whether the plan is stale.
+    """
+    with open(os.path.join(APP_DIR, plan_path), 'rb') as f:
+        plan = pickle.load(f)
+    return plan['pages'], plan['digest'] != plan_digest()
+
+
+########################################################################
+def update_plan(plan_path=WARMUP_PLAN, timeout=1800):
+    """
+    Records the plan again (in a separate process) when it is missing or
+    the pages or modules changed since. Run before the server starts, so
+    no request waits for it.
+
+    Args:
+        plan_path (str, optional): File of the plan (default is WARMUP_PLAN).
+        timeout (float, optional): Seconds allowed to record it (default
+            is 1800).
+
+    Returns:
+        bool: Whether the plan was recorded.
+    """
+    try:
+        if not load_plan(plan_path)[1]:
+            return False
+    except (OSError, EOFError, pickle.UnpicklingError, KeyError, AttributeError, ImportError):
+        pass
+    # AppTest replaces the runtime of its process, so pages are recorded in another
+    subprocess.run([sys.executable, os.path.join(APP_DIR, 'warm_legos.py'), 'plan',
+                    '--output', os.path.join(APP_DIR, plan_path)],
+                   cwd=APP_DIR, check=True, timeout=timeout,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    return True
+
+
+########################################################################
+class WarmUp:
+    """
+    Background warm-up of the artifact and chart caches. The plan's calls
+    are replayed by a thread pool, page by page in priority order, and
+    ready is set once every call has finished (failed calls included; they
+    are built again on demand).
+
+    Args:
+        order (list, optional): Pages to warm first (default is
+            WARMUP_ORDER).
+        workers (int, optional): Threads replaying the calls (default is
+            WARMUP_WORKERS).
+        plan_path (str, optional): File of the plan (default is
+            WARMUP_PLAN).
+    """
+
+    def __init__(self, order=None, workers=WARMUP_WORKERS, plan_path=WARMUP_PLAN):
+        self.order = ordered_pages(order)
+        self.workers = workers
+        self.plan_path = plan_path
+        self.ready = threading.Event()
+        self._lock = threading.Lock()
+        self.total = 0
+        self.done = 0
+        self.errors = []
+        self.pages_ready = []
+        self.started = None
+        self.finished = None
+
+    def start(self):
+        """
+        Starts the warm-up on a daemon thread.
+
+        Returns:
+            WarmUp: The warm-up itself.
+        """
+        self.started = time.time()
+        threading.Thread(target=self.run, name='lego-warmup', daemon=True).start()
+        return self
+
+    def _call(self, page, call):
+        """Replays one recorded call, counting it when done."""
+        module_name, name, args, kwargs = call
+        try:
+            getattr(importlib.import_module(module_name), name)(*args, **kwargs)
+        except Exception as error:
+            with self._lock:
+                self.errors.append((page, name, repr(error)))
+        with self._lock:
+            self.done += 1
+
+    def run(self):
+        """Replays the plan, then sets ready."""
+        try:
+            plan, stale = load_plan(self.plan_path)
+            if stale:
+                # still replayed: calls that no longer apply fail and are skipped
+                with self._lock:
+                    self.errors.append((None, 'plan', 'recorded for other pages or modules '
+                                                      '(python warm_legos.py plan records it again)'))
+        except (OSError, EOFError, pickle.UnpicklingError, KeyError, AttributeError, ImportError) as error:
+            with self._lock:
+                self.errors.append((None, 'plan', repr(error)))
+            plan = {}
+        try:
+            with ThreadPoolExecutor(self.workers, thread_name_prefix='lego-warmup') as pool:
+                # the pool takes calls in submission order, so earlier pages
+                # are warmed first
+                pages = [(page, [pool.submit(self._call, page, call) for call in plan.get(page, [])])
+                         for page in self.order]
+                with self._lock:
+                    self.total = sum(len(futures) for _, futures in pages)
+                for page, futures in pages:
+                    for future in futures:
+                        future.result()
+                    with self._lock:
+                        self.pages_ready.append(page)
+        finally:
+            self.finished = time.time()
+            self.ready.set()
+
+    def status(self):
+        """
+        Returns the progress of the warm-up.
+
+        Returns:
+            dict: Whether it is ready, calls done out of the total, pages
+                fully warmed, failed calls and seconds elapsed.
+        """
+        with self._lock:
+            end = self.finished or time.time()
+            return {'ready': self.ready.is_set(),
+                    'done': self.done,
+                    'total': self.total,
+                    'pages_ready': list(self.pages_ready),
+                    'errors': list(self.errors),
+                    'elapsed_s': end - self.started if self.started else 0.0}
+
+
+########################################################################
+def start(**kwargs):
+    """
+    Starts the warm-up of this process once; later calls return the same
+    warm-up. Nothing is started when WARMUP is off.
+
+    Args:
+        **kwargs: Arguments passed on to WarmUp.
+
+    Returns:
+        WarmUp: The warm-up, or None when disabled.
+    """
+    global _warmup
+    with _warmup_lock:
+        if _warmup is None and WARMUP:
+            _warmup = WarmUp(**kwargs).start()
+        return _warmup
+
+
+########################################################################
+def ready():
+    """Whether the warm-up of this process has finished."""
+    return _warmup is not None and _warmup.ready.is_set()
+
+
+########################################################################
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Warm the artifact and chart caches of the app.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('serve', help='record the plan if stale, start the warm-up, then the app '
+                                        '(options go to streamlit run)')
+    plan_parser = subparsers.add_parser('plan', help='record the calls of every page')
+    plan_parser.add_argument('--output', default=WARMUP_PLAN)
+    subparsers.add_parser('run', help='warm the caches of this process and report the timings')
+    args, streamlit_args = parser.parse_known_args()
+
+    # the pages use the imported module, not this __main__ copy
+    import warm_legos
+
+    if args.command == 'serve':
+        from streamlit.web import cli as stcli
+        warm_legos.update_plan()
+        warm_legos.start()
+        sys.argv = ['streamlit', 'run', os.path.join(APP_DIR, 'intro.py'), *streamlit_args]
+        sys.exit(stcli.main())
+    elif args.command == 'plan':
+        pages = warm_legos.write_plan(args.output)
+        for page, calls in pages.items():
+            print(f'{page}: {len(calls)} calls')
+    else:
+        warm_legos.update_plan()
+        warmup = warm_legos.WarmUp().start()
+        warmup.ready.wait()
+        status = warmup.status()
+        print(f"warmed {status['done']}/{status['total']} calls in {status['elapsed_s']:.2f}s, "
+              f"pages in order: {', '.join(status['pages_ready'])}")
+        for error in status['errors']:
+            print('failed:', *error)